@@ -1,7 +1,19 @@
-from flask import Flask, render_template, redirect, url_for, abort
+from flask import Flask, Response, render_template, redirect, url_for, abort, request, stream_with_context
 import os
+import mmap
 import markdown
-import zlib
+import threading
+from collections import OrderedDict
+import metrics
+import archive
+import blame
+import chunking
+import revwalk
+import search
+import largefiles
+import lockfile
+import renames
+import repository
 
 app = Flask(__name__, template_folder="app/templates", static_folder="app/static")
 
@@ -14,17 +26,138 @@ def get_current_branch():
                 return line.split("/")[-1]
     return "main"
 
+# Les objets sont immuables : on garde les derniers objets décompressés en mémoire.
+OBJECT_CACHE_SIZE = 2048
+_object_cache = OrderedDict()
+_object_cache_lock = threading.Lock()
+
+class SharedObjectCache:
+    """Objets décompressés rangés dans une zone mmap anonyme.
+
+    Elle est remplie une fois par le processus maître avant le fork, puis lue
+    sans verrou par tous les workers : les mêmes trees ne sont décompressés
+    qu'une fois, et la mémoire n'est pas dupliquée par worker.
+    """
+
+    def __init__(self, objects):
+        total = sum(len(content) for _, content in objects.values())
+        self.buffer = mmap.mmap(-1, max(total, 1))
+        self.entries = {}
+        offset = 0
+        for sha1, (header, content) in objects.items():
+            self.buffer[offset:offset + len(content)] = content
+            self.entries[sha1] = (header, offset, len(content))
+            offset += len(content)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, sha1):
+        entry = self.entries.get(sha1)
+        if entry is None:
+            return None
+        header, offset, size = entry
+        return header, self.buffer[offset:offset + size]
+
+_shared_objects = None
+
 def read_object(sha1, type_):
-    obj_path = os.path.join(".mygit", "objects", sha1[:2], sha1[2:])
-    if not os.path.exists(obj_path):
-        return None
-    with open(obj_path, "rb") as f:
-        compressed = f.read()
-    data = zlib.decompress(compressed)
-    header_end = data.find(b'\0')
-    header = data[:header_end].decode()
+    if _shared_objects is not None:
+        shared = _shared_objects.get(sha1)
+        if metrics.ENABLED:
+            metrics.record_cache("shared_objects", shared is not None)
+        if shared is not None:
+            header, content = shared
+            assert header.startswith(type_)
+            return content
+    with _object_cache_lock:
+        cached = _object_cache.get(sha1)
+        if cached is not None:
+            _object_cache.move_to_end(sha1)
+    if metrics.ENABLED:
+        metrics.record_cache("objects", cached is not None)
+    if cached is not None:
+        header, content = cached
+    else:
+        try:
+            with metrics.phase("inflate"):
+                header, content = repository.read_object(sha1)
+        except FileNotFoundError:
+            return None
+        if metrics.ENABLED:
+            metrics.record_object_read(len(content))
+        with _object_cache_lock:
+            _object_cache[sha1] = (header, content)
+            if len(_object_cache) > OBJECT_CACHE_SIZE:
+                _object_cache.popitem(last=False)
     assert header.startswith(type_)
-    return data[header_end+1:]
+    return content
+
+def warm_shared_object_cache():
+    """Charge dans le cache partagé la première page d'historique de chaque branche
+    (commits et trees complets), ce que servent la plupart des requêtes."""
+    global _shared_objects
+    heads_dir = os.path.join(".mygit", "refs", "heads")
+    if not os.path.isdir(heads_dir):
+        return 0
+    objects = {}
+
+    def load(sha1):
+        if not sha1 or sha1 in objects:
+            return None
+        try:
+            objects[sha1] = repository.read_object(sha1)
+        except FileNotFoundError:
+            return None
+        return objects[sha1]
+
+    def load_tree(tree_hash):
+        loaded = load(tree_hash)
+        if loaded is None:
+            return
+        for type_, sha, _ in repository.parse_tree(loaded[1]):
+            if type_ == "tree":
+                load_tree(sha)
+
+    for name in os.listdir(heads_dir):
+        if name.endswith(lockfile.LOCK_SUFFIX):
+            continue
+        with open(os.path.join(heads_dir, name)) as f:
+            commit_hash = f.read().strip()
+        for _ in range(COMMITS_PER_PAGE):
+            loaded = load(commit_hash)
+            if loaded is None or not loaded[0].startswith("commit"):
+                break
+            commit = parse_commit_object(loaded[1])
+            load_tree(commit["tree"])
+            commit_hash = commit["parents"][0] if commit["parents"] else None
+    _shared_objects = SharedObjectCache(objects)
+    return len(objects)
+
+# Taille maximale affichée pour un fichier découpé en morceaux
+PREVIEW_SIZE = 64 * 1024
+
+def render_blob(file_name, blob_data):
+    """Contenu affichable d'un blob ; un gros fichier n'est jamais relu depuis
+    le magasin, on affiche seulement ce que dit son pointeur. D'un fichier
+    découpé, on ne réassemble que les premiers morceaux."""
+    pointer = largefiles.parse_pointer(blob_data)
+    if pointer is not None:
+        oid, size = pointer
+        return f"Fichier volumineux stocké hors des objets ({size} octets, sha256 {oid})."
+    chunk_list = chunking.parse_pointer(blob_data)
+    if chunk_list is not None:
+        preview = b""
+        for content in repository.iter_blob_content(blob_data):
+            preview += content
+            if len(preview) >= PREVIEW_SIZE:
+                break
+        blob_data = preview[:PREVIEW_SIZE]
+        if chunk_list[0] > PREVIEW_SIZE:
+            return blob_data.decode(errors="replace") + f"\n[... {chunk_list[0]} octets au total]"
+    if file_name.lower().endswith('.md'):
+        return markdown.markdown(blob_data.decode(errors="replace"))
+    return blob_data.decode(errors="replace")
 
 def get_last_pushed_commit_hash(branch):
     ref_path = os.path.join(".mygit", "refs", "heads", branch + ".remote")
@@ -71,7 +204,8 @@ def get_last_pushed_commit_files(branch):
     tree_hash = get_tree_hash_from_commit(commit_hash)
     if not tree_hash:
         return []
-    files, _ = collect_tree(tree_hash)
+    with metrics.phase("tree"):
+        files, _ = collect_tree(tree_hash)
     return files
 
 def get_last_pushed_commit_tree(branch):
@@ -108,30 +242,26 @@ def build_tree_structure(tree_hash, base_path=""):
             tree.append({"type": "folder", "name": dirname, "path": os.path.join(base_path, dirname) if base_path else dirname, "children": subtree})
     return tree
 
-@app.route("/")
-@app.route("/branch/<branch>")
-def depot(branch=None):
-    current_branch = branch or get_current_branch()
-    files = get_last_pushed_commit_files(current_branch)
+_commits_file_cache = {}
 
-    # Liste des branches (ignore les .remote)
-    branches_dir = os.path.join(".mygit", "refs", "heads")
-    branches = []
-    if os.path.exists(branches_dir):
-        branches = [f for f in os.listdir(branches_dir)
-                    if os.path.isfile(os.path.join(branches_dir, f)) and not f.endswith('.remote')]
-    if "main" not in branches:
-        branches.append("main")
+def load_commits_file(author_prefix):
+    """Associe chaque fichier/dossier de commits.txt à son dernier commit.
 
-    index = []
-    index_path = os.path.join(".mygit", "index")
-    if os.path.exists(index_path):
-        with open(index_path) as f:
-            index = [line.strip() for line in f if line.strip()]
+    Le résultat est gardé en mémoire tant que commits.txt ne change pas.
+    """
+    if not os.path.exists("commits.txt"):
+        return {}, {}
+    st = os.stat("commits.txt")
+    key = (author_prefix, st.st_mtime_ns, st.st_size)
+    cached = _commits_file_cache.get(author_prefix)
+    if metrics.ENABLED:
+        metrics.record_cache("commits_txt", cached is not None and cached[0] == key)
+    if cached is not None and cached[0] == key:
+        return cached[1]
 
-    # Associer chaque fichier à son message de commit
     file_commits = {}
-    if os.path.exists("commits.txt"):
+    folder_commits = {}
+    with metrics.phase("commits_txt"):
         with open("commits.txt", encoding="utf-8") as f:
             lines = f.readlines()
         current_message = ""
@@ -145,8 +275,8 @@ def depot(branch=None):
                 commit_hash = line.split()[1].strip()
             elif line.startswith("Message:"):
                 current_message = line[len("Message:"):].strip()
-            elif line.startswith("Auteur:"):
-                current_author = line[len("Auteur:"):].strip()
+            elif line.startswith(author_prefix):
+                current_author = line[len(author_prefix):].strip()
             elif line.startswith("Date:"):
                 current_date = line[len("Date:"):].strip()
             elif line.strip().startswith("- "):
@@ -166,7 +296,7 @@ def depot(branch=None):
                         "hash": commit_hash
                     }
                 for folder in current_folders:
-                    file_commits[folder] = {
+                    folder_commits[folder] = {
                         "author": current_author,
                         "message": current_message,
                         "date": current_date,
@@ -174,6 +304,159 @@ def depot(branch=None):
                     }
                 current_files = []
                 current_folders = []
+    _commits_file_cache[author_prefix] = (key, (file_commits, folder_commits))
+    return file_commits, folder_commits
+
+def render_page(template, **context):
+    with metrics.phase("render"):
+        return render_template(template, **context)
+
+COMMITS_PER_PAGE = 20
+
+def get_branch_commit_hash(branch):
+    ref_path = os.path.join(".mygit", "refs", "heads", branch)
+    if not os.path.exists(ref_path):
+        return None
+    with open(ref_path) as f:
+        return f.read().strip() or None
+
+def parse_commit_object(commit_data):
+    """Découpe un objet commit en en-têtes (tree, parents, auteur, date) et message."""
+    lines = commit_data.decode(errors="replace").split("\n")
+    commit = {"tree": None, "parents": [], "author": "", "date": "", "message": ""}
+    for i, line in enumerate(lines):
+        if line == "":
+            commit["message"] = "\n".join(lines[i + 1:]).strip()
+            break
+        if line.startswith("tree "):
+            commit["tree"] = line[5:].strip()
+        elif line.startswith("parent "):
+            commit["parents"].append(line[7:].strip())
+        elif line.startswith("author "):
+            # Format: author <nom> <AAAA-MM-JJ> <HH:MM:SS>
+            parts = line[7:].rsplit(" ", 2)
+            if len(parts) == 3:
+                commit["author"], commit["date"] = parts[0], f"{parts[1]} {parts[2]}"
+            else:
+                commit["author"] = line[7:]
+    return commit
+
+def is_commit(sha1):
+    """Vrai si `sha1` est un SHA complet qui désigne un commit du dépôt
+    (paramètres d'URL : ni chemin, ni tree, ni blob ne vont plus loin)."""
+    if not repository.is_sha(sha1):
+        return False
+    try:
+        return repository.peek_object(sha1, size=0)[0] == "commit"
+    except (FileNotFoundError, ValueError):
+        return False
+
+def get_commit_page(start_hash, count=COMMITS_PER_PAGE):
+    """Lit au plus `count` commits depuis `start_hash` en suivant le premier parent.
+
+    Retourne la page et le curseur (hash du commit suivant) pour la page d'après,
+    ce qui évite de reparcourir tout l'historique pour les pages profondes.
+    """
+    commits = []
+    current = start_hash
+    while current and len(commits) < count:
+        commit_data = read_object(current, "commit")
+        if commit_data is None:
+            break
+        commit = parse_commit_object(commit_data)
+        commit["hash"] = current
+        commits.append(commit)
+        current = commit["parents"][0] if commit["parents"] else None
+    return commits, current
+
+def read_tree_entries(tree_hash):
+    """Retourne {nom: (type, hash)} pour un niveau de tree."""
+    entries = {}
+    if not tree_hash:
+        return entries
+    tree_data = read_object(tree_hash, "tree")
+    if tree_data is None:
+        return entries
+    # Format texte ou binaire (write_tree) : repository.parse_tree lit les deux
+    for type_, sha, name in repository.parse_tree(tree_data):
+        entries[name] = (type_, sha)
+    return entries
+
+def diff_trees(old_tree, new_tree, base_path="", shas=None):
+    """Liste les fichiers ajoutés (A), modifiés (M) et supprimés (D) entre deux trees.
+
+    Les sous-dossiers dont le hash n'a pas changé ne sont pas relus. Si `shas`
+    est un dict, il reçoit le blob de chaque fichier ajouté ou supprimé.
+    """
+    changes = []
+    if old_tree == new_tree:
+        return changes
+    old_entries = read_tree_entries(old_tree)
+    new_entries = read_tree_entries(new_tree)
+    for name in sorted(set(old_entries) | set(new_entries)):
+        path = f"{base_path}/{name}" if base_path else name
+        old_type, old_sha = old_entries.get(name, (None, None))
+        new_type, new_sha = new_entries.get(name, (None, None))
+        if old_sha == new_sha and old_type == new_type:
+            continue
+        if old_type == "tree" or new_type == "tree":
+            changes.extend(diff_trees(old_sha if old_type == "tree" else None,
+                                      new_sha if new_type == "tree" else None, path, shas))
+            if old_type == "blob":
+                changes.append(("D", path))
+            elif new_type == "blob":
+                changes.append(("A", path))
+        elif old_sha is None:
+            changes.append(("A", path))
+        elif new_sha is None:
+            changes.append(("D", path))
+        else:
+            changes.append(("M", path))
+            continue
+        if shas is not None and "blob" in (old_type, new_type):
+            shas[path] = old_sha if old_type == "blob" else new_sha
+    return changes
+
+def get_commit_changes(commit):
+    """Changements du commit par rapport à son premier parent ; les fichiers
+    déplacés apparaissent en renommages (R, "ancien -> nouveau")."""
+    parent_tree = None
+    if commit["parents"]:
+        parent_data = read_object(commit["parents"][0], "commit")
+        if parent_data is not None:
+            parent_tree = parse_commit_object(parent_data)["tree"]
+    shas = {}
+    changes = diff_trees(parent_tree, commit["tree"], shas=shas)
+    deleted = {path: shas[path] for status, path in changes if status == "D"}
+    added = {path: shas[path] for status, path in changes if status == "A"}
+    if deleted and added:
+        changes = renames.apply_renames(changes, renames.find_renames(deleted, added))
+    return changes
+
+@app.route("/")
+@app.route("/branch/<branch>")
+def depot(branch=None):
+    current_branch = branch or get_current_branch()
+    files = get_last_pushed_commit_files(current_branch)
+
+    # Liste des branches (ignore les .remote)
+    branches_dir = os.path.join(".mygit", "refs", "heads")
+    branches = []
+    if os.path.exists(branches_dir):
+        branches = [f for f in os.listdir(branches_dir)
+                    if os.path.isfile(os.path.join(branches_dir, f)) and not f.endswith(('.remote', lockfile.LOCK_SUFFIX))]
+    if "main" not in branches:
+        branches.append("main")
+
+    index = []
+    index_path = os.path.join(".mygit", "index")
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = [line.strip() for line in f if line.strip()]
+
+    # Associer chaque fichier à son message de commit
+    file_commits, folder_commits = load_commits_file("Auteur:")
+    file_commits = {**file_commits, **folder_commits}
 
     # README
     readme_content = None
@@ -187,7 +470,7 @@ def depot(branch=None):
             md = f.read()
             readme_content = markdown.markdown(md)
 
-    return render_template(
+    return render_page(
         "depot.html",
         files=files,
         branches=branches,
@@ -204,7 +487,8 @@ def explorer(branch, subpath):
     tree_hash = get_last_pushed_commit_tree(branch)
     if not tree_hash:
         abort(404)
-    tree_structure = build_tree_structure(tree_hash)
+    with metrics.phase("tree"):
+        tree_structure = build_tree_structure(tree_hash)
     current_tree_hash = tree_hash
     selected_file_content = None
     selected_file_name = None
@@ -214,56 +498,12 @@ def explorer(branch, subpath):
     branches = []
     if os.path.exists(branches_dir):
         branches = [f for f in os.listdir(branches_dir)
-                    if os.path.isfile(os.path.join(branches_dir, f)) and not f.endswith('.remote')]
+                    if os.path.isfile(os.path.join(branches_dir, f)) and not f.endswith(('.remote', lockfile.LOCK_SUFFIX))]
     if "main" not in branches:
         branches.append("main")
 
     # Afficher les messages/dates
-    file_commits = {}
-    folder_commits = {}
-    if os.path.exists("commits.txt"):
-        with open("commits.txt", encoding="utf-8") as f:
-            lines = f.readlines()
-        current_message = ""
-        current_author = ""
-        current_date = ""
-        current_files = []
-        current_folders = []
-        commit_hash = None
-        for line in lines:
-            if line.startswith("commit "):
-                commit_hash = line.split()[1].strip()
-            elif line.startswith("Message:"):
-                current_message = line[len("Message:"):].strip()
-            elif line.startswith("Author:"):
-                current_author = line[len("Author:"):].strip()
-            elif line.startswith("Date:"):
-                current_date = line[len("Date:"):].strip()
-            elif line.strip().startswith("- "):
-                parts = line.strip()[2:].split()
-                if len(parts) == 3 and parts[0] == "blob":
-                    filename = parts[2]
-                    current_files.append(filename)
-                elif len(parts) == 3 and parts[0] == "tree":
-                    foldername = parts[2]
-                    current_folders.append(foldername)
-            elif line.strip() == "":
-                for file in current_files:
-                    file_commits[file] = {
-                        "author": current_author,
-                        "message": current_message,
-                        "date": current_date,
-                        "hash": commit_hash
-                    }
-                for folder in current_folders:
-                    folder_commits[folder] = {
-                        "author": current_author,
-                        "message": current_message,
-                        "date": current_date,
-                        "hash": commit_hash
-                    }
-                current_files = []
-                current_folders = []
+    file_commits, folder_commits = load_commits_file("Author:")
 
     # Si subpath est un fichier, on affiche son contenu
     if subpath:
@@ -292,12 +532,10 @@ def explorer(branch, subpath):
         if blob_hash:
             blob_data = read_object(blob_hash, "blob")
             selected_file_name = parts[-1]
-            if selected_file_name.lower().endswith('.md'):
-                selected_file_content = markdown.markdown(blob_data.decode(errors="replace"))
-            else:
-                selected_file_content = blob_data.decode(errors="replace")
-            # Pour l'affichage, on considère le dossier parent
+            selected_file_content = render_blob(selected_file_name, blob_data)
+            # Pour l'affichage, on considère le dossier parent (reparcouru depuis la racine)
             subpath = "/".join(parts[:-1])
+            current_tree_hash = tree_hash
             # On affiche le contenu du dossier parent + le fichier sélectionné
     # Liste des fichiers/dossiers du dossier courant
     if subpath:
@@ -317,7 +555,7 @@ def explorer(branch, subpath):
                     if filename == part:
                         selected_file_name = part
                         blob_data = read_object(blob_hash, "blob")
-                        selected_file_content = blob_data.decode(errors="replace")
+                        selected_file_content = render_blob(part, blob_data)
                         found = True
                         break
             if not found:
@@ -325,7 +563,7 @@ def explorer(branch, subpath):
     files, folders = get_tree_listing(current_tree_hash)
     selected_files = [f"{subpath}/{f}" if subpath else f for f in files]
     selected_folders = [f"{subpath}/{d}" if subpath else d for d in folders]
-    return render_template(
+    return render_page(
         "explorer.html",
         branch=branch,
         branches=branches,
@@ -339,22 +577,232 @@ def explorer(branch, subpath):
         folder_commits=folder_commits
     )
 
+def find_blob(tree_hash, filepath):
+    """SHA du blob au chemin donné dans un tree, ou None."""
+    parts = filepath.split("/")
+    for i, part in enumerate(parts):
+        tree_data = read_object(tree_hash, "tree")
+        next_hash = None
+        for type_, sha, name in repository.parse_tree(tree_data):
+            if name == part and (type_ == "blob") == (i == len(parts) - 1):
+                next_hash = sha
+                break
+        if next_hash is None:
+            return None
+        tree_hash = next_hash
+    return tree_hash
+
+@app.route("/raw/<branch>/<path:filepath>")
+def raw_file(branch, filepath):
+    """Contenu brut d'un fichier, envoyé morceau par morceau."""
+    tree_hash = get_last_pushed_commit_tree(branch)
+    blob_hash = find_blob(tree_hash, filepath.replace("\\", "/")) if tree_hash else None
+    if not blob_hash:
+        abort(404)
+    blob_data = read_object(blob_hash, "blob")
+    chunk_list = chunking.parse_pointer(blob_data)
+    pointer = largefiles.parse_pointer(blob_data)
+    size = chunk_list[0] if chunk_list else pointer[1] if pointer else len(blob_data)
+    return Response(stream_with_context(repository.iter_blob_content(blob_data)),
+                    mimetype="application/octet-stream",
+                    headers={"Content-Length": str(size)})
+
+ARCHIVE_MIMETYPES = {"tar": "application/x-tar", "tar.gz": "application/gzip", "zip": "application/zip"}
+
+@app.route('/archive/<branch>.<any(tar, zip, "tar.gz"):fmt>')
+def archive_download(branch, fmt):
+    """Archive de la version poussée de la branche, produite au fil de l'eau."""
+    commit_hash = get_last_pushed_commit_hash(branch)
+    if not commit_hash:
+        abort(404)
+    prefix = request.args.get("prefix", f"{branch}/")
+    paths = [path.replace("\\", "/") for path in request.args.getlist("path")]
+    try:
+        chunks = archive.stream(commit_hash, fmt, prefix, paths)
+    except (FileNotFoundError, ValueError):
+        abort(404)
+    file_name = f"{branch.replace('/', '-')}.{fmt}"
+    return Response(stream_with_context(chunks), mimetype=ARCHIVE_MIMETYPES[fmt],
+                    headers={"Content-Disposition": f'attachment; filename="{file_name}"'})
+
+@app.route("/blame/<branch>/<path:filepath>")
+def blame_view(branch, filepath):
+    """Origine de chaque ligne du fichier, dans la version poussée de la branche."""
+    commit_hash = get_last_pushed_commit_hash(branch)
+    if not commit_hash:
+        abort(404)
+    filepath = filepath.replace("\\", "/")
+    try:
+        with metrics.phase("blame"):
+            lines = blame.blame(commit_hash, filepath)
+    except FileNotFoundError:
+        abort(404)
+    except ValueError as e:
+        return render_page("blame.html", branch=branch, filepath=filepath, hunks=[], error=str(e))
+    # Lignes consécutives venues du même commit regroupées en un bloc
+    commits = {}
+    hunks = []
+    for number, (oid, _, text) in enumerate(lines, 1):
+        if oid not in commits:
+            commit = revwalk.read_commit(oid)
+            date = commit["author_date"]
+            commits[oid] = {
+                "hash": oid,
+                "subject": commit["message"].strip().split("\n", 1)[0],
+                "author": commit["author"],
+                "date": date.strftime("%Y-%m-%d") if date else "",
+            }
+        if hunks and hunks[-1]["commit"]["hash"] == oid:
+            hunks[-1]["lines"].append((number, text))
+        else:
+            hunks.append({"commit": commits[oid], "lines": [(number, text)]})
+    return render_page("blame.html", branch=branch, filepath=filepath, hunks=hunks, error=None)
+
 @app.route("/file_view/<branch>/<path:filepath>")
 def file_view(branch, filepath):
     return redirect(url_for('explorer', branch=branch, subpath=filepath))
 
 @app.route("/branches")
 def branches_page():
-    branches_dir = os.path.join(".mygit", "refs", "heads")
-    branches = []
-    if os.path.exists(branches_dir):
-        branches = [f for f in os.listdir(branches_dir)
-                    if os.path.isfile(os.path.join(branches_dir, f)) and not f.endswith('.remote')]
-    if "main" not in branches:
-        branches.append("main")
+    with metrics.phase("history"):
+        branches = revwalk.branch_overview()
+    if "main" not in [entry["name"] for entry in branches]:
+        branches.append({"name": "main", "oid": None, "subject": "", "ahead": 0, "behind": 0})
     current_branch = get_current_branch()
-    return render_template("branches.html", branches=branches, current_branch=current_branch)
+    return render_page("branches.html", branches=branches, current_branch=current_branch)
+
+SEARCH_RESULTS = 100
+
+@app.route("/search")
+def search_page():
+    query = request.args.get("q", "").strip()
+    author = request.args.get("author", "").strip()
+    results = []
+    total = 0
+    if query or author:
+        with metrics.phase("search"):
+            search.update(list(repository.all_refs().values()))
+            index = search.CommitIndex()
+            try:
+                matches = index.query(search.query_terms(query, author))
+            finally:
+                index.close()
+            total = len(matches)
+            for oid, _ in matches[:SEARCH_RESULTS]:
+                try:
+                    commit = revwalk.read_commit(oid)
+                except (FileNotFoundError, ValueError):
+                    continue
+                date = commit["author_date"]
+                results.append({
+                    "hash": oid,
+                    "message": commit["message"].strip(),
+                    "author": commit["author"],
+                    "date": date.strftime("%Y-%m-%d %H:%M:%S") if date else "",
+                })
+    return render_page(
+        "search.html",
+        query=query,
+        author=author,
+        results=results,
+        total=total,
+        branch=get_current_branch()
+    )
+
+@app.route("/log/<branch>")
+def history(branch):
+    # Le curseur est le hash du premier commit de la page : chaque page ne lit
+    # que ses propres commits, quelle que soit sa profondeur dans l'historique.
+    cursor = request.args.get("from")
+    if cursor and not is_commit(cursor):
+        abort(404)
+    cursor = cursor or get_branch_commit_hash(branch)
+    try:
+        per_page = max(1, min(int(request.args.get("n", COMMITS_PER_PAGE)), 200))
+    except ValueError:
+        per_page = COMMITS_PER_PAGE
+    commits, next_cursor = get_commit_page(cursor, per_page) if cursor else ([], None)
+    with metrics.phase("tree"):
+        for commit in commits:
+            commit["changes"] = get_commit_changes(commit)
+    return render_page(
+        "log.html",
+        branch=branch,
+        commits=commits,
+        next_cursor=next_cursor,
+        per_page=per_page
+    )
+
+@app.route("/commit/<sha>")
+def commit_view(sha):
+    if not is_commit(sha):
+        abort(404)
+    commit_data = read_object(sha, "commit")
+    if commit_data is None:
+        abort(404)
+    commit = parse_commit_object(commit_data)
+    commit["hash"] = sha
+    with metrics.phase("tree"):
+        changes = get_commit_changes(commit)
+    return render_page(
+        "commit.html",
+        commit=commit,
+        changes=changes,
+        branch=request.args.get("branch") or get_current_branch()
+    )
+
+@app.before_request
+def start_request_metrics():
+    if metrics.ENABLED:
+        metrics.start_request()
+
+@app.after_request
+def finish_request_metrics(response):
+    if metrics.ENABLED:
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        metrics.finish_request(route, response.status_code)
+    return response
+
+@app.route("/metrics")
+def metrics_endpoint():
+    if not metrics.ENABLED:
+        abort(404)
+    return metrics.render_prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="app.py", description="Explorateur web du dépôt .mygit")
+    parser.add_argument("--serve", action="store_true",
+                        help="Mode production (serveur WSGI multi-processus) au lieu du serveur de dev Flask")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None, help="Port (5000 en dev, 8000 en production)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Nombre de processus (mode --serve)")
+    parser.add_argument("--threads", type=int, default=8, help="Threads par processus (mode --serve)")
+    parser.add_argument("--no-warm", action="store_true", help="Ne pas précharger le cache partagé des trees")
+    parser.add_argument("--access-log", action="store_true", help="Journaliser chaque requête")
+    parser.add_argument("--metrics", action="store_true", help="Activer /metrics")
+    parser.add_argument("--slow-ms", type=float, default=None, help="Journaliser les requêtes plus lentes que ce seuil")
+    opts = parser.parse_args(argv)
+
+    if opts.metrics or opts.slow_ms:
+        metrics.enable(opts.slow_ms)
+
+    if not opts.serve:
+        app.run(host=opts.host, port=opts.port or 5000, debug=True)
+        return
+
+    import wsgi_server
+
+    def before_fork():
+        if metrics.ENABLED:
+            metrics.share()  # /metrics additionne les mesures de tous les workers
+        if not opts.no_warm:
+            count = warm_shared_object_cache()
+            print(f"Cache partagé : {count} objet(s) préchargé(s)")
+
+    wsgi_server.serve(app, host=opts.host, port=opts.port or 8000, workers=opts.workers,
+                      threads=opts.threads, access_log=opts.access_log, before_fork=before_fork)
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    main()
     
\ No newline at end of file
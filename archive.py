@@ -0,0 +1,200 @@
+"""Export d'un tree en archive tar, tar.gz ou zip, produite au fil de l'eau.
+
+L'archive est un générateur d'octets : le tree est parcouru dans l'ordre des
+noms sans être aplati, chaque fichier est lu morceau par morceau
+(repository.iter_blob_content : les fichiers découpés et les gros fichiers du
+magasin ne sont jamais chargés en entier) et les octets produits sont rendus
+aussitôt. La mémoire ne dépend ni du nombre de fichiers ni de leur taille
+totale ; rien n'est écrit dans la copie de travail.
+
+En tar, l'en-tête d'un fichier demande sa taille : elle est lue dans le
+pointeur des fichiers découpés ou du magasin, sans lire le contenu. En zip,
+la taille et le CRC suivent les données (descripteur de données), comme pour
+toute sortie non positionnable.
+"""
+import io
+import stat
+import time
+import zlib
+import tarfile
+import zipfile
+
+import bloom
+import chunking
+import largefiles
+import repository
+import revwalk
+
+FORMATS = ("tar", "tar.gz", "zip")
+BLOCK = tarfile.BLOCKSIZE
+RECORD = tarfile.RECORDSIZE
+
+
+def format_for(filename, default="tar"):
+    """Format déduit de l'extension d'un nom de fichier."""
+    for fmt, extensions in (("tar.gz", (".tar.gz", ".tgz")), ("zip", (".zip",)), ("tar", (".tar",))):
+        if filename and filename.endswith(extensions):
+            return fmt
+    return default
+
+
+def _selected(path, paths):
+    return not paths or any(path == p or path.startswith(p + "/") or p.startswith(path + "/")
+                            for p in paths)
+
+
+def iter_entries(tree_oid, paths=(), git_dir=repository.GIT_DIR_NAME):
+    """(chemin, type, sha) des dossiers et fichiers du tree, dans l'ordre des
+    noms ; avec `paths`, seuls ces fichiers ou dossiers (et leurs parents)."""
+    paths = [p.strip("/") for p in paths if p.strip("/")]
+    stack = [("", tree_oid)]
+    while stack:
+        prefix, oid = stack.pop()
+        obj_type, content = repository.read_object(oid, git_dir)
+        if obj_type != "tree":
+            raise ValueError(f"Object {oid} is not a tree")
+        subtrees = []
+        for type_, sha, name in sorted(repository.parse_tree(content), key=lambda entry: entry[2]):
+            path = prefix + name
+            if not _selected(path, paths):
+                continue
+            yield path, type_, sha
+            if type_ == "tree":
+                subtrees.append((path + "/", sha))
+        # Pile : les sous-dossiers sortent dans l'ordre des noms, après les fichiers du niveau
+        stack.extend(reversed(subtrees))
+
+
+def _blob(oid, git_dir):
+    """(taille réelle, données du blob) : la taille d'un fichier découpé ou
+    du magasin vient de son pointeur."""
+    obj_type, data = repository.read_object(oid, git_dir)
+    if obj_type != "blob":
+        raise ValueError(f"Object {oid} is not a blob")
+    chunk_list = chunking.parse_pointer(data)
+    if chunk_list is not None:
+        return chunk_list[0], data
+    pointer = largefiles.parse_pointer(data)
+    if pointer is not None:
+        return pointer[1], data
+    return len(data), data
+
+
+def _files(tree_oid, paths, git_dir):
+    """Fichiers retenus (dossiers compris si `paths` les désigne entièrement)."""
+    paths = [p.strip("/") for p in paths if p.strip("/")]
+    for path, type_, sha in iter_entries(tree_oid, paths, git_dir):
+        inside = not paths or any(path == p or path.startswith(p + "/") for p in paths)
+        if inside:
+            yield path, type_, sha
+
+
+def _tar(tree_oid, prefix, paths, mtime, git_dir):
+    size_written = 0
+    for path, type_, sha in _files(tree_oid, paths, git_dir):
+        info = tarfile.TarInfo(prefix + path)
+        info.mtime = mtime
+        info.uname = info.gname = "root"
+        if type_ == "tree":
+            info.type = tarfile.DIRTYPE
+            info.name += "/"
+            info.mode = 0o755
+            header = info.tobuf(tarfile.PAX_FORMAT)
+            size_written += len(header)
+            yield header
+            continue
+        size, data = _blob(sha, git_dir)
+        info.size = size
+        info.mode = 0o644
+        header = info.tobuf(tarfile.PAX_FORMAT)
+        size_written += len(header)
+        yield header
+        for content in repository.iter_blob_content(data, git_dir):
+            size_written += len(content)
+            yield content
+        remainder = size % BLOCK
+        if remainder:
+            size_written += BLOCK - remainder
+            yield b"\0" * (BLOCK - remainder)
+    # Deux blocs vides, puis complément jusqu'à un multiple de RECORDSIZE (comme tarfile)
+    end = 2 * BLOCK
+    end += -(size_written + end) % RECORD
+    yield b"\0" * end
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 : en-tête gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _Sink(io.RawIOBase):
+    """Sortie non positionnable de zipfile : les octets écrits sont récupérés par drain()."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def _zip(tree_oid, prefix, paths, mtime, git_dir):
+    date = time.localtime(mtime)[:6]
+    date = (max(date[0], 1980),) + date[1:]
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for path, type_, sha in _files(tree_oid, paths, git_dir):
+            if type_ == "tree":
+                info = zipfile.ZipInfo(prefix + path + "/", date)
+                info.external_attr = (stat.S_IFDIR | 0o755) << 16
+                zf.writestr(info, b"")
+            else:
+                size, data = _blob(sha, git_dir)
+                info = zipfile.ZipInfo(prefix + path, date)
+                info.external_attr = (stat.S_IFREG | 0o644) << 16
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.file_size = size
+                with zf.open(info, "w", force_zip64=size >= zipfile.ZIP64_LIMIT) as out:
+                    for content in repository.iter_blob_content(data, git_dir):
+                        out.write(content)
+                        if len(sink.buffer) >= largefiles.CHUNK_SIZE:
+                            yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream(commit_oid, fmt="tar", prefix="", paths=(), git_dir=repository.GIT_DIR_NAME):
+    """Générateur des octets de l'archive du commit (ou tag) `commit_oid`.
+
+    `prefix` est ajouté devant chaque chemin ("projet-1.0/") ; `paths` limite
+    l'archive à ces fichiers ou dossiers. Lève ValueError pour un format
+    inconnu ou un chemin absent du tree.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format d'archive inconnu : {fmt} ({', '.join(FORMATS)})")
+    commit = revwalk.read_commit(commit_oid, git_dir)
+    tree_oid = commit["tree_oid"]
+    for path in paths:
+        path = path.strip("/")
+        if path and bloom.path_entry(tree_oid, path, git_dir) is None:
+            raise ValueError(f"'{path}' n'existe pas dans {commit['oid'][:7]}")
+    mtime = int(commit["timestamp"])
+    if prefix and not prefix.endswith("/"):
+        prefix += "/"
+    if fmt == "zip":
+        return _zip(tree_oid, prefix, paths, mtime, git_dir)
+    chunks = _tar(tree_oid, prefix, paths, mtime, git_dir)
+    return _gzip(chunks) if fmt == "tar.gz" else chunks
+
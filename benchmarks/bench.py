@@ -0,0 +1,221 @@
+"""Benchmarks des commandes et de l'interface web sur un dépôt synthétique.
+
+    python benchmarks/bench.py run --files 2000 --history 100 --output avant.json
+    python benchmarks/bench.py run --files 2000 --history 100 --output apres.json
+    python benchmarks/bench.py compare avant.json apres.json --threshold 0.10
+
+"run" génère le dépôt (voir synthetic_repo.py), chronomètre chaque commande
+en lançant `python main.py ...` comme un utilisateur, puis les routes Flask
+via le client de test, et écrit un JSON. "compare" signale les benchmarks
+dont la médiane a augmenté de plus du seuil et sort avec le code 1 s'il y en a.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import shutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic_repo  # noqa: E402
+
+MAIN = os.path.join(ROOT, "main.py")
+COMMAND_BENCHMARKS = ["my_git_add", "write_tree", "commit", "status", "log", "checkout", "merge"]
+WEB_ROUTES = ["/", "/branches", "/log/main", "/tree/main/", "/commit/<tip>"]
+
+
+def run_cli(repo, args):
+    env = dict(os.environ, MYGIT_NO_SERVER="1")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, MAIN] + args, cwd=repo, env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    elapsed = time.perf_counter() - start
+    return elapsed, proc.returncode, proc.stderr.decode(errors="replace")[-500:]
+
+
+def summarize(samples, **extra):
+    result = {
+        "samples": [round(s, 6) for s in samples],
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.mean(samples),
+        "max": max(samples),
+    }
+    result.update(extra)
+    return result
+
+
+def bench_commands(repo, info, repeat, only):
+    results = {}
+    touched = os.path.join(repo, "bench_touched.txt")
+    branch = info["branches"][0] if info["branches"] else "main"
+    scenarios = {
+        "my_git_add": lambda i: ["my_git_add", "-A"],
+        "write_tree": lambda i: ["write_tree"],
+        "commit": lambda i: ["commit", "-m", f"bench commit {i}", "--author", "bench"],
+        "status": lambda i: ["status"],
+        "log": lambda i: ["log"],
+        "checkout": lambda i: ["checkout", "main"],
+        "merge": lambda i: ["merge", branch],
+    }
+    for name in COMMAND_BENCHMARKS:
+        if only and name not in only:
+            continue
+        samples = []
+        returncode = 0
+        stderr = ""
+        for i in range(repeat):
+            if name == "commit":
+                # Un changement à committer à chaque itération
+                with open(touched, "a") as f:
+                    f.write(f"{i}\n")
+                run_cli(repo, ["my_git_add", "bench_touched.txt"])
+            elapsed, returncode, stderr = run_cli(repo, scenarios[name](i))
+            samples.append(elapsed)
+        extra = {"returncode": returncode}
+        if returncode:
+            extra["stderr"] = stderr
+        results[f"cli.{name}"] = summarize(samples, **extra)
+        print(f"  cli.{name:<12} médiane {results[f'cli.{name}']['median'] * 1000:8.1f} ms"
+              + (f"  (code de sortie {returncode})" if returncode else ""))
+    return results
+
+
+def bench_web(repo, info, repeat, only):
+    if only and "web" not in only:
+        return {}
+    try:
+        import importlib
+        cwd = os.getcwd()
+        os.chdir(repo)
+        app_module = importlib.import_module("app")
+    except ImportError as e:
+        print(f"  web ignoré : {e}")
+        return {}
+    results = {}
+    try:
+        client = app_module.app.test_client()
+        for route in WEB_ROUTES:
+            url = route.replace("<tip>", info["tip"])
+            samples = []
+            status = None
+            for i in range(repeat):
+                if i == 0:
+                    # Première requête à froid : caches applicatifs vides
+                    app_module._object_cache.clear()
+                start = time.perf_counter()
+                response = client.get(url)
+                samples.append(time.perf_counter() - start)
+                status = response.status_code
+            results[f"web.{route}"] = summarize(samples, status=status, cold=samples[0])
+            print(f"  web.{route:<14} médiane {results[f'web.{route}']['median'] * 1000:8.1f} ms"
+                  f"  (à froid {samples[0] * 1000:.1f} ms, HTTP {status})")
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def cmd_run(opts):
+    only = set(opts.only.split(",")) if opts.only else None
+    workdir = opts.repo or tempfile.mkdtemp(prefix="mygit-bench-")
+    print(f"Génération du dépôt synthétique dans {workdir}...")
+    start = time.perf_counter()
+    info = synthetic_repo.generate(workdir, opts.files, opts.depth, opts.size_dist, opts.history,
+                                   opts.branches, opts.churn, opts.seed, quiet=True)
+    print(f"  {info['files']} fichiers, {info['bytes']} octets, {info['history']} commits "
+          f"en {time.perf_counter() - start:.1f} s")
+    try:
+        results = {}
+        results.update(bench_web(workdir, info, opts.repeat, only))
+        results.update(bench_commands(workdir, info, opts.repeat, only))
+    finally:
+        if not opts.keep and not opts.repo:
+            shutil.rmtree(workdir, ignore_errors=True)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": opts.repeat,
+            "repository": {k: v for k, v in info.items() if k != "path"},
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, default=str)
+    if opts.output:
+        with open(opts.output, "w") as f:
+            f.write(text + "\n")
+        print(f"Résultats écrits dans {opts.output}")
+    else:
+        print(text)
+
+
+def cmd_compare(opts):
+    with open(opts.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(opts.candidate) as f:
+        candidate = json.load(f)["results"]
+    regressions = 0
+    print(f"{'benchmark':<24} {'avant (ms)':>11} {'après (ms)':>11} {'écart':>8}")
+    for name in sorted(set(baseline) | set(candidate)):
+        if name not in baseline or name not in candidate:
+            print(f"{name:<24} {'-':>11} {'-':>11}   (absent d'un des deux runs)")
+            continue
+        old = baseline[name]["median"]
+        new = candidate[name]["median"]
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if change > opts.threshold:
+            flag = "  RÉGRESSION"
+            regressions += 1
+        elif change < -opts.threshold:
+            flag = "  amélioration"
+        print(f"{name:<24} {old * 1000:11.1f} {new * 1000:11.1f} {change:+8.1%}{flag}")
+    if regressions:
+        print(f"{regressions} régression(s) au-delà de {opts.threshold:.0%}.")
+        sys.exit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de mygit")
+    sub = parser.add_subparsers(dest="action", required=True)
+
+    run_parser = sub.add_parser("run", help="Générer un dépôt et lancer les benchmarks")
+    synthetic_repo.add_arguments(run_parser)
+    run_parser.add_argument("--repeat", type=int, default=5, help="Mesures par benchmark")
+    run_parser.add_argument("--only", help="Liste séparée par des virgules (ex: status,log,web)")
+    run_parser.add_argument("--output", "-o", help="Fichier JSON de résultats")
+    run_parser.add_argument("--repo", help="Répertoire du dépôt généré (temporaire par défaut)")
+    run_parser.add_argument("--keep", action="store_true", help="Garder le dépôt temporaire")
+
+    compare_parser = sub.add_parser("compare", help="Comparer deux fichiers de résultats")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="Hausse relative de la médiane considérée comme régression")
+
+    opts = parser.parse_args(argv)
+    if opts.action == "run":
+        cmd_run(opts)
+    else:
+        cmd_compare(opts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Génère un dépôt .mygit synthétique pour les benchmarks.
+
+    python benchmarks/synthetic_repo.py /tmp/repo --files 2000 --depth 4 \
+        --size-dist mixed --history 100 --branches 5
+
+Le dépôt est construit avec l'API Repository (un seul processus) et un
+générateur pseudo-aléatoire initialisé par --seed : deux générations avec les
+mêmes paramètres donnent le même contenu.
+"""
+import os
+import sys
+import random
+import argparse
+import shutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from repository import Repository  # noqa: E402
+
+# (min, max) en octets, ou paramètres de loi log-normale pour "mixed"
+SIZE_DISTRIBUTIONS = {
+    "small": (64, 1024),
+    "medium": (1024, 32 * 1024),
+    "large": (128 * 1024, 2 * 1024 * 1024),
+}
+WORDS = ("alpha", "beta", "gamma", "delta", "mygit", "commit", "tree", "blob",
+         "branch", "merge", "index", "object", "hash", "zlib", "refs", "head")
+
+
+def file_size(rng, distribution):
+    if distribution == "mixed":
+        # Médiane ~2 Ko, quelques gros fichiers, plafonné à 1 Mo
+        return max(16, min(int(rng.lognormvariate(7.6, 1.3)), 1024 * 1024))
+    low, high = SIZE_DISTRIBUTIONS[distribution]
+    return rng.randint(low, high)
+
+
+def make_content(rng, size):
+    lines = []
+    total = 0
+    while total < size:
+        line = " ".join(rng.choice(WORDS) for _ in range(8)) + f" {rng.getrandbits(32):08x}\n"
+        lines.append(line)
+        total += len(line)
+    return "".join(lines)[:size].encode()
+
+
+def make_paths(rng, count, depth, fanout=8):
+    """Répartit `count` fichiers dans une arborescence d'au plus `depth` niveaux."""
+    paths = []
+    for i in range(count):
+        level = rng.randint(0, depth)
+        parts = [f"dir{rng.randrange(fanout)}" for _ in range(level)]
+        parts.append(f"file{i}.txt")
+        paths.append("/".join(parts))
+    return paths
+
+
+def generate(path, files=1000, depth=3, size_dist="mixed", history=20, branches=3,
+             churn=0.05, seed=42, quiet=False):
+    """Crée le dépôt et retourne un dict décrivant ce qui a été généré."""
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    repo = Repository.init(path)
+
+    paths = make_paths(rng, files, depth)
+    total_bytes = 0
+    for rel_path in paths:
+        full = os.path.join(path, rel_path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        data = make_content(rng, file_size(rng, size_dist))
+        total_bytes += len(data)
+        with open(full, "wb") as f:
+            f.write(data)
+
+    # Historique : chaque commit modifie une fraction `churn` des fichiers
+    repo.add(["."])
+    repo.commit("Initial commit", author="bench", record=False)
+    changed_per_commit = max(1, int(files * churn))
+    for n in range(1, history):
+        for rel_path in rng.sample(paths, min(changed_per_commit, len(paths))):
+            with open(os.path.join(path, rel_path), "ab") as f:
+                f.write(f"commit {n} {rng.getrandbits(64):016x}\n".encode())
+        repo.commit(f"Commit {n}", author="bench", record=False)
+        if not quiet and n % 50 == 0:
+            print(f"  {n}/{history} commits")
+
+    # Branches : chacune part d'un commit de l'historique et ajoute un commit propre
+    main_history = [c["oid"] for c in repo.log()]
+    tip = main_history[0]
+    index = repo.read_index()
+    branch_names = []
+    for b in range(branches):
+        name = f"branch{b}"
+        base = rng.choice(main_history)
+        repo.update_ref(name, base)
+        repo.update_ref(f"{name}.remote", base)
+        (repo.git_dir / "HEAD").write_text(f"ref: refs/heads/{name}\n")
+        extra = f"branches/{name}.txt"
+        os.makedirs(os.path.join(path, "branches"), exist_ok=True)
+        with open(os.path.join(path, extra), "wb") as f:
+            f.write(make_content(rng, 256))
+        repo.write_index(index + [extra])
+        repo.commit(f"Work on {name}", author="bench", record=False)
+        os.remove(os.path.join(path, extra))
+        branch_names.append(name)
+    if branches:
+        os.rmdir(os.path.join(path, "branches"))
+    (repo.git_dir / "HEAD").write_text("ref: refs/heads/main\n")
+    repo.write_index(index)
+    repo.update_ref("main.remote", tip)
+
+    return {
+        "path": path, "files": files, "depth": depth, "size_dist": size_dist,
+        "bytes": total_bytes, "history": history, "branches": branch_names,
+        "churn": churn, "seed": seed, "tip": tip,
+    }
+
+
+def add_arguments(parser):
+    parser.add_argument("--files", type=int, default=1000, help="Nombre de fichiers")
+    parser.add_argument("--depth", type=int, default=3, help="Profondeur maximale des dossiers")
+    parser.add_argument("--size-dist", choices=sorted(SIZE_DISTRIBUTIONS) + ["mixed"], default="mixed",
+                        help="Distribution des tailles de fichiers")
+    parser.add_argument("--history", type=int, default=20, help="Nombre de commits sur main")
+    parser.add_argument("--branches", type=int, default=3, help="Nombre de branches")
+    parser.add_argument("--churn", type=float, default=0.05, help="Fraction de fichiers modifiés par commit")
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère un dépôt .mygit synthétique")
+    parser.add_argument("path")
+    add_arguments(parser)
+    opts = parser.parse_args(argv)
+    info = generate(opts.path, opts.files, opts.depth, opts.size_dist, opts.history,
+                    opts.branches, opts.churn, opts.seed)
+    print(f"Dépôt généré dans {info['path']} : {info['files']} fichiers, "
+          f"{info['bytes']} octets, {info['history']} commits, {len(info['branches'])} branches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Bitmaps d'accessibilité par pack (pack-<sha>.bitmap, écrit par gc).
+
+Le bit i d'un bitmap correspond au i-ème SHA de l'index du pack (ordre trié),
+ce qui évite toute table de correspondance : sha -> bit est la dichotomie de
+Pack.find. Pour une sélection de commits (pointes des références, puis un
+commit sur SELECT_EVERY dans l'historique), le fichier donne l'ensemble des
+objets accessibles depuis ce commit ; cinq bitmaps de plus donnent le type de
+chaque objet du pack.
+
+Sur disque, chaque bitmap est compressé façon EWAH : des mots de 64 bits,
+chaque mot marqueur annonçant une suite de mots tous à 0 ou tous à 1, puis un
+nombre de mots littéraux recopiés tels quels. En mémoire, un bitmap est un
+entier Python : union, intersection et différence sont des |, & et & ~
+faits en C.
+
+Pour un commit sans bitmap, on parcourt l'historique en s'arrêtant aux
+commits qui en ont un ; les objets hors du pack (isolés, plus récents) sont
+rendus à part, dans un ensemble.
+"""
+import os
+import struct
+
+import chunking
+import packfile
+import repository
+
+MAGIC = b"MYBM"
+VERSION = 1
+HEADER = struct.Struct(">4sII20s")
+LENGTH = struct.Struct(">I")
+TYPES = ("commit", "tree", "blob", "tag", "chunk")
+SELECT_EVERY = 100
+
+FULL_WORD = (1 << 64) - 1
+MAX_RUN = (1 << 32) - 1
+MAX_LITERALS = (1 << 31) - 1
+
+
+def ewah_encode(bits):
+    """Compresse un entier (bitmap) en mots EWAH de 64 bits."""
+    nwords = (bits.bit_length() + 63) // 64
+    words = struct.unpack(f"<{nwords}Q", bits.to_bytes(nwords * 8, "little"))
+    out = []
+    i = 0
+    while i < nwords:
+        run_bit = 0
+        run = 0
+        if words[i] in (0, FULL_WORD):
+            clean = words[i]
+            run_bit = 1 if clean == FULL_WORD else 0
+            while i < nwords and words[i] == clean and run < MAX_RUN:
+                run += 1
+                i += 1
+        start = i
+        while i < nwords and words[i] not in (0, FULL_WORD) and i - start < MAX_LITERALS:
+            i += 1
+        out.append(run_bit | (run << 1) | ((i - start) << 33))
+        out.extend(words[start:i])
+    return struct.pack(f"<{len(out)}Q", *out)
+
+
+def ewah_decode(data):
+    words = struct.unpack(f"<{len(data) // 8}Q", data)
+    pieces = []
+    i = 0
+    while i < len(words):
+        marker = words[i]
+        run = (marker >> 1) & MAX_RUN
+        literals = marker >> 33
+        if run:
+            pieces.append((b"\xff" if marker & 1 else b"\x00") * (8 * run))
+        pieces.append(struct.pack(f"<{literals}Q", *words[i + 1:i + 1 + literals]))
+        i += 1 + literals
+    return int.from_bytes(b"".join(pieces), "little")
+
+
+def bitmap_path(pack_path):
+    return pack_path[:-len(".pack")] + ".bitmap"
+
+
+class BitmapIndex:
+    def __init__(self, pack):
+        self.pack = pack
+        with open(bitmap_path(pack.pack_path), "rb") as f:
+            self.data = f.read()
+        magic, version, count, pack_sha = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION or pack_sha != pack.data[-20:]:
+            raise ValueError(f"{bitmap_path(pack.pack_path)}: bitmap invalide pour ce pack")
+        pos = HEADER.size
+        self.types = {}
+        for type_ in TYPES:
+            length, = LENGTH.unpack_from(self.data, pos)
+            self.types[type_] = (pos + 4, length)
+            pos += 4 + length
+        self.commits = {}
+        for _ in range(count):
+            oid = self.data[pos:pos + 20].hex()
+            length, = LENGTH.unpack_from(self.data, pos + 20)
+            self.commits[oid] = (pos + 24, length)
+            pos += 24 + length
+        self._decoded = {}
+
+    def _decode(self, key, location):
+        bits = self._decoded.get(key)
+        if bits is None:
+            offset, length = location
+            bits = self._decoded[key] = ewah_decode(self.data[offset:offset + length])
+        return bits
+
+    def commit_bitmap(self, oid):
+        location = self.commits.get(oid)
+        return None if location is None else self._decode(oid, location)
+
+    def type_bitmap(self, type_):
+        return self._decode(type_, self.types[type_])
+
+
+_indexes = {}
+
+
+def load(git_dir=repository.GIT_DIR_NAME):
+    """Index de bitmaps du premier pack qui en a un, ou None."""
+    for pack in packfile.packs(git_dir):
+        if not os.path.exists(bitmap_path(pack.pack_path)):
+            continue
+        cached = _indexes.get(pack.pack_path)
+        if cached is None or cached.pack is not pack:
+            try:
+                cached = _indexes[pack.pack_path] = BitmapIndex(pack)
+            except (OSError, ValueError, struct.error):
+                continue
+        return cached
+    return None
+
+
+def _links(oid, expected, git_dir):
+    """(type, liens) d'un objet ; un blob n'est décompressé en entier que
+    s'il s'agit d'une liste de morceaux."""
+    if expected in ("blob", "chunk"):
+        obj_type, head = repository.peek_object(oid, git_dir)
+        if obj_type != "blob" or not head.startswith(chunking.POINTER_HEADER):
+            return obj_type, []
+    obj_type, content = repository.read_object(oid, git_dir)
+    return obj_type, repository.object_links(obj_type, content)
+
+
+def reachable(roots, git_dir=repository.GIT_DIR_NAME, index=None, stop=None):
+    """Objets accessibles depuis `roots` : (bitmap du pack, ensemble des objets hors pack).
+
+    `stop` (bitmap, objets hors pack) marque des objets déjà connus, dont on
+    sait que tout ce qu'ils désignent est aussi connu : le parcours s'y arrête.
+    """
+    index = load(git_dir) if index is None else index
+    pack = index.pack if index else None
+    stop_bits, stop_extra = stop or (0, set())
+    # Tests de bits sur des bytearray : sur un grand entier, chaque test
+    # coûterait un parcours de tout le bitmap
+    nbytes = (pack.count + 7) // 8 if pack else 0
+    acc = 0
+    known = bytearray(stop_bits.to_bytes(nbytes, "little"))
+    walked = bytearray(nbytes)
+    extra = set()
+    stack = [(None, oid) for oid in roots]
+    while stack:
+        expected, oid = stack.pop()
+        pos = pack.find(oid) if pack else -1
+        if pos >= 0:
+            byte, bit = pos >> 3, 1 << (pos & 7)
+            if (known[byte] | walked[byte]) & bit:
+                continue
+            commit_bits = index.commit_bitmap(oid)
+            if commit_bits is not None:
+                acc |= commit_bits
+                known = bytearray((acc | stop_bits).to_bytes(nbytes, "little"))
+                continue
+            walked[byte] |= bit
+        else:
+            if oid in extra or oid in stop_extra:
+                continue
+            extra.add(oid)
+        try:
+            _, links = _links(oid, expected, git_dir)
+        except (FileNotFoundError, ValueError):
+            continue
+        stack.extend(links)
+    return acc | int.from_bytes(walked, "little"), extra
+
+
+def count_bits(bits):
+    return bin(bits).count("1")
+
+
+def count_by_type(bits, extra, index, git_dir=repository.GIT_DIR_NAME):
+    """{type: nombre} pour un résultat de reachable()."""
+    counts = dict.fromkeys(TYPES, 0)
+    if index is not None:
+        for type_ in TYPES:
+            counts[type_] += count_bits(bits & index.type_bitmap(type_))
+    for oid in extra:
+        try:
+            obj_type, _ = repository.peek_object(oid, git_dir, 0)
+        except (FileNotFoundError, ValueError):
+            continue
+        counts[obj_type] = counts.get(obj_type, 0) + 1
+    return counts
+
+
+def difference(include, exclude, git_dir=repository.GIT_DIR_NAME):
+    """Objets accessibles depuis `include` mais pas depuis `exclude` (ce qu'un
+    push doit envoyer) : retourne ({type: nombre}, total)."""
+    index = load(git_dir)
+    excluded = reachable(exclude, git_dir, index) if exclude else (0, set())
+    bits, extra = reachable(include, git_dir, index, stop=excluded)
+    counts = count_by_type(bits & ~excluded[0], extra - excluded[1], index, git_dir)
+    return counts, sum(counts.values())
+
+
+def select_commits(tips, git_dir=repository.GIT_DIR_NAME):
+    """Commits qui recevront un bitmap, du plus ancien au plus récent : les
+    pointes des références et un commit sur SELECT_EVERY."""
+    order = []
+    seen = set()
+    for tip in tips:
+        stack = [(tip, False)]
+        while stack:
+            oid, expanded = stack.pop()
+            if expanded:
+                order.append(oid)
+                continue
+            if oid in seen:
+                continue
+            seen.add(oid)
+            try:
+                obj_type, content = repository.read_object(oid, git_dir)
+            except (FileNotFoundError, ValueError):
+                continue
+            if obj_type != "commit":
+                continue
+            stack.append((oid, True))
+            stack.extend((parent, False) for parent in repository.parse_commit(content)["parent_oids"])
+    tips = set(tips)
+    return [oid for i, oid in enumerate(order) if oid in tips or (i + 1) % SELECT_EVERY == 0]
+
+
+def write_bitmaps(pack_path, tips, git_dir=repository.GIT_DIR_NAME, types=None):
+    """Calcule et écrit le fichier .bitmap d'un pack ; retourne le nombre de
+    commits couverts. `types` ({sha: type}, connu de gc) évite de relire
+    l'en-tête de chaque objet."""
+    pack = next((p for p in packfile.packs(git_dir)
+                 if os.path.abspath(p.pack_path) == os.path.abspath(pack_path)), None)
+    if pack is None:
+        return 0
+    nbytes = (pack.count + 7) // 8
+    type_bytes = {type_: bytearray(nbytes) for type_ in TYPES}
+    for i, oid in enumerate(pack.oids()):
+        obj_type = types.get(oid) if types else None
+        if obj_type is None:
+            try:
+                obj_type, _ = repository.peek_object(oid, git_dir, 0)
+            except (FileNotFoundError, ValueError):
+                continue
+        if obj_type in type_bytes:
+            type_bytes[obj_type][i >> 3] |= 1 << (i & 7)
+    type_bits = {type_: int.from_bytes(data, "little") for type_, data in type_bytes.items()}
+
+    # Les commits sont traités des plus anciens aux plus récents : chaque
+    # parcours s'arrête aux bitmaps déjà calculés de ses ancêtres
+    builder = _Builder(pack)
+    selected = []
+    for oid in select_commits(tips, git_dir):
+        if pack.find(oid) < 0:
+            continue
+        bits, _ = reachable([oid], git_dir, builder)
+        builder.bitmaps[oid] = bits
+        selected.append(oid)
+
+    tmp_path = bitmap_path(pack_path) + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(selected), pack.data[-20:]))
+        for type_ in TYPES:
+            encoded = ewah_encode(type_bits[type_])
+            f.write(LENGTH.pack(len(encoded)) + encoded)
+        for oid in selected:
+            encoded = ewah_encode(builder.bitmaps[oid])
+            f.write(bytes.fromhex(oid) + LENGTH.pack(len(encoded)) + encoded)
+    os.replace(tmp_path, bitmap_path(pack_path))
+    return len(selected)
+
+
+class _Builder:
+    """Index en cours de construction (mêmes méthodes que BitmapIndex)."""
+
+    def __init__(self, pack):
+        self.pack = pack
+        self.bitmaps = {}
+
+    def commit_bitmap(self, oid):
+        return self.bitmaps.get(oid)
@@ -0,0 +1,144 @@
+"""Attribution de chaque ligne d'un fichier au commit qui l'a introduite (blame).
+
+On remonte l'historique depuis le commit demandé en suivant le fichier :
+un commit dont la version du fichier est identique à celle d'un parent est
+traversé sans rien lire d'autre (les filtres de chemins de bloom évitent même
+de lire ses trees). La remontée s'arrête à la création du fichier, ou dès
+qu'une version a déjà été attribuée. Les versions rencontrées sont ensuite
+rejouées de la plus ancienne à la plus récente : un diff ligne à ligne reporte
+l'origine des lignes inchangées, et les lignes ajoutées ou modifiées sont
+attribuées au commit qui a produit la version.
+
+Le résultat de chaque version est mis en cache sous le commit qui l'a
+produite, le chemin et le SHA du blob (.mygit/blame/<sha1 de la clé>, JSON
+compressé) : deux fichiers au contenu identique n'ont pas le même historique.
+Après un nouveau commit, seules les versions postérieures à la dernière déjà
+attribuée sont recalculées.
+
+Pour une fusion qui diffère de tous ses parents, seul le premier parent est
+suivi : les lignes venues de l'autre branche sont attribuées à la fusion.
+"""
+import os
+import json
+import zlib
+import hashlib
+import difflib
+
+import bloom
+import repository
+import revwalk
+
+
+def cache_path(commit_oid, path, blob_oid, git_dir=repository.GIT_DIR_NAME):
+    key = hashlib.sha1(f"{commit_oid}\0{path}\0{blob_oid}".encode("utf-8")).hexdigest()
+    return os.path.join(git_dir, "blame", key[:2], key[2:])
+
+
+def read_cache(commit_oid, path, blob_oid, git_dir=repository.GIT_DIR_NAME):
+    """Origines [(commit, numéro de ligne d'origine)] de la version `blob_oid`
+    de `path` au commit `commit_oid`, ou None."""
+    try:
+        with open(cache_path(commit_oid, path, blob_oid, git_dir), "rb") as f:
+            runs = json.loads(zlib.decompress(f.read()))
+    except (FileNotFoundError, zlib.error, ValueError):
+        return None
+    origins = []
+    for commit, start, count in runs:
+        origins.extend((commit, start + i) for i in range(count))
+    return origins
+
+
+def write_cache(commit_oid, path, blob_oid, origins, git_dir=repository.GIT_DIR_NAME):
+    # Suites de lignes consécutives d'un même commit : [commit, début, nombre]
+    runs = []
+    for commit, line in origins:
+        if runs and runs[-1][0] == commit and runs[-1][1] + runs[-1][2] == line:
+            runs[-1][2] += 1
+        else:
+            runs.append([commit, line, 1])
+    cache = cache_path(commit_oid, path, blob_oid, git_dir)
+    os.makedirs(os.path.dirname(cache), exist_ok=True)
+    tmp_path = f"{cache}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(zlib.compress(json.dumps(runs, separators=(",", ":")).encode()))
+    os.replace(tmp_path, cache)
+
+
+def blob_lines(blob_oid, git_dir=repository.GIT_DIR_NAME):
+    """Lignes d'un blob (gros fichiers et fichiers découpés compris)."""
+    obj_type, data = repository.read_object(blob_oid, git_dir)
+    if obj_type != "blob":
+        raise ValueError(f"Object {blob_oid} is not a blob")
+    content = b"".join(repository.iter_blob_content(data, git_dir))
+    if b"\0" in content[:8000]:
+        raise ValueError("Fichier binaire : pas de blame possible")
+    return content.decode("utf-8", errors="replace").splitlines()
+
+
+def _file_blob(commit, path, git_dir):
+    entry = bloom.path_entry(commit["tree_oid"], path, git_dir)
+    return entry[1] if entry and entry[0] == "blob" else None
+
+
+def versions(start_oid, path, git_dir=repository.GIT_DIR_NAME):
+    """Versions du fichier à attribuer, de la plus récente à la plus ancienne :
+    ([(commit, blob)], (blob, origines) de la version en cache qui les précède,
+    ou None si la plus ancienne crée le fichier)."""
+    path = bloom.normalize(path)
+    store = bloom.FilterStore(git_dir)
+    key = bloom.path_key(path)
+    commit = revwalk.read_commit(start_oid, git_dir)
+    blob = _file_blob(commit, path, git_dir)
+    if blob is None:
+        raise FileNotFoundError(f"{path} n'existe pas dans {start_oid[:7]}")
+    chain = []
+    while True:
+        cached = read_cache(commit["oid"], path, blob, git_dir)
+        if cached is not None:
+            return chain, (blob, cached)
+        parents = commit["parent_oids"]
+        if not parents:
+            chain.append((commit, blob))
+            return chain, None
+        # Seuls les filtres déjà calculés servent : en calculer un coûterait un diff de trees
+        data = store.filters.get(commit["oid"])
+        if data is not None and not bloom.maybe_contains(data, key):
+            # Le filtre garantit que le premier parent a la même version
+            commit = revwalk.read_commit(parents[0], git_dir)
+            continue
+        parent_commits = [revwalk.read_commit(parent, git_dir) for parent in parents]
+        parent_blobs = [_file_blob(parent, path, git_dir) for parent in parent_commits]
+        if blob in parent_blobs:
+            commit = parent_commits[parent_blobs.index(blob)]
+            continue
+        chain.append((commit, blob))
+        if parent_blobs[0] is None:
+            return chain, None
+        commit, blob = parent_commits[0], parent_blobs[0]
+
+
+def blame(start_oid, path, git_dir=repository.GIT_DIR_NAME):
+    """[(commit d'origine, numéro de ligne d'origine, texte)] pour chaque ligne
+    du fichier `path` au commit `start_oid`."""
+    path = bloom.normalize(path)
+    chain, base = versions(start_oid, path, git_dir)
+    origins = lines = None
+    if base is not None:
+        origins = base[1]
+        lines = blob_lines(base[0], git_dir)
+    for commit, blob in reversed(chain):
+        previous = lines
+        lines = blob_lines(blob, git_dir)
+        if origins is None:
+            origins = [(commit["oid"], i + 1) for i in range(len(lines))]
+        else:
+            new_origins = []
+            matcher = difflib.SequenceMatcher(None, previous, lines, autojunk=False)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                if tag == "equal":
+                    new_origins.extend(origins[i1:i2])
+                else:
+                    new_origins.extend((commit["oid"], j + 1) for j in range(j1, j2))
+            origins = new_origins
+        write_cache(commit["oid"], path, blob, origins, git_dir)
+    return [(oid, line, text) for (oid, line), text in zip(origins, lines)]
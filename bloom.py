@@ -0,0 +1,254 @@
+"""Filtres de Bloom des chemins modifiés par chaque commit (log -- <chemin>).
+
+Pour chaque commit, le filtre contient les chemins qui diffèrent de son
+premier parent (tous les chemins pour un commit racine), ainsi que leurs
+dossiers parents : "src/a/b.txt" ajoute aussi "src/a" et "src". Quand le
+filtre répond non, le commit ne touche pas au chemin et aucun tree n'est lu ;
+quand il répond peut-être, on compare les entrées du chemin dans les deux
+trees (seuls les trees le long du chemin sont décompressés).
+
+.mygit/objects/info/commit-bloom :
+    "MYBL" | version | nombre de fonctions de hachage | bits par chemin
+    puis des enregistrements : SHA binaire du commit (20 octets), longueur
+    (2 octets), octets du filtre. Une longueur TOO_MANY marque un commit qui
+    modifie plus de MAX_PATHS chemins : il répond toujours peut-être.
+
+Le fichier est complété par log (filtres calculés pendant un parcours) et
+réécrit par gc pour tous les commits accessibles.
+"""
+import os
+import struct
+import hashlib
+
+import repository
+import revwalk
+
+MAGIC = b"MYBL"
+VERSION = 1
+HASHES = 7
+BITS_PER_PATH = 10
+MAX_PATHS = 512
+TOO_MANY = 0xFFFF
+HEADER = struct.Struct(">4sIHH")
+RECORD = struct.Struct(">20sH")
+
+
+def store_path(git_dir=repository.GIT_DIR_NAME):
+    return os.path.join(git_dir, "objects", "info", "commit-bloom")
+
+
+def path_key(path):
+    """Les deux hachages d'un chemin, à passer à maybe_contains."""
+    digest = hashlib.blake2b(path.encode("utf-8"), digest_size=8).digest()
+    h1, h2 = struct.unpack("<II", digest)
+    return h1, h2 | 1
+
+
+def make_filter(paths):
+    """Octets du filtre pour un ensemble de chemins (parents compris)."""
+    nbytes = max(8, (len(paths) * BITS_PER_PATH + 7) // 8)
+    nbits = nbytes * 8
+    data = bytearray(nbytes)
+    for path in paths:
+        h1, h2 = path_key(path)
+        for i in range(HASHES):
+            pos = (h1 + i * h2) % nbits
+            data[pos >> 3] |= 1 << (pos & 7)
+    return bytes(data)
+
+
+def maybe_contains(data, key):
+    """Faux si le chemin n'est certainement pas dans le filtre ; `key` vient de path_key."""
+    nbits = len(data) * 8
+    h1, h2 = key
+    for i in range(HASHES):
+        pos = (h1 + i * h2) % nbits
+        if not data[pos >> 3] & (1 << (pos & 7)):
+            return False
+    return True
+
+
+def _tree_entries(tree_oid, git_dir):
+    if not tree_oid:
+        return {}
+    obj_type, content = repository.read_object(tree_oid, git_dir)
+    if obj_type != "tree":
+        raise ValueError(f"Object {tree_oid} is not a tree")
+    return {name: (type_, oid) for type_, oid, name in repository.parse_tree(content)}
+
+
+def changed_paths(tree_oid, parent_tree_oid, git_dir=repository.GIT_DIR_NAME, limit=MAX_PATHS):
+    """Chemins (et dossiers parents) différents entre deux trees, ou None
+    s'il y en a plus de `limit`. Les sous-trees identiques ne sont pas lus."""
+    paths = set()
+    stack = [("", tree_oid, parent_tree_oid)]
+    while stack:
+        prefix, new, old = stack.pop()
+        new_entries = _tree_entries(new, git_dir)
+        old_entries = _tree_entries(old, git_dir)
+        for name in new_entries.keys() | old_entries.keys():
+            new_entry = new_entries.get(name)
+            old_entry = old_entries.get(name)
+            if new_entry == old_entry:
+                continue
+            path = prefix + name
+            paths.add(path)
+            if len(paths) > limit:
+                return None
+            # Un dossier ajouté, supprimé ou modifié : on descend pour ses fichiers
+            new_tree = new_entry[1] if new_entry and new_entry[0] == "tree" else None
+            old_tree = old_entry[1] if old_entry and old_entry[0] == "tree" else None
+            if new_tree or old_tree:
+                stack.append((path + "/", new_tree, old_tree))
+    return paths
+
+
+def path_entry(tree_oid, path, git_dir=repository.GIT_DIR_NAME):
+    """(type, sha) de l'entrée `path` d'un tree, ou None si elle n'existe pas."""
+    entry = ("tree", tree_oid)
+    for part in path.split("/"):
+        if entry is None or entry[0] != "tree":
+            return None
+        entry = _tree_entries(entry[1], git_dir).get(part)
+    return entry
+
+
+def normalize(path):
+    path = path.replace("\\", "/").strip("/")
+    while path.startswith("./"):
+        path = path[2:]
+    return path
+
+
+class FilterStore:
+    """Filtres connus {sha: octets, ou None si trop de chemins}, et ceux à ajouter."""
+
+    def __init__(self, git_dir=repository.GIT_DIR_NAME):
+        self.git_dir = git_dir
+        self.filters = {}
+        self.pending = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(store_path(self.git_dir), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        if len(data) < HEADER.size:
+            return
+        magic, version, hashes, bits = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or hashes != HASHES or bits != BITS_PER_PATH:
+            return
+        pos = HEADER.size
+        while pos + RECORD.size <= len(data):
+            oid, length = RECORD.unpack_from(data, pos)
+            pos += RECORD.size
+            if length == TOO_MANY:
+                self.filters[oid.hex()] = None
+                continue
+            if pos + length > len(data):
+                break  # enregistrement tronqué (écriture interrompue)
+            self.filters[oid.hex()] = data[pos:pos + length]
+            pos += length
+
+    def get(self, commit):
+        """Filtre du commit (dict de revwalk.read_commit), calculé s'il manque."""
+        oid = commit["oid"]
+        if oid in self.filters:
+            return self.filters[oid]
+        parent_tree = None
+        if commit["parent_oids"]:
+            try:
+                parent_tree = repository.parse_commit(
+                    repository.read_object(commit["parent_oids"][0], self.git_dir)[1])["tree_oid"]
+            except (FileNotFoundError, ValueError):
+                parent_tree = None
+        try:
+            paths = changed_paths(commit["tree_oid"], parent_tree, self.git_dir)
+        except (FileNotFoundError, ValueError):
+            paths = None  # tree illisible : le commit répondra toujours peut-être
+        data = None if paths is None else make_filter(paths)
+        self.filters[oid] = self.pending[oid] = data
+        return data
+
+    def flush(self):
+        """Ajoute au fichier les filtres calculés depuis le chargement."""
+        if not self.pending:
+            return
+        path = store_path(self.git_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        records = [_record(oid, data) for oid, data in self.pending.items()]
+        if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+            records.insert(0, HEADER.pack(MAGIC, VERSION, HASHES, BITS_PER_PATH))
+        # Un seul write en mode ajout : deux log simultanés ne s'entremêlent pas
+        with open(path, "ab") as f:
+            f.write(b"".join(records))
+        self.pending.clear()
+
+
+def _record(oid, data):
+    if data is None:
+        return RECORD.pack(bytes.fromhex(oid), TOO_MANY)
+    return RECORD.pack(bytes.fromhex(oid), len(data)) + data
+
+
+def write_filters(oids, git_dir=repository.GIT_DIR_NAME):
+    """Réécrit le fichier avec les filtres des commits `oids` (les filtres
+    déjà connus sont repris tels quels) ; retourne leur nombre."""
+    store = FilterStore(git_dir)
+    records = [HEADER.pack(MAGIC, VERSION, HASHES, BITS_PER_PATH)]
+    for oid in oids:
+        if oid not in store.filters:
+            try:
+                store.get(revwalk.read_commit(oid, git_dir))
+            except (FileNotFoundError, ValueError):
+                continue
+        data = store.filters[oid]
+        records.append(_record(oid, data))
+    path = store_path(git_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(b"".join(records))
+    os.replace(path + ".tmp", path)
+    return len(records) - 1
+
+
+class PathFilter:
+    """Décide si un commit touche l'un des chemins demandés (log -- <chemin>...)."""
+
+    def __init__(self, paths, git_dir=repository.GIT_DIR_NAME):
+        self.paths = [normalize(path) for path in paths]
+        self.keys = [path_key(path) for path in self.paths if path]
+        self.git_dir = git_dir
+        self.store = FilterStore(git_dir)
+        self.rejected = 0
+
+    def _tree(self, oid):
+        try:
+            return repository.parse_commit(repository.read_object(oid, self.git_dir)[1])["tree_oid"]
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def touches(self, commit):
+        if not self.keys:
+            return True  # "log -- ." : tout l'arbre
+        data = self.store.get(commit)
+        if data is not None and not any(maybe_contains(data, key) for key in self.keys):
+            # Identique à son premier parent pour ces chemins (une fusion
+            # identique à l'un de ses parents n'est pas affichée non plus)
+            self.rejected += 1
+            return False
+        parents = commit["parent_oids"] or [None]
+        for path in self.paths:
+            if not path:
+                continue
+            entry = path_entry(commit["tree_oid"], path, self.git_dir)
+            # Une fusion n'est affichée que si elle diffère de tous ses parents
+            if all(path_entry(self._tree(parent), path, self.git_dir) != entry if parent else entry is not None
+                   for parent in parents):
+                return True
+        return False
+
+    def close(self):
+        self.store.flush()
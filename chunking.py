@@ -0,0 +1,105 @@
+"""Découpage des fichiers selon leur contenu (content-defined chunking).
+
+Pour les fichiers de données qui changent peu d'un commit à l'autre (exports
+CSV, dumps SQL...), le blob committé ne contient que la liste des morceaux :
+
+    mygit-chunked v1
+    size <octets>
+    chunk <sha> <octets>
+    ...
+
+Chaque morceau est un objet "chunk" ordinaire de .mygit/objects, écrit une
+seule fois : deux versions d'un fichier ne diffèrent que par les morceaux
+touchés. Les frontières sont choisies par un hash roulant (gear hash, comme
+FastCDC) sur les 32 derniers octets, et non à position fixe : une ligne
+insérée ne décale pas toutes les frontières suivantes.
+
+Concernés : les motifs de .mygitchunked et, si MYGIT_CHUNK_THRESHOLD est
+défini, les fichiers d'au moins cette taille.
+"""
+import os
+import fnmatch
+import hashlib
+
+PATTERNS_FILE = ".mygitchunked"
+THRESHOLD = int(os.environ.get("MYGIT_CHUNK_THRESHOLD", 0))
+POINTER_HEADER = b"mygit-chunked v1\n"
+
+MIN_SIZE = 4 * 1024
+MAX_SIZE = 64 * 1024
+AVG_BITS = 14  # taille moyenne visée : MIN_SIZE + 16 Ko
+READ_SIZE = 1024 * 1024
+
+# Table du gear hash : 256 valeurs 32 bits fixées une fois pour toutes
+GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:4], "big") for i in range(256)]
+MASK = ((1 << AVG_BITS) - 1) << (32 - AVG_BITS)
+
+
+def is_chunked(rel_path, size, patterns):
+    if THRESHOLD and size >= THRESHOLD:
+        return True
+    rel_path = rel_path.replace("\\", "/")
+    return any(fnmatch.fnmatch(rel_path, p) or fnmatch.fnmatch(os.path.basename(rel_path), p)
+               for p in patterns)
+
+
+def find_boundary(data, start, end):
+    """Position de fin du morceau qui commence à `start`."""
+    limit = min(end, start + MAX_SIZE)
+    first = start + MIN_SIZE
+    if first >= limit:
+        return limit
+    gear = GEAR
+    mask = MASK
+    h = 0
+    pos = first
+    for byte in data[first:limit]:
+        h = ((h << 1) + gear[byte]) & 0xFFFFFFFF
+        pos += 1
+        if not h & mask:
+            return pos
+    return limit
+
+
+def split(stream):
+    """Découpe un flux binaire en morceaux sans le charger entièrement."""
+    buf = b""
+    pos = 0
+    eof = False
+    while True:
+        if not eof and len(buf) - pos < MAX_SIZE:
+            data = stream.read(READ_SIZE)
+            buf = buf[pos:] + data
+            pos = 0
+            eof = not data
+            continue
+        if pos >= len(buf):
+            return
+        cut = find_boundary(buf, pos, len(buf))
+        yield buf[pos:cut]
+        pos = cut
+
+
+def make_pointer(size, chunks):
+    lines = [f"size {size}"] + [f"chunk {sha} {length}" for sha, length in chunks]
+    return POINTER_HEADER + ("\n".join(lines) + "\n").encode()
+
+
+def parse_pointer(data):
+    """Retourne (taille, [(sha, taille)]) si le blob est une liste de morceaux."""
+    if not data.startswith(POINTER_HEADER):
+        return None
+    size = None
+    chunks = []
+    try:
+        for line in data[len(POINTER_HEADER):].decode().splitlines():
+            if line.startswith("size "):
+                size = int(line[5:])
+            elif line.startswith("chunk "):
+                _, sha, length = line.split(" ")
+                chunks.append((sha, int(length)))
+    except ValueError:
+        return None
+    if size is None:
+        return None
+    return size, chunks
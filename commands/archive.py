@@ -0,0 +1,47 @@
+import os
+import sys
+import argparse
+import archive
+import repository
+
+def run(args):
+    parser = argparse.ArgumentParser(prog="archive", description="Exporte le contenu d'un commit en tar, tar.gz ou zip")
+    parser.add_argument('rev', help="Commit, branche ou tag à exporter")
+    parser.add_argument('paths', nargs='*', help="Fichiers ou dossiers à inclure (défaut : tout le tree)")
+    parser.add_argument('--format', choices=archive.FORMATS,
+                        help="Format de l'archive (défaut : d'après -o, sinon tar)")
+    parser.add_argument('--prefix', default="", help="Dossier ajouté devant chaque chemin (ex. projet-1.0/)")
+    parser.add_argument('-o', '--output', help="Fichier à écrire (défaut : sortie standard)")
+    opts = parser.parse_intermixed_args(args)
+
+    if not os.path.exists(".mygit"):
+        print("fatal: not a git repository", file=sys.stderr)
+        sys.exit(1)
+    oid = repository.Repository().resolve_ref(opts.rev)
+    if not oid:
+        print(f"fatal: référence inconnue '{opts.rev}'", file=sys.stderr)
+        sys.exit(1)
+    fmt = opts.format or archive.format_for(opts.output)
+    paths = [path.replace("\\", "/") for path in opts.paths]
+    try:
+        chunks = archive.stream(oid, fmt, opts.prefix, paths)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"fatal: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if opts.output is None and sys.stdout.isatty():
+        print("fatal: sortie vers un terminal refusée (utilisez -o ou une redirection)", file=sys.stderr)
+        sys.exit(1)
+    out = open(opts.output, "wb") if opts.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+        out.flush()
+    except BrokenPipeError:
+        pass
+    except (FileNotFoundError, ValueError) as e:
+        print(f"fatal: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if opts.output:
+            out.close()
@@ -0,0 +1,54 @@
+import os
+import sys
+import argparse
+import blame
+import repository
+import revwalk
+
+def run(args):
+    parser = argparse.ArgumentParser(prog="blame", description="Indique pour chaque ligne le commit qui l'a introduite")
+    parser.add_argument('file', help="Chemin du fichier")
+    parser.add_argument('rev', nargs='?', default="HEAD", help="Révision (défaut : HEAD)")
+    parser.add_argument('-L', dest='range', help="Lignes à afficher : <début>,<fin>")
+    opts = parser.parse_args(args)
+
+    if not os.path.exists(".mygit"):
+        print("fatal: not a git repository", file=sys.stderr)
+        sys.exit(1)
+    repo = repository.Repository()
+    start = repo.resolve_ref(opts.rev)
+    if not start:
+        print(f"fatal: référence inconnue '{opts.rev}'", file=sys.stderr)
+        sys.exit(1)
+    first, last = 1, None
+    if opts.range:
+        try:
+            first, _, end = opts.range.partition(",")
+            first, last = int(first), int(end) if end else None
+        except ValueError:
+            print(f"fatal: intervalle invalide '{opts.range}'", file=sys.stderr)
+            sys.exit(1)
+
+    try:
+        lines = blame.blame(start, opts.file.replace("\\", "/"))
+    except (FileNotFoundError, ValueError) as e:
+        print(f"fatal: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    authors = {}
+    for oid, _, _ in lines:
+        if oid not in authors:
+            commit = revwalk.read_commit(oid)
+            date = commit["author_date"]
+            authors[oid] = (commit["author"] or "", date.strftime("%Y-%m-%d") if date else "")
+    width = max((len(author) for author, _ in authors.values()), default=0)
+    number_width = len(str(len(lines)))
+    try:
+        for number, (oid, _, text) in enumerate(lines, 1):
+            if number < first or (last is not None and number > last):
+                continue
+            author, date = authors[oid]
+            print(f"{oid[:8]} ({author:<{width}} {date} {number:>{number_width}}) {text}")
+    except BrokenPipeError:
+        # Lecteur fermé (head) : on s'arrête sans erreur
+        sys.stdout = open(os.devnull, "w")
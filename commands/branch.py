@@ -1,4 +1,7 @@
 import os
+import lockfile
+import revwalk
+import repository
 
 def get_current_branch():
     head_path = os.path.join(".mygit", "HEAD")
@@ -9,11 +12,33 @@ def get_current_branch():
                 return line.split("/")[-1]
     return "main"
 
+def describe_tracking(ahead, behind):
+    if ahead and behind:
+        return f"[en avance de {ahead}, en retard de {behind}] "
+    if ahead:
+        return f"[en avance de {ahead}] "
+    if behind:
+        return f"[en retard de {behind}] "
+    return ""
+
+def print_verbose(current_branch):
+    # Branche, commit de tête et écart avec <branche>.remote (un seul parcours pour toutes)
+    overview = revwalk.branch_overview()
+    width = max((len(entry["name"]) for entry in overview), default=0)
+    for entry in overview:
+        marker = "*" if entry["name"] == current_branch else " "
+        short = entry["oid"][:7] if entry["oid"] else "-------"
+        tracking = describe_tracking(entry["ahead"], entry["behind"])
+        print(f"{marker} {entry['name']:<{width}} {short} {tracking}{entry['subject']}")
+
 def run(args):
     branches_dir = os.path.join(".mygit", "refs", "heads")
+    if args in (["-v"], ["--verbose"]):
+        print_verbose(get_current_branch())
+        return
     if not args:
         # Afficher la liste des branches avec un astérisque sur la courante
-        branches = [f for f in os.listdir(branches_dir) if os.path.isfile(os.path.join(branches_dir, f)) and not f.endswith('.remote')]
+        branches = [f for f in os.listdir(branches_dir) if os.path.isfile(os.path.join(branches_dir, f)) and not f.endswith(('.remote', lockfile.LOCK_SUFFIX))]
         current_branch = get_current_branch()
         for branch in branches:
             if branch == current_branch:
@@ -25,11 +50,15 @@ def run(args):
     branch = args[0]
     branch_ref = os.path.join(branches_dir, branch)
     remote_ref = os.path.join(branches_dir, branch + ".remote")
-    if not os.path.exists(branch_ref):
-        with open(branch_ref, "w") as f:
-            f.write("")
-        with open(remote_ref, "w") as f:
-            f.write("")
-        print(f"Branche '{branch}' créée.")
-    else:
-        print(f"La branche '{branch}' existe déjà.")
\ No newline at end of file
+    if os.path.exists(branch_ref):
+        print(f"La branche '{branch}' existe déjà.")
+        return
+    try:
+        # La branche et son .remote sont créés ensemble, sans écraser un commit écrit entre-temps
+        with lockfile.RefTransaction() as transaction:
+            transaction.update(branch_ref, "", old=None)
+            transaction.update(remote_ref, "", old=None)
+    except lockfile.RefConflict:
+        print(f"La branche '{branch}' existe déjà.")
+        return
+    print(f"Branche '{branch}' créée.")
\ No newline at end of file
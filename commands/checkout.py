@@ -1,20 +1,16 @@
 import os
 import shutil
-import zlib
+import repository
+from profiling import phase
 
 def read_object(sha1, type_=None):
-    obj_path = os.path.join(".mygit", "objects", sha1[:2], sha1[2:])
-    if not os.path.exists(obj_path):
+    try:
+        obj_type, content = repository.read_object(sha1)
+    except FileNotFoundError:
         return None
-    with open(obj_path, "rb") as f:
-        compressed = f.read()
-    data = zlib.decompress(compressed)
-    header_end = data.find(b'\0')
-    header = data[:header_end].decode()
     if type_:
-        assert header.startswith(type_)
-    obj_type = header.split()[0]
-    return obj_type, data[header_end+1:]
+        assert obj_type.startswith(type_)
+    return obj_type, content
 
 def restore_tree(tree_hash, base_path=".", restored_files=None):
     if restored_files is None:
@@ -26,8 +22,7 @@ def restore_tree(tree_hash, base_path=".", restored_files=None):
             file_path = os.path.join(base_path, filename)
             os.makedirs(os.path.dirname(file_path), exist_ok=True) if os.path.dirname(file_path) else None
             blob_type, blob_data = read_object(blob_hash, "blob")
-            with open(file_path, "wb") as f:
-                f.write(blob_data)
+            repository.write_worktree_file(file_path, blob_hash, blob_data)
             restored_files.append(file_path)
         elif line.startswith("tree "):
             _, sub_tree_hash, dirname = line.split(" ", 2)
@@ -54,17 +49,19 @@ def restore_files_from_commit(commit_hash):
     excluded_dirs = {".mygit", ".git", ".github", "__pycache__"}
     excluded_files = {"commits.txt"}
 
-    for root, dirs, files in os.walk("."):
-        # Exclure les dossiers interdits du déplacement 
-        dirs[:] = [d for d in dirs if d not in excluded_dirs]
-        for f in files:
-            if f in excluded_files:
-                continue
-            full_path = os.path.relpath(os.path.join(root, f))
-            # Exclure les fichiers dans les dossiers pas qu'on doit pas déplacer 
-            if any(ex in full_path.split(os.sep) for ex in excluded_dirs):
-                continue
-            wd_files.append(full_path)
+    with phase("walk") as p:
+        for root, dirs, files in os.walk("."):
+            # Exclure les dossiers interdits du déplacement 
+            dirs[:] = [d for d in dirs if d not in excluded_dirs]
+            for f in files:
+                if f in excluded_files:
+                    continue
+                full_path = os.path.relpath(os.path.join(root, f))
+                # Exclure les fichiers dans les dossiers pas qu'on doit pas déplacer 
+                if any(ex in full_path.split(os.sep) for ex in excluded_dirs):
+                    continue
+                wd_files.append(full_path)
+        p.add(len(wd_files))
 
     # Récupération de tous nos fichiers du tree (récursivement)
     files_in_commit = []
@@ -106,8 +103,12 @@ def run(args):
         print(f"La branche '{branch}' n'existe pas.")
         return
     head_path = os.path.join(".mygit", "HEAD")
-    with open(head_path, "w") as f:
-        f.write(f"ref: refs/heads/{branch}\n")
+    previous = "HEAD"
+    if os.path.exists(head_path):
+        with open(head_path) as f:
+            previous = f.read().strip().split("/")[-1] or "HEAD"
+    repository.write_ref(head_path, f"ref: refs/heads/{branch}\n",
+                         message=f"checkout: moving from {previous} to {branch}")
     print(f"Branche courante : {branch}")
 
     # Restaure l'état du projet pour la branche
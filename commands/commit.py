@@ -1,9 +1,12 @@
 import os
 import argparse
 from datetime import datetime
-import hashlib
 import getpass
-import zlib
+import lockfile
+import maintenance
+import renames
+import repository
+import search
 
 def get_current_branch():
     head_path = os.path.join(".mygit", "HEAD")
@@ -15,17 +18,7 @@ def get_current_branch():
     return "main"
 
 def hash_object(data, type_="blob", write=True):
-    header = f"{type_} {len(data)}\0".encode()
-    full_data = header + data
-    sha1 = hashlib.sha1(full_data).hexdigest()
-    if write:
-        obj_dir = os.path.join(".mygit", "objects", sha1[:2])
-        obj_path = os.path.join(obj_dir, sha1[2:])
-        os.makedirs(obj_dir, exist_ok=True)
-        if not os.path.exists(obj_path):
-            with open(obj_path, "wb") as f:
-                f.write(zlib.compress(full_data))
-    return sha1
+    return repository.hash_object(data, type_, write)
 
 def build_tree(files):
     def build_tree_recursive(file_list, base_path=""):
@@ -36,10 +29,8 @@ def build_tree(files):
             if len(parts) == 1:
                 file_path = f"{base_path}/{parts[0]}" if base_path else parts[0]
                 file_path = file_path.replace("\\", "/")
-                with open(file_path, "rb") as file_content:
-                    data = file_content.read()
-                    blob_hash = hash_object(data, "blob", write=True)
-                    entries.append(f"blob {blob_hash} {parts[0]}")
+                blob_hash = repository.file_blob(file_path)
+                entries.append(f"blob {blob_hash} {parts[0]}")
             else:
                 folder, rest = parts
                 folders.setdefault(folder, []).append(rest)
@@ -69,6 +60,22 @@ def build_commit(tree_hash, parent_hash, author, message, date):
     commit_hash = hash_object(commit_data, "commit", write=True)
     return commit_hash, commit_data
 
+def find_moved_files(parent_hash, tree_hash):
+    """Renommages et copies du commit par rapport à son parent (voir renames)."""
+    if not parent_hash:
+        return []
+    repo = repository.Repository()
+    old_files = repo.tree_files(repo.read_commit(parent_hash)["tree_oid"])
+    new_files = repo.tree_files(tree_hash)
+    deleted = {path: oid for path, oid in old_files.items() if path not in new_files}
+    added = {path: oid for path, oid in new_files.items() if path not in old_files}
+    # Comme git -C : seuls les fichiers modifiés par le commit servent de source de copie
+    modified = {path: oid for path, oid in old_files.items()
+                if path in new_files and new_files[path] != oid}
+    if not added or not (deleted or modified):
+        return []
+    return renames.find_renames(deleted, added, copies=True, sources=modified)
+
 def run(args):
     parser = argparse.ArgumentParser(prog="commit", description="Enregistre les modifications indexées")
     parser.add_argument('-m', '--message', required=True, help="Message du commit")
@@ -80,8 +87,7 @@ def run(args):
         print("Aucun fichier indexé à committer.")
         return
 
-    with open(index_file, "r") as f:
-        files = [line.strip() for line in f if line.strip()]
+    files = repository.read_index()
 
     if not files:
         print("Aucun fichier indexé à committer.")
@@ -90,8 +96,11 @@ def run(args):
     author = opts.author if opts.author else getpass.getuser()
     date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    # Récupérer le parent (dernier commit de la branche)
+    # Récupérer le parent (dernier commit de la branche, ou HEAD si elle est détachée)
     branch_ref = os.path.join(".mygit", "refs", "heads", get_current_branch())
+    head = repository.Repository().head()
+    if not head.startswith("ref: "):
+        branch_ref = os.path.join(".mygit", "HEAD")
     parent_hash = None
     if os.path.exists(branch_ref):
         with open(branch_ref) as f:
@@ -103,9 +112,22 @@ def run(args):
     # Créer l'objet commit
     commit_hash, commit_data = build_commit(tree_hash, parent_hash, author, opts.message, date)
 
-    # Écrit le hash du commit dans la branche courante
-    with open(branch_ref, "w") as f:
-        f.write(commit_hash)
+    # Écrit le hash du commit dans la branche courante (ou HEAD), si elle n'a pas bougé entre-temps
+    try:
+        subject = opts.message.split("\n", 1)[0]
+        repository.write_ref(branch_ref, commit_hash, old=parent_hash,
+                             message=f"commit{'' if parent_hash else ' (initial)'}: {subject}")
+    except lockfile.RefConflict:
+        where = "HEAD" if branch_ref.endswith("HEAD") else f"La branche '{get_current_branch()}'"
+        print(f"{where} a avancé pendant le commit : relancez-le.")
+        return
+    except lockfile.LockError as e:
+        print(f"Erreur : {e}")
+        return
+
+    # Index de recherche (log --grep, /search), s'il a déjà été construit
+    if search.exists():
+        search.update([commit_hash])
 
     # Pour l'historique simple (pour le front), on garde commits.txt
     with open("commits.txt", "a", encoding="utf-8") as f:
@@ -117,6 +139,15 @@ def run(args):
         f.write("Fichiers:\n")
         for entry in tree_entries:
             f.write(f"  - {entry}\n")
+        moved = find_moved_files(parent_hash, tree_hash)
+        if moved:
+            f.write("Renommés:\n")
+            for status, old, new, score in moved:
+                f.write(f"  - {status}{score:03d} {old} -> {new}\n")
         f.write("\n")
 
-    print(f"Commit {commit_hash[:7]} effectué par {author} avec message : \"{opts.message}\" ({len(files)} fichier(s)).")
\ No newline at end of file
+    print(f"Commit {commit_hash[:7]} effectué par {author} avec message : \"{opts.message}\" ({len(files)} fichier(s)).")
+
+    # Compactage automatique si trop d'objets isolés se sont accumulés
+    if maintenance.auto_gc():
+        print("Dépôt compacté automatiquement (gc --auto).")
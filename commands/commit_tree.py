@@ -2,62 +2,22 @@ import os
 import sys
 import argparse
 from datetime import datetime
-import hashlib
 import getpass
-import zlib
+import repository
+import search
 
 def hash_object(data, type_="commit", write=True):
-    if isinstance(data, str):
-        data = data.encode('utf-8')
-    
-    header = f"{type_} {len(data)}\0".encode()
-    full_data = header + data
-    sha1 = hashlib.sha1(full_data).hexdigest()
-    
-    if write:
-        obj_dir = os.path.join(".mygit", "objects", sha1[:2])
-        obj_path = os.path.join(obj_dir, sha1[2:])
-        os.makedirs(obj_dir, exist_ok=True)
-        
-        if not os.path.exists(obj_path):
-            with open(obj_path, "wb") as f:
-                f.write(zlib.compress(full_data))
-    
-    return sha1
+    return repository.hash_object(data, type_, write)
 
 def object_exists(sha):
     if len(sha) != 40:
         return False
-    
-    obj_path = os.path.join(".mygit", "objects", sha[:2], sha[2:])
-    return os.path.exists(obj_path)
+    return repository.object_exists(sha)
 
 def read_object(sha):
-    obj_path = os.path.join(".mygit", "objects", sha[:2], sha[2:])
-    
-    if not os.path.exists(obj_path):
-        return None, None
-    
     try:
-        with open(obj_path, 'rb') as f:
-            compressed_data = f.read()
-        
-        
-        try:
-            decompressed = zlib.decompress(compressed_data)
-        except:
-            decompressed = compressed_data
-        
-        
-        null_pos = decompressed.find(b'\0')
-        if null_pos > 0:
-            header = decompressed[:null_pos].decode('utf-8')
-            content = decompressed[null_pos + 1:]
-            obj_type, size = header.split(' ')
-            return obj_type, content
-        
-        return None, None
-    except Exception:
+        return repository.read_object(sha)
+    except (FileNotFoundError, ValueError):
         return None, None
 
 def build_commit_object(tree_sha, parent_sha, author, message, date):
@@ -126,6 +86,8 @@ def run(args):
     
     # Créer l'objet commit
     commit_sha = hash_object(commit_content, "commit", write=True)
+    if search.exists():
+        search.update([commit_sha])
     
     # Afficher le SHA du commit créé
     print(commit_sha)
@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import bitmaps
+import packfile
+import repository
+
+def print_store_stats():
+    """Comme git count-objects -v : objets isolés, packs, bitmaps."""
+    loose = list(repository.loose_object_ids())
+    loose_size = sum(os.path.getsize(repository.object_path(oid)) for oid in loose)
+    packs = packfile.packs(".mygit")
+    print(f"count: {len(loose)}")
+    print(f"size: {loose_size // 1024}")
+    print(f"in-pack: {sum(pack.count for pack in packs)}")
+    print(f"packs: {len(packs)}")
+    print(f"size-pack: {sum(os.path.getsize(pack.pack_path) for pack in packs) // 1024}")
+    index = bitmaps.load()
+    print(f"bitmaps: {len(index.commits) if index else 0}")
+
+def run(args):
+    if not os.path.exists(".mygit"):
+        print("fatal: not a git repository", file=sys.stderr)
+        sys.exit(1)
+
+    if not args or args == ["-v"]:
+        print_store_stats()
+        return
+
+    # <rév>... [^<rév>...] : objets accessibles depuis les unes et pas les autres
+    repo = repository.Repository()
+    include, exclude = [], []
+    for arg in args:
+        name = arg[1:] if arg.startswith("^") else arg
+        oid = repo.resolve_ref(name)
+        if not oid:
+            print(f"fatal: référence inconnue '{name}'", file=sys.stderr)
+            sys.exit(1)
+        (exclude if arg.startswith("^") else include).append(oid)
+
+    start = time.perf_counter()
+    counts, total = bitmaps.difference(include, exclude)
+    elapsed = (time.perf_counter() - start) * 1000
+    for type_, count in counts.items():
+        if count:
+            print(f"{type_}: {count}")
+    print(f"total: {total} ({elapsed:.1f} ms, {'avec' if bitmaps.load() else 'sans'} bitmaps)")
@@ -0,0 +1,36 @@
+import os
+import sys
+import argparse
+import repository
+import revwalk
+import tags
+
+def run(args):
+    parser = argparse.ArgumentParser(prog="describe", description="Nomme un commit d'après le tag le plus proche")
+    parser.add_argument('rev', nargs='?', default="HEAD", help="Commit à décrire (défaut : HEAD)")
+    parser.add_argument('--tags', action='store_true', help="Utiliser aussi les tags légers")
+    parser.add_argument('--long', action='store_true', help="Toujours afficher <tag>-<n>-g<sha>")
+    parser.add_argument('--always', action='store_true', help="Afficher le SHA court si aucun tag n'est trouvé")
+    opts = parser.parse_args(args)
+
+    if not os.path.exists(".mygit"):
+        print("fatal: not a git repository", file=sys.stderr)
+        sys.exit(1)
+    oid = repository.Repository().resolve_ref(opts.rev)
+    try:
+        oid = revwalk.peel(oid)[0] if oid else None
+    except (FileNotFoundError, ValueError):
+        oid = None
+    if not oid:
+        print(f"fatal: référence inconnue '{opts.rev}'", file=sys.stderr)
+        sys.exit(1)
+
+    name = tags.describe(oid, all_tags=opts.tags, long=opts.long)
+    if name is None:
+        if opts.always:
+            print(oid[:tags.ABBREV])
+            return
+        print(f"fatal: aucun tag ne décrit {oid[:tags.ABBREV]}"
+              + ("" if opts.tags else " (--tags pour utiliser aussi les tags légers)"), file=sys.stderr)
+        sys.exit(1)
+    print(name)
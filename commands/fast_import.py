@@ -0,0 +1,49 @@
+import os
+import sys
+import argparse
+import fastimport
+import lockfile
+import search
+
+def run(args):
+    parser = argparse.ArgumentParser(prog="fast-import",
+                                     description="Importe un historique (flux au format git fast-import) lu sur l'entrée standard")
+    parser.add_argument('--import-marks', help="Fichier de marques d'un import précédent (:n <sha> par ligne)")
+    parser.add_argument('--export-marks', help="Fichier où écrire les marques à la fin (et à chaque checkpoint)")
+    parser.add_argument('--force', action='store_true',
+                        help="Mettre à jour les branches même si le nouveau commit ne contient pas l'ancien")
+    parser.add_argument('-q', '--quiet', action='store_true', help="N'afficher que les erreurs")
+    opts = parser.parse_args(args)
+
+    if not os.path.exists(".mygit"):
+        print("fatal: not a git repository", file=sys.stderr)
+        sys.exit(1)
+
+    importer = fastimport.Importer(sys.stdin.buffer, progress=print,
+                                   export_marks=opts.export_marks, force=opts.force)
+    try:
+        if opts.import_marks:
+            importer.import_marks(opts.import_marks)
+        importer.run()
+        importer.checkpoint()
+    except (FileNotFoundError, ValueError, lockfile.LockError, lockfile.RefConflict) as e:
+        importer.abort()
+        print(f"fatal: {e}", file=sys.stderr)
+        sys.exit(1)
+    except BaseException:
+        importer.abort()
+        raise
+    if search.exists():
+        search.update(importer.updated.values())
+
+    for ref, reason in sorted(importer.rejected.items()):
+        print(f"warning: {ref} non mise à jour : {reason}", file=sys.stderr)
+    if not opts.quiet:
+        stats = importer.stats
+        packs = ", ".join(os.path.basename(path) for path in importer.packs) or "aucun pack"
+        print(f"{stats['commit']} commit(s), {stats['tree']} tree(s), {stats['blob']} blob(s) et "
+              f"{stats['tag']} tag(s) écrits dans {packs} ({stats['duplicates']} objet(s) déjà présent(s)).")
+        print(f"{len(importer.updated)} référence(s) mise(s) à jour"
+              + (f", {stats['ignored']} changement(s) sous .mygit ignoré(s)." if stats["ignored"] else "."))
+    if importer.rejected:
+        sys.exit(1)
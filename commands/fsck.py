@@ -0,0 +1,128 @@
+import os
+import sys
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import chunking
+import largefiles
+import packfile
+import repository
+
+OBJECT_TYPES = {"blob", "tree", "commit", "tag", "chunk"}
+
+def check_object(oid):
+    """Vérifie un objet : en-tête, SHA, contenu lisible. Retourne
+    (oid, type, erreur, liens) ; l'erreur vaut None si l'objet est sain.
+
+    Les octets sont relus sur disque et décompressés ici : read_object peut
+    être remplacé par un cache (serveur de commandes), qui masquerait un objet
+    abîmé depuis sa dernière lecture."""
+    try:
+        obj_type, content = repository.decode_object(oid, repository.read_raw_object(oid))
+    except (FileNotFoundError, ValueError) as e:
+        return oid, None, str(e), []
+    if obj_type not in OBJECT_TYPES:
+        return oid, obj_type, f"unknown object type '{obj_type}'", []
+    # hashlib et zlib relâchent le GIL : les threads travaillent vraiment en parallèle
+    actual = hashlib.sha1(f"{obj_type} {len(content)}\0".encode() + content).hexdigest()
+    if actual != oid:
+        return oid, obj_type, f"hash mismatch (contenu de {actual})", []
+    try:
+        links = repository.object_links(obj_type, content)
+    except (ValueError, IndexError, UnicodeDecodeError) as e:
+        return oid, obj_type, f"unparseable {obj_type}: {e}", []
+    bad = [sha for _, sha in links if not repository.is_sha(sha)]
+    if bad:
+        return oid, obj_type, f"invalid reference '{bad[0]}'", []
+    if obj_type == "commit" and not repository.parse_commit(content)["tree_oid"]:
+        return oid, obj_type, "commit without tree", []
+    if obj_type == "blob":
+        error = check_blob_pointer(content)
+        if error:
+            return oid, obj_type, error, links
+    return oid, obj_type, None, links
+
+def check_blob_pointer(content):
+    """Vérifie ce que désigne un pointeur (liste de morceaux, gros fichier)."""
+    chunk_list = chunking.parse_pointer(content)
+    if chunk_list is not None:
+        size, chunks = chunk_list
+        if sum(length for _, length in chunks) != size:
+            return "chunk list size mismatch"
+        return None
+    pointer = largefiles.parse_pointer(content)
+    if pointer is None:
+        return None
+    oid, size = pointer
+    if not os.path.exists(largefiles.store_path(oid, ".mygit")):
+        return f"missing large file {oid}"
+    actual, actual_size = largefiles.hash_file(largefiles.store_path(oid, ".mygit"))
+    if actual != oid or actual_size != size:
+        return f"large file {oid} is corrupted"
+    return None
+
+def run(args):
+    parser = argparse.ArgumentParser(prog="fsck", description="Vérifie l'intégrité et la connectivité des objets")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help="Nombre de threads de vérification")
+    parser.add_argument('--no-dangling', action='store_true', help="Ne pas lister les objets pendants")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Afficher chaque objet vérifié")
+    opts = parser.parse_args(args)
+
+    if not os.path.exists(".mygit"):
+        print("fatal: not a git repository", file=sys.stderr)
+        sys.exit(1)
+
+    errors = 0
+    for pack in packfile.packs(".mygit"):
+        if not pack.verify():
+            print(f"error: {os.path.basename(pack.pack_path)}: pack checksum mismatch")
+            errors += 1
+
+    # 1. Vérification de chaque objet (isolé ou empaqueté), en parallèle
+    oids = repository.all_object_ids()
+    types = {}
+    links = {}
+    with ThreadPoolExecutor(max_workers=max(1, opts.jobs)) as pool:
+        for oid, obj_type, error, obj_links in pool.map(check_object, oids, chunksize=64):
+            if error:
+                print(f"error: {oid}: {error}")
+                errors += 1
+            elif opts.verbose:
+                print(f"ok {obj_type} {oid}")
+            types[oid] = obj_type
+            links[oid] = obj_links
+
+    # 2. Connectivité depuis toutes les références (y compris .remote)
+    refs = repository.all_refs()
+    referenced = set()
+    for obj_links in links.values():
+        referenced.update(sha for _, sha in obj_links)
+    reachable = set()
+    missing = {}
+    # Une référence peut désigner un commit ou un tag : type attendu inconnu
+    stack = [(None, oid, name) for name, oid in refs.items()]
+    while stack:
+        expected, oid, source = stack.pop()
+        if oid in reachable or oid in missing:
+            continue
+        if oid not in types:
+            missing[oid] = (expected or "object", source)
+            continue
+        reachable.add(oid)
+        if expected and types[oid] and expected != types[oid]:
+            print(f"error: {source}: {oid} est un {types[oid]}, {expected} attendu")
+            errors += 1
+        stack.extend((type_, sha, oid) for type_, sha in links[oid])
+
+    for oid, (expected, source) in sorted(missing.items()):
+        print(f"missing {expected} {oid} (référencé par {source})")
+    if not opts.no_dangling:
+        for oid in oids:
+            if oid not in reachable and oid not in referenced and types.get(oid):
+                print(f"dangling {types[oid]} {oid}")
+
+    unreachable = len(oids) - len(reachable)
+    print(f"{len(oids)} objet(s) vérifié(s), {len(refs)} référence(s), "
+          f"{unreachable} inaccessible(s), {len(missing)} manquant(s), {errors} erreur(s).")
+    if errors or missing:
+        sys.exit(1)
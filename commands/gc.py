@@ -0,0 +1,45 @@
+import os
+import sys
+import argparse
+import maintenance
+
+def run(args):
+    parser = argparse.ArgumentParser(prog="gc", description="Supprime les objets inaccessibles et recompacte le dépôt")
+    parser.add_argument('--prune', default="14d",
+                        help="Délai de grâce des objets inaccessibles : now, 14d, 12h... (défaut : 14d)")
+    parser.add_argument('--auto', action='store_true',
+                        help="Ne rien faire tant qu'il y a moins de MYGIT_GC_AUTO objets isolés")
+    parser.add_argument('-q', '--quiet', action='store_true', help="N'afficher que les erreurs")
+    opts = parser.parse_args(args)
+
+    if not os.path.exists(".mygit"):
+        print("fatal: not a git repository", file=sys.stderr)
+        sys.exit(1)
+
+    if opts.auto:
+        stats = maintenance.auto_gc()
+        if stats and not opts.quiet:
+            print_stats(stats)
+        return
+
+    try:
+        grace = maintenance.parse_grace(opts.prune)
+    except ValueError as e:
+        print(f"fatal: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not maintenance.acquire_lock():
+        print("fatal: un autre gc est en cours (.mygit/gc.pid)", file=sys.stderr)
+        sys.exit(1)
+    try:
+        stats = maintenance.collect_garbage(grace=grace)
+    finally:
+        maintenance.release_lock()
+    if not opts.quiet:
+        print_stats(stats)
+
+def print_stats(stats):
+    print(f"{stats['reachable']} objet(s) accessible(s), {stats['packed']} empaqueté(s) "
+          f"dans {os.path.basename(stats['pack'])} ({stats['bitmaps']} bitmap(s) de commits, "
+          f"{stats['bloom_filters']} filtre(s) de chemins, {stats['commit_graph']} commit(s) dans le graphe)")
+    print(f"{stats['pruned']} objet(s) isolé(s) et {stats['large_pruned']} gros fichier(s) supprimé(s), "
+          f"{stats['reflog_expired']} entrée(s) de reflog expirée(s).")
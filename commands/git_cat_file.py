@@ -1,31 +1,93 @@
 import sys
 import os
-import zlib
+import repository
+
+def resolve_name(name):
+    """Accepte un SHA complet, HEAD ou un nom de branche."""
+    if len(name) == 40 and all(c in "0123456789abcdef" for c in name):
+        return name
+    if name == "HEAD":
+        head_path = os.path.join(".mygit", "HEAD")
+        if os.path.exists(head_path):
+            with open(head_path) as f:
+                line = f.read().strip()
+            if not line.startswith("ref:"):
+                return line or None
+            name = line.split("/")[-1]
+    ref_path = os.path.join(".mygit", "refs", "heads", name)
+    if name and "/" not in name and os.path.isfile(ref_path):
+        with open(ref_path) as f:
+            return f.read().strip() or None
+    return None
+
+def read_object(sha1):
+    """Retourne (type, contenu) ou None si l'objet n'existe pas."""
+    try:
+        return repository.read_object(sha1)
+    except FileNotFoundError:
+        return None
+
+def read_header(sha1):
+    """(type, taille) sans décompresser le contenu, ou None si l'objet n'existe pas."""
+    try:
+        return repository.object_header(sha1)
+    except FileNotFoundError:
+        return None
+
+def run_batch(check_only):
+    """Lit un nom d'objet par ligne sur stdin et écrit "<sha> <type> <taille>"
+    (suivi du contenu sauf en --batch-check, qui ne lit que l'en-tête), avec
+    un flush par objet pour pouvoir être piloté comme un pipe interactif."""
+    stdin = sys.stdin.buffer
+    out = sys.stdout.buffer
+    while True:
+        line = stdin.readline()
+        if not line:
+            break
+        name = line.decode(errors="replace").strip()
+        if not name:
+            continue
+        sha1 = resolve_name(name)
+        obj = None
+        try:
+            if sha1:
+                obj = read_header(sha1) if check_only else read_object(sha1)
+        except ValueError:
+            obj = None
+        if obj is None:
+            out.write(f"{name} missing\n".encode())
+        elif check_only:
+            obj_type, size = obj
+            out.write(f"{sha1} {obj_type} {size}\n".encode())
+        else:
+            obj_type, content = obj
+            out.write(f"{sha1} {obj_type} {len(content)}\n".encode())
+            out.write(content)
+            out.write(b"\n")
+        out.flush()
 
 def run(args):
+    if len(args) == 1 and args[0] in ("--batch", "--batch-check"):
+        run_batch(args[0] == "--batch-check")
+        return
+
     if len(args) != 2 or args[0] not in ("-p", "-t"):
         print("usage: mygit cat-file -p|-t <sha1>")
+        print("       mygit cat-file --batch|--batch-check < liste_de_sha1")
         sys.exit(1)
 
-    sha1 = args[1]
-    path = f".git/objects/{sha1[:2]}/{sha1[2:]}"
-    
-    if not os.path.exists(path):
-        print(f"fatal: object {sha1} not found")
+    sha1 = resolve_name(args[1]) or args[1]
+    try:
+        obj = read_header(sha1) if args[0] == "-t" else read_object(sha1)
+    except ValueError as e:
+        print(f"fatal: {e}", file=sys.stderr)
         sys.exit(1)
 
-    with open(path, 'rb') as f:
-        compressed = f.read()
-
-    decompressed = zlib.decompress(compressed)
-
-    null_index = decompressed.find(b'\x00')
-    header = decompressed[:null_index]
-    content = decompressed[null_index + 1:]
+    if obj is None:
+        print(f"fatal: object {args[1]} not found")
+        sys.exit(1)
 
     if args[0] == "-p":
-        print(content.decode(), end='')
+        print(obj[1].decode(errors="replace"), end='')
     elif args[0] == "-t":
-        type_str = header.decode().split()[0]
-        print(type_str)
-
+        print(obj[0])
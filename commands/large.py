@@ -0,0 +1,64 @@
+import os
+import sys
+import chunking
+import largefiles
+import repository
+
+def list_large_files(tree_hash, base_path=""):
+    """Retourne [(chemin, sha256, taille)] pour les pointeurs d'un tree."""
+    found = []
+    _, tree_data = repository.read_object(tree_hash)
+    for type_, sha, name in repository.parse_tree(tree_data):
+        path = f"{base_path}/{name}" if base_path else name
+        if type_ == "tree":
+            found.extend(list_large_files(sha, path))
+            continue
+        _, blob_data = repository.read_object(sha)
+        pointer = largefiles.parse_pointer(blob_data)
+        if pointer is not None:
+            found.append((path, pointer[0], pointer[1]))
+    return found
+
+def run(args):
+    if not os.path.exists(".mygit"):
+        print("fatal: not a git repository", file=sys.stderr)
+        sys.exit(1)
+
+    action = args[0] if args else "ls"
+    if action in ("chunk", "unchunk"):
+        # Même gestion des motifs, pour les fichiers découpés en morceaux
+        patterns_file = chunking.PATTERNS_FILE
+        action = "track" if action == "chunk" else "untrack"
+    else:
+        patterns_file = largefiles.PATTERNS_FILE
+    patterns = largefiles.read_patterns(".", patterns_file)
+    if action == "track":
+        if len(args) < 2:
+            # Sans motif : affiche la configuration actuelle
+            if patterns_file == largefiles.PATTERNS_FILE:
+                print(f"Seuil : {largefiles.THRESHOLD} octets")
+            for pattern in patterns:
+                print(f"  {pattern}")
+            return
+        new_patterns = [p for p in args[1:] if p not in patterns]
+        largefiles.write_patterns(".", patterns + new_patterns, patterns_file)
+        for pattern in new_patterns:
+            print(f"Motif ajouté à {patterns_file} : {pattern}")
+    elif action == "untrack":
+        remaining = [p for p in patterns if p not in args[1:]]
+        largefiles.write_patterns(".", remaining, patterns_file)
+        for pattern in set(patterns) - set(remaining):
+            print(f"Motif retiré : {pattern}")
+    elif action == "ls":
+        repo = repository.Repository()
+        head = repo.resolve_ref("HEAD")
+        if not head:
+            print("Aucun commit.")
+            return
+        for path, oid, size in list_large_files(repo.read_commit(head)["tree_oid"]):
+            present = os.path.exists(largefiles.store_path(oid, ".mygit"))
+            print(f"{oid[:10]} {size:>12} {'*' if present else '-'} {path}")
+    else:
+        print("usage: mygit large track [<motif>...] | untrack <motif>... | ls")
+        print("       mygit large chunk [<motif>...] | unchunk <motif>...")
+        sys.exit(1)
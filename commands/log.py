@@ -1,177 +1,16 @@
+import os
 import sys
-import zlib
-import hashlib
-from pathlib import Path
-from typing import Optional, List, Union
+import itertools
+import subprocess
 from datetime import datetime
+from typing import List, Optional
 
-
-def safe_read_text(file_path: Path, encoding: str = 'utf-8') -> str:
-    """Lecture sécurisée d'un fichier texte avec gestion d'erreurs."""
-    try:
-        content = file_path.read_text(encoding=encoding)
-        if isinstance(content, list):
-            content = '\n'.join(str(item) for item in content)
-        elif not isinstance(content, str):
-            content = str(content)
-        return content.strip()
-    except UnicodeDecodeError:
-        try:
-            content = file_path.read_text(encoding='latin-1')
-            if isinstance(content, list):
-                content = '\n'.join(str(item) for item in content)
-            elif not isinstance(content, str):
-                content = str(content)
-            return content.strip()
-        except Exception:
-            return ""
-
-
-def find_git_repository(start_path: Path = None) -> Path:
-    """Trouve le repository Git en remontant l'arborescence."""
-    if start_path is None:
-        start_path = Path.cwd()
-    
-    current = start_path.resolve()
-    
-    while current != current.parent:
-        if (current / ".git").exists():
-            return current
-        current = current.parent
-    
-    raise RuntimeError("Not in a git repository")
-
-
-def resolve_ref(git_dir: Path, ref: str) -> Optional[str]:
-    """Résout une référence vers son SHA-1."""
-    # Si c'est déjà un SHA-1, le retourner
-    if len(ref) == 40 and all(c in '0123456789abcdef' for c in ref):
-        return ref
-    
-    # Si c'est HEAD
-    if ref == "HEAD":
-        head_file = git_dir / "HEAD"
-        if head_file.exists():
-            head_content = safe_read_text(head_file)
-            if head_content.startswith("ref: "):
-                # HEAD pointe vers une branche
-                branch_ref = head_content[5:]  # Enlever "ref: "
-                return resolve_ref(git_dir, branch_ref)
-            else:
-                # HEAD pointe directement vers un commit
-                return head_content
-    
-    # Si c'est une référence complète (refs/heads/main)
-    if ref.startswith("refs/"):
-        ref_file = git_dir / ref
-        if ref_file.exists():
-            return safe_read_text(ref_file)
-    
-    # Si c'est juste un nom de branche
-    branch_file = git_dir / "refs" / "heads" / ref
-    if branch_file.exists():
-        return safe_read_text(branch_file)
-    
-    return None
-
-
-def read_git_object(git_dir: Path, oid: str) -> dict:
-    """Lit un objet Git depuis le disque et retourne ses informations."""
-    objects_dir = git_dir / "objects"
-    obj_dir = objects_dir / oid[:2]
-    obj_file = obj_dir / oid[2:]
-    
-    if not obj_file.exists():
-        raise FileNotFoundError(f"Object {oid} not found")
-    
-    # Lire et décompresser
-    compressed = obj_file.read_bytes()
-    try:
-        serialized = zlib.decompress(compressed)
-    except zlib.error:
-        raise ValueError(f"Object {oid} is corrupted")
-    
-    # Parser l'en-tête
-    null_pos = serialized.find(b'\0')
-    if null_pos == -1:
-        raise ValueError(f"Object {oid} has invalid format")
-    
-    header = serialized[:null_pos].decode('utf-8', errors='replace')
-    content = serialized[null_pos + 1:]
-    
-    try:
-        obj_type, size_str = header.split(' ', 1)
-        expected_size = int(size_str)
-    except ValueError:
-        raise ValueError(f"Object {oid} has invalid header: {header}")
-    
-    if len(content) != expected_size:
-        raise ValueError(f"Object {oid} size mismatch")
-    
-    return {
-        'type': obj_type,
-        'content': content,
-        'size': expected_size
-    }
-
-
-def parse_commit(content: bytes) -> dict:
-    """Parse le contenu d'un commit Git."""
-    text = content.decode('utf-8', errors='replace')
-    lines = text.split('\n')
-    
-    tree_oid = None
-    parent_oids = []
-    author = None
-    author_date = None
-    committer = None
-    committer_date = None
-    message_start = 0
-    
-    for i, line in enumerate(lines):
-        if line.startswith("tree "):
-            tree_oid = line[5:]
-        elif line.startswith("parent "):
-            parent_oids.append(line[7:])
-        elif line.startswith("author "):
-            # Format: author Name <email> timestamp timezone
-            parts = line[7:].rsplit(' ', 2)
-            if len(parts) >= 3:
-                author = parts[0]
-                try:
-                    timestamp = int(parts[1])
-                    author_date = datetime.fromtimestamp(timestamp)
-                except (ValueError, OSError):
-                    author_date = None
-            else:
-                author = line[7:]
-        elif line.startswith("committer "):
-            # Format: committer Name <email> timestamp timezone
-            parts = line[10:].rsplit(' ', 2)
-            if len(parts) >= 3:
-                committer = parts[0]
-                try:
-                    timestamp = int(parts[1])
-                    committer_date = datetime.fromtimestamp(timestamp)
-                except (ValueError, OSError):
-                    committer_date = None
-            else:
-                committer = line[10:]
-        elif line == "":
-            message_start = i + 1
-            break
-    
-    message = '\n'.join(lines[message_start:])
-    
-    return {
-        'tree_oid': tree_oid,
-        'parent_oids': parent_oids,
-        'author': author,
-        'author_date': author_date,
-        'committer': committer,
-        'committer_date': committer_date,
-        'message': message
-    }
+import bitmaps
+import bloom
+import reflog
+import repository
+import revwalk
+import search
 
 
 def format_commit_oneline(commit_oid: str, commit_data: dict) -> str:
@@ -185,6 +24,8 @@ def format_commit_detailed(commit_oid: str, commit_data: dict) -> str:
     """Formate un commit avec tous les détails."""
     lines = []
     lines.append(f"commit {commit_oid}")
+    if len(commit_data['parent_oids']) > 1:
+        lines.append("Merge: " + " ".join(oid[:7] for oid in commit_data['parent_oids']))
     
     if commit_data['author']:
         if commit_data['author_date']:
@@ -205,6 +46,107 @@ def format_commit_detailed(commit_oid: str, commit_data: dict) -> str:
     return '\n'.join(lines)
 
 
+def parse_revisions(repo, revisions: List[str], all_refs: bool):
+    """Sépare les révisions en (à inclure, à exclure) : B, ^A et A..B."""
+    include, exclude = [], []
+    if all_refs:
+        include.extend(repository.all_refs(repo.git_dir).values())
+    for rev in revisions:
+        if ".." in rev:
+            left, right = rev.split("..", 1)
+            pairs = [(left or "HEAD", exclude), (right or "HEAD", include)]
+        elif rev.startswith("^"):
+            pairs = [(rev[1:], exclude)]
+        else:
+            pairs = [(rev, include)]
+        for name, target in pairs:
+            oid = repo.resolve_ref(name)
+            if not oid:
+                raise ValueError(f"Could not resolve reference '{name}'")
+            target.append(oid)
+    if not include and not all_refs:
+        head = repo.resolve_ref("HEAD")
+        if head:
+            include.append(head)
+    return include, exclude
+
+
+def reflog_commits(repo, revisions: List[str]):
+    """Commits des entrées du reflog (log -g), de la plus récente à la plus
+    ancienne, avec leur sélecteur <ref>@{n} et leur message de reflog."""
+    shown = revisions[0] if revisions else "HEAD"
+    name = reflog.ref_name(shown, repo.git_dir)
+    for n, entry in enumerate(reflog.entries(name, repo.git_dir)):
+        try:
+            commit = dict(revwalk.read_commit(entry["new"], repo.git_dir))
+        except (FileNotFoundError, ValueError):
+            continue
+        commit["reflog"] = (f"{shown}@{{{n}}}", entry["message"],
+                            datetime.fromtimestamp(entry["timestamp"]))
+        yield commit
+
+
+def format_reflog_entry(commit: dict, oneline: bool) -> str:
+    selector, message, date = commit["reflog"]
+    if oneline:
+        return f"{commit['oid'][:7]} {selector}: {message}"
+    lines = format_commit_detailed(commit["oid"], commit).split("\n")
+    lines[1:1] = [f"Reflog: {selector} ({date.strftime('%a %b %d %H:%M:%S %Y')})",
+                  f"Reflog message: {message}"]
+    return "\n".join(lines)
+
+
+def parse_date(value: str) -> Optional[int]:
+    """Timestamp de --since / --until : "AAAA-MM-JJ[ HH:MM:SS]" ou un timestamp."""
+    if value.isdigit():
+        return int(value)
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return int(datetime.strptime(value, fmt).timestamp())
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date: {value}")
+
+
+def search_commits(git_dir, include, exclude, grep, author, since, until):
+    """Commits de l'index de recherche accessibles depuis `include` et pas
+    depuis `exclude`, du plus récent au plus ancien.
+
+    Seuls les commits trouvés par l'index sont lus ; l'accessibilité est
+    testée sur les bitmaps de gc.
+    """
+    search.update(include + exclude, git_dir)
+    index = search.CommitIndex(git_dir)
+    try:
+        matches = index.query(search.query_terms(grep, author), since, until)
+    finally:
+        index.close()
+    bitmap_index = bitmaps.load(git_dir)
+    excluded = bitmaps.reachable(exclude, git_dir, bitmap_index) if exclude else (0, set())
+    bits, extra = bitmaps.reachable(include, git_dir, bitmap_index, stop=excluded)
+    pack = bitmap_index.pack
+    nbytes = (pack.count + 7) // 8
+    selected = bytearray((bits & ~excluded[0]).to_bytes(nbytes, "little"))
+    extra -= excluded[1]
+    for oid, _ in matches:
+        pos = pack.find(oid)
+        if (selected[pos >> 3] & (1 << (pos & 7)) if pos >= 0 else oid in extra):
+            yield revwalk.read_commit(oid, git_dir)
+
+
+def open_pager(enabled: bool):
+    """Lance le pager (MYGIT_PAGER, PAGER ou less) si la sortie est un terminal."""
+    if not enabled or not sys.stdout.isatty():
+        return None
+    command = os.environ.get("MYGIT_PAGER", os.environ.get("PAGER", "less -FRX"))
+    if command in ("", "cat"):
+        return None
+    try:
+        return subprocess.Popen(command, shell=True, stdin=subprocess.PIPE, text=True, encoding="utf-8")
+    except OSError:
+        return None
+
+
 def run_log(args: List[str] = None):
     """Exécute la commande log de manière indépendante."""
     if args is None:
@@ -213,13 +155,50 @@ def run_log(args: List[str] = None):
     # Parser les arguments
     max_count = None
     oneline = False
-    start_ref = "HEAD"
+    all_refs = False
+    first_parent = False
+    walk_reflogs = False
+    order = "date"
+    use_pager = True
+    grep = author = None
+    since = until = None
+    revisions = []
+    paths = []
     
     i = 0
     while i < len(args):
         arg = args[i]
         if arg == "--oneline":
             oneline = True
+        elif arg == "--all":
+            all_refs = True
+        elif arg == "--first-parent":
+            first_parent = True
+        elif arg in ("-g", "--walk-reflogs"):
+            walk_reflogs = True
+        elif arg == "--topo-order":
+            order = "topo"
+        elif arg == "--date-order":
+            order = "date"
+        elif arg == "--no-pager":
+            use_pager = False
+        elif arg.split("=", 1)[0] in ("--grep", "--author", "--since", "--until"):
+            option, separator, value = arg.partition("=")
+            if not separator and i + 1 < len(args):
+                value = args[i + 1]
+                i += 1
+            try:
+                if option == "--grep":
+                    grep = value
+                elif option == "--author":
+                    author = value
+                elif option == "--since":
+                    since = parse_date(value)
+                else:
+                    until = parse_date(value)
+            except ValueError as e:
+                print(f"Error: {e}")
+                sys.exit(1)
         elif arg.startswith("-n") or arg.startswith("--max-count="):
             if arg.startswith("--max-count="):
                 try:
@@ -240,75 +219,68 @@ def run_log(args: List[str] = None):
                 except ValueError:
                     print(f"Error: Invalid max-count value: {arg}")
                     sys.exit(1)
+        elif arg == "--":
+            paths = args[i + 1:]
+            break
         elif not arg.startswith("-"):
-            # C'est probablement une référence (branche, commit, etc.)
-            start_ref = arg
+            # Une révision : branche, commit, ^exclue ou intervalle A..B
+            revisions.append(arg)
         i += 1
     
     try:
-        # Trouver le repository
-        repo_root = find_git_repository()
-        git_dir = repo_root / ".git"
-        
-        # Commencer depuis la référence spécifiée
-        current_oid = resolve_ref(git_dir, start_ref)
-        if not current_oid:
-            print(f"Error: Could not resolve reference '{start_ref}'")
-            sys.exit(1)
-        
-        # Parcourir l'historique
-        visited = set()
-        count = 0
-        
-        while current_oid and current_oid not in visited:
-            # Vérifier la limite de count
-            if max_count is not None and count >= max_count:
-                break
-            
-            visited.add(current_oid)
-            
-            try:
-                # Lire l'objet commit
-                obj_data = read_git_object(git_dir, current_oid)
-                
-                # Vérifier que c'est bien un commit
-                if obj_data['type'] != 'commit':
-                    print(f"Error: Object {current_oid} is not a commit")
-                    break
-                
-                # Parser le commit
-                commit_data = parse_commit(obj_data['content'])
-                
-                # Afficher les informations du commit
-                if oneline:
-                    print(format_commit_oneline(current_oid, commit_data))
-                else:
-                    print(format_commit_detailed(current_oid, commit_data))
-                
-                count += 1
-                
-                # Passer au parent (pour simplifier, on prend juste le premier)
-                if commit_data['parent_oids']:
-                    current_oid = commit_data['parent_oids'][0]
-                else:
-                    break
-                    
-            except FileNotFoundError:
-                print(f"Error: Commit {current_oid} not found")
-                break
-            except Exception as e:
-                print(f"Error reading commit {current_oid}: {e}")
-                break
-                
-    except RuntimeError as e:
-        print(f"Error: {e}")
-        sys.exit(1)
-    except Exception as e:
+        repo = repository.Repository(discover=True)
+        include, exclude = parse_revisions(repo, revisions, all_refs)
+    except (RuntimeError, ValueError) as e:
         print(f"Error: {e}")
-        import traceback
-        traceback.print_exc()
         sys.exit(1)
 
+    # Les commits sont lus et affichés au fur et à mesure : log | head s'arrête tout de suite
+    searching = grep or author or since is not None or until is not None
+    if walk_reflogs:
+        # Le reflog est lu depuis la fin : -n 10 ne lit que dix entrées
+        commits = reflog_commits(repo, revisions)
+    elif searching and order == "date" and not first_parent and not paths and bitmaps.load(repo.git_dir):
+        commits = search_commits(repo.git_dir, include, exclude, grep, author, since, until)
+    else:
+        commits = revwalk.walk(include, exclude, order, first_parent, repo.git_dir)
+        if searching:
+            # Sans bitmaps (ou avec un autre ordre), l'index sert de filtre au parcours
+            search.update(include + exclude, repo.git_dir)
+            index = search.CommitIndex(repo.git_dir)
+            matching = {oid for oid, _ in index.query(search.query_terms(grep, author), since, until)}
+            index.close()
+            commits = (commit for commit in commits if commit["oid"] in matching)
+    path_filter = bloom.PathFilter(paths, repo.git_dir) if paths else None
+    if path_filter:
+        commits = (commit for commit in commits if path_filter.touches(commit))
+    if max_count is not None:
+        commits = itertools.islice(commits, max(max_count, 0))
+    pager = open_pager(use_pager)
+    out = pager.stdin if pager else sys.stdout
+    try:
+        for commit in commits:
+            if walk_reflogs:
+                out.write(format_reflog_entry(commit, oneline) + "\n")
+            elif oneline:
+                out.write(format_commit_oneline(commit["oid"], commit) + "\n")
+            else:
+                out.write(format_commit_detailed(commit["oid"], commit) + "\n")
+        out.flush()
+    except BrokenPipeError:
+        # Pager quitté ou lecteur fermé (head) : on s'arrête sans erreur
+        if not pager:
+            sys.stdout = open(os.devnull, "w")
+    finally:
+        if path_filter:
+            # Les filtres calculés pendant ce parcours servent aux suivants
+            path_filter.close()
+        if pager:
+            try:
+                pager.stdin.close()
+            except BrokenPipeError:
+                pass
+            pager.wait()
+
 
 if __name__ == "__main__":
     # Quand appelé directement, utiliser sys.argv
@@ -1,16 +1,12 @@
 import os
 import sys
 import argparse
-import hashlib
+import repository
 from pathlib import Path
 
 def hash_file_content(file_path):
     try:
-        with open(file_path, 'rb') as f:
-            content = f.read()
-        header = f"blob {len(content)}\0".encode()
-        full_data = header + content
-        return hashlib.sha1(full_data).hexdigest()
+        return repository.file_blob(file_path, write=False)
     except:
         return "0" * 40
 
@@ -1,7 +1,8 @@
 import os
 import argparse
-import hashlib
-import zlib
+import maintenance
+import repository
+from profiling import phase
 
 def list_files_recursively(paths):
     all_files = []
@@ -25,37 +26,34 @@ def run(args):
 
     opts = parser.parse_args(args)
 
-    if opts.all:
-        files = []
-        for root, _, filenames in os.walk('.'):
-            if ".git" in root or ".mygit" in root:
-                continue
-            for f in filenames:
-                full_path = os.path.join(root, f)
-                if (
-                    not f.startswith('.') and
-                    not f.endswith('.pyc') and
-                    "__pycache__" not in full_path
-                    and ".git" not in full_path
-                    and ".mygit" not in full_path
-                ):
-                    files.append(os.path.relpath(full_path))
-    else:
-        files = [
-            f for f in list_files_recursively(opts.files)
-            if "__pycache__" not in f and ".git" not in f and ".mygit" not in f
-        ]
+    with phase("walk") as p:
+        if opts.all:
+            files = []
+            for root, _, filenames in os.walk('.'):
+                if ".git" in root or ".mygit" in root:
+                    continue
+                for f in filenames:
+                    full_path = os.path.join(root, f)
+                    if (
+                        not f.startswith('.') and
+                        not f.endswith('.pyc') and
+                        "__pycache__" not in full_path
+                        and ".git" not in full_path
+                        and ".mygit" not in full_path
+                    ):
+                        files.append(os.path.relpath(full_path))
+        else:
+            files = [
+                f for f in list_files_recursively(opts.files)
+                if "__pycache__" not in f and ".git" not in f and ".mygit" not in f
+            ]
+        p.add(len(files))
 
     if not files:
         print("Aucun fichier à ajouter.")
         return
 
-    index_file = ".mygit/index"
-    if os.path.exists(index_file):
-        with open(index_file, "r") as f:
-            index_files = set(line.strip() for line in f.readlines())
-    else:
-        index_files = set()
+    index_files = set(repository.read_index())
 
     new_files = [f for f in files if f not in index_files]
 
@@ -67,25 +65,10 @@ def run(args):
             if opts.verbose:
                 print(f"{norm_path} ajouté à l'index")
             try:
-                with open(f, "rb") as file_content:
-                    data = file_content.read()
-                    header = f"blob {len(data)}\0".encode()
-                    full_data = header + data
-                    sha1 = hashlib.sha1(full_data).hexdigest()
-                    obj_dir = os.path.join(".mygit", "objects", sha1[:2])
-                    obj_path = os.path.join(obj_dir, sha1[2:])
-                    os.makedirs(obj_dir, exist_ok=True)
-                    if not os.path.exists(obj_path):
-                        with open(obj_path, "wb") as fobj:
-                            fobj.write(zlib.compress(full_data))
+                repository.file_blob(f)
             except Exception as e:
                 print(f"Erreur lors de la création du blob pour {f}: {e}")
 
-    if not opts.dry_run and new_files:
-        with open(index_file, "a") as f_index:
-            for file in new_files:
-                f_index.write(norm_path + '\n')
-
     if not opts.verbose and not opts.dry_run:
         print(f"{len(new_files)} fichier(s) ajouté(s) à l'index.")
 
@@ -94,6 +77,8 @@ def run(args):
         norm_path = f.replace("\\", "/")
         unique_files.add(norm_path)
 
-    with open(index_file, "w") as f_index:
-        for file in sorted(unique_files):
-            f_index.write(file + "\n")
\ No newline at end of file
+    repository.write_index(sorted(unique_files))
+
+    # Compactage automatique si trop d'objets isolés se sont accumulés
+    if maintenance.auto_gc():
+        print("Dépôt compacté automatiquement (gc --auto).")
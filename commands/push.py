@@ -1,4 +1,7 @@
 import os
+import bitmaps
+import lockfile
+import repository
 
 def get_current_branch():
     head_path = os.path.join(".mygit", "HEAD")
@@ -21,12 +24,27 @@ def run(args):
     if not commit_hash:
         print("Aucun commit local à pousser.")
         return
-    with open(remote_ref, "w", encoding="utf-8") as f:
-        f.write(commit_hash)
+    # Objets que le distant n'a pas encore (bitmaps du pack si gc en a écrit)
+    remote_hash = None
+    if os.path.exists(remote_ref):
+        with open(remote_ref, "r", encoding="utf-8") as f:
+            remote_hash = f.read().strip() or None
+    counts, total = bitmaps.difference([commit_hash], [remote_hash] if remote_hash else [])
+    detail = ", ".join(f"{n} {type_}(s)" for type_, n in counts.items() if n)
+    print(f"{total} objet(s) à pousser" + (f" ({detail})" if detail else ""))
+
+    try:
+        repository.write_ref(remote_ref, commit_hash, old=remote_hash, message="push")
+    except lockfile.RefConflict:
+        print(f"La branche '{branch}' a été poussée par un autre processus : relancez push.")
+        return
+    except lockfile.LockError as e:
+        print(f"Erreur : {e}")
+        return
     print(f"Branche '{branch}' poussée (push) !")
 
     # Vider l'index après le push
     index_file = os.path.join(".mygit", "index")
     if os.path.exists(index_file):
-        open(index_file, "w", encoding="utf-8").close()
+        repository.write_index([])
 
@@ -1,15 +1,10 @@
 import os
-import zlib
+import repository
 
 def read_object(sha1, type_):
-    obj_dir = os.path.join(".mygit", "objects", sha1[:2])
-    obj_path = os.path.join(obj_dir, sha1[2:])
-    with open(obj_path, "rb") as f:
-        data = zlib.decompress(f.read())
-    header_end = data.find(b'\0')
-    header = data[:header_end].decode()
-    assert header.startswith(type_)
-    return data[header_end+1:]
+    obj_type, content = repository.read_object(sha1)
+    assert obj_type.startswith(type_)
+    return content
 
 def get_last_commit_hash():
     head_path = os.path.join(".mygit", "HEAD")
@@ -66,8 +61,5 @@ def run(args):
     files = collect_tree(tree_hash)
 
     # 4. Réécrire l'index avec ces fichiers
-    index_file = os.path.join(".mygit", "index")
-    with open(index_file, "w", encoding="utf-8") as f:
-        for file in files:
-            f.write(file + "\n")
+    repository.write_index(files)
     print("Index synchronisé avec le dernier commit (reset comme git).")
\ No newline at end of file
@@ -0,0 +1,352 @@
+import os
+import io
+import sys
+import json
+import time
+import struct
+import socket
+import importlib
+import graphlib
+import threading
+import traceback
+import subprocess
+from collections import OrderedDict
+
+SOCKET_PATH = os.path.join(".mygit", "server.sock")
+PID_PATH = os.path.join(".mygit", "server.pid")
+START_TIMEOUT = 10  # secondes laissées à "server start" pour que le serveur réponde
+
+# Modules chargés une fois pour toutes par le serveur
+PRELOADED = [
+    "commands.my_git_init", "commands.git_cat_file", "commands.my_git_add", "commands.commit",
+    "commands.commit_tree", "commands.push", "commands.branch", "commands.checkout",
+    "commands.reset", "commands.merge", "commands.status", "commands.log",
+    "commands.write_tree", "commands.ls_files", "commands.large",
+    "commands.fsck", "commands.gc", "commands.count_objects", "commands.blame",
+    "commands.tag", "commands.describe", "commands.archive",
+    "commands.fast_import",
+]
+
+# Lecteurs d'objets purs (un SHA donne toujours le même contenu) : le serveur
+# les garde derrière un cache LRU tant qu'il tourne.
+CACHED_READERS = [
+    ("commands.git_cat_file", "read_object"),
+    ("commands.checkout", "read_object"),
+    ("commands.reset", "read_object"),
+    ("commands.commit_tree", "read_object"),
+    ("repository", "read_object"),
+]
+OBJECT_CACHE_SIZE = 4096
+
+# Variables d'environnement que le client transmet avec chaque commande ; les
+# autres (PAGER, LANG...) restent celles du serveur au moment de son démarrage.
+ENV_PREFIX = "MYGIT_"
+
+
+class ObjectCache:
+    """Cache LRU devant un lecteur d'objets ; les objets absents ne sont pas retenus.
+
+    Le verrou protège l'OrderedDict si une commande lit des objets depuis
+    plusieurs threads ; la lecture elle-même se fait hors du verrou.
+    """
+
+    def __init__(self, reader, maxsize=OBJECT_CACHE_SIZE):
+        self.reader = reader
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __call__(self, *args):
+        with self.lock:
+            if args in self.entries:
+                self.entries.move_to_end(args)
+                return self.entries[args]
+        result = self.reader(*args)
+        if result is not None and result != (None, None):
+            with self.lock:
+                self.entries[args] = result
+                if len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class FrameStream:
+    """Remplace stdout/stderr : chaque écriture part vers le client sous forme de trame."""
+
+    def __init__(self, conn, kind):
+        self.conn = conn
+        self.kind = kind
+        self.encoding = "utf-8"
+        self.buffer = self
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8", errors="replace")
+        if data:
+            send_frame(self.conn, self.kind, data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+def send_frame(conn, kind, payload):
+    # Trame : type (o=stdout, e=stderr, x=code de sortie) + longueur + données
+    conn.sendall(kind + struct.pack("!I", len(payload)) + payload)
+
+
+class CommandServer:
+    def __init__(self, idle_timeout=None):
+        self.idle_timeout = idle_timeout
+        self.sources = {}
+        self.repo_signature = None
+        self.caches = []
+        self.root = None
+
+    def preload(self):
+        import main
+        self.main = main
+        self.root = os.path.dirname(os.path.abspath(main.__file__))
+        for name in PRELOADED:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                continue
+        self.install_caches()
+        self.sources = self.source_mtimes()
+        self.repo_signature = self.repository_signature()
+
+    def install_caches(self):
+        self.caches = []
+        for name, attr in CACHED_READERS:
+            # Lecteur renommé ou retiré d'un module : le serveur démarre quand même, sans ce cache
+            reader = getattr(sys.modules.get(name), attr, None)
+            if reader is None:
+                continue
+            if isinstance(reader, ObjectCache):
+                reader = reader.reader  # module non rechargé : ne pas empiler les caches
+            cache = ObjectCache(reader)
+            setattr(sys.modules[name], attr, cache)
+            self.caches.append(cache)
+
+    def project_modules(self):
+        """Modules importés depuis l'arborescence de mygit (ni stdlib ni site-packages).
+
+        Le serveur lui-même n'en fait pas partie : ses modifications ne
+        s'appliquent qu'au prochain "server start".
+        """
+        modules = {}
+        for name, module in list(sys.modules.items()):
+            path = getattr(module, "__file__", None)
+            if not path or name in ("__main__", __name__):
+                continue
+            path = os.path.abspath(path)
+            if path.startswith(self.root + os.sep) and "site-packages" not in path:
+                modules[name] = module
+        return modules
+
+    def source_mtimes(self):
+        mtimes = {}
+        for name, module in self.project_modules().items():
+            if os.path.exists(module.__file__):
+                mtimes[name] = os.stat(module.__file__).st_mtime_ns
+        return mtimes
+
+    def reload_modules(self):
+        """Recharge tous les modules de mygit, dépendances d'abord.
+
+        Recharger seulement le module modifié laisserait aux autres les objets
+        qu'ils en ont importés (from ... import, classes d'exception) ; on
+        recharge donc tout, dans l'ordre des dépendances entre modules.
+        """
+        modules = self.project_modules()
+        graph = {}
+        for name, module in modules.items():
+            deps = set()
+            for value in list(vars(module).values()):
+                dep = value.__name__ if isinstance(value, type(sys)) else getattr(value, "__module__", None)
+                if isinstance(dep, str) and dep != name and dep in modules:
+                    deps.add(dep)
+            graph[name] = deps
+        try:
+            order = list(graphlib.TopologicalSorter(graph).static_order())
+        except graphlib.CycleError:
+            order = list(modules)  # ordre d'import, à défaut
+        for name in order:
+            importlib.reload(modules[name])
+        self.install_caches()
+        self.sources = self.source_mtimes()
+
+    def apply_environment(self, env):
+        """Remplace les variables MYGIT_* du serveur par celles du client.
+
+        Retourne True si elles ont changé : plusieurs modules les lisent à
+        l'import (seuils de gc --auto, de chunking, de gros fichiers).
+        """
+        if env is None:
+            return False  # client qui n'envoie pas son environnement
+        env = {key: value for key, value in env.items() if key.startswith(ENV_PREFIX)}
+        current = {key: value for key, value in os.environ.items() if key.startswith(ENV_PREFIX)}
+        if env == current:
+            return False
+        for key in current:
+            del os.environ[key]
+        os.environ.update(env)
+        return True
+
+    def repository_signature(self):
+        objects_dir = os.path.join(".mygit", "objects")
+        try:
+            st = os.stat(objects_dir)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_dev
+
+    def invalidate(self, env=None):
+        """Vide ce qui a pu changer depuis la dernière commande (code, environnement, dépôt)."""
+        # Code ou environnement modifié : on recharge les modules de mygit
+        env_changed = self.apply_environment(env)
+        if env_changed or self.source_mtimes() != self.sources:
+            self.reload_modules()
+        # Dépôt recréé (my_git_init après suppression) : les objets ne sont plus les mêmes
+        signature = self.repository_signature()
+        if signature != self.repo_signature:
+            for cache in self.caches:
+                cache.clear()
+            self.repo_signature = signature
+
+    def run_command(self, conn, argv, env=None, cwd=None):
+        self.invalidate(env)
+        saved = sys.argv, sys.stdin, sys.stdout, sys.stderr
+        saved_cwd = os.getcwd()
+        sys.argv = ["main.py"] + argv
+        sys.stdin = io.StringIO("")
+        sys.stdout = FrameStream(conn, b"o")
+        sys.stderr = FrameStream(conn, b"e")
+        code = 0
+        try:
+            if cwd:
+                os.chdir(cwd)
+            self.main.main()
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                code = e.code
+            elif e.code is not None:
+                sys.stderr.write(f"{e.code}\n")
+                code = 1
+        except Exception:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.argv, sys.stdin, sys.stdout, sys.stderr = saved
+            os.chdir(saved_cwd)
+        return code
+
+    def serve(self):
+        # Modules chargés avant d'ouvrir la socket : elle n'accepte de
+        # connexions qu'une fois le serveur prêt, et un échec ne laisse rien
+        self.preload()
+        if os.path.exists(SOCKET_PATH):
+            os.unlink(SOCKET_PATH)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            listener.bind(SOCKET_PATH)
+            listener.listen(16)
+            with open(PID_PATH, "w") as f:
+                f.write(str(os.getpid()))
+            if self.idle_timeout:
+                listener.settimeout(self.idle_timeout)
+            while True:
+                try:
+                    conn, _ = listener.accept()
+                except socket.timeout:
+                    break
+                with conn:
+                    try:
+                        request = json.loads(conn.makefile("rb").readline())
+                        argv = request.get("argv", [])
+                        if argv[:2] == ["server", "stop"]:
+                            send_frame(conn, b"o", "Serveur arrêté.\n".encode())
+                            conn.sendall(b"x" + struct.pack("!I", 0))
+                            break
+                        code = self.run_command(conn, argv, request.get("env"), request.get("cwd"))
+                        conn.sendall(b"x" + struct.pack("!I", code))
+                    except (ConnectionError, BrokenPipeError, ValueError):
+                        continue
+        finally:
+            listener.close()
+            for path in (SOCKET_PATH, PID_PATH):
+                if os.path.exists(path):
+                    os.unlink(path)
+
+
+def responds():
+    """Vrai si le serveur accepte une connexion sur sa socket."""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(SOCKET_PATH)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def is_running():
+    if not os.path.exists(PID_PATH):
+        return False
+    try:
+        with open(PID_PATH) as f:
+            os.kill(int(f.read().strip()), 0)
+        return True
+    except (ValueError, OSError):
+        return False
+
+
+def run(args):
+    if not os.path.exists(".mygit"):
+        print("fatal: not a git repository", file=sys.stderr)
+        sys.exit(1)
+    if not hasattr(socket, "AF_UNIX"):
+        print("Le serveur de commandes nécessite les sockets Unix.")
+        sys.exit(1)
+
+    action = args[0] if args else "status"
+    if action == "run":
+        # Premier plan (utilisé par "start")
+        idle = float(args[1]) if len(args) > 1 else None
+        CommandServer(idle_timeout=idle).serve()
+    elif action == "start":
+        if is_running():
+            print("Le serveur tourne déjà.")
+            return
+        cmd = [sys.executable, os.path.abspath(sys.argv[0]), "server", "run"] + args[1:2]
+        process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL, start_new_session=True)
+        deadline = time.monotonic() + START_TIMEOUT
+        while not (os.path.exists(PID_PATH) and responds()):
+            if process.poll() is not None or time.monotonic() > deadline:
+                if process.poll() is None:
+                    process.terminate()
+                print("fatal: le serveur de commandes n'a pas démarré", file=sys.stderr)
+                sys.exit(1)
+            time.sleep(0.05)
+        print(f"Serveur de commandes démarré ({SOCKET_PATH}).")
+    elif action == "stop":
+        # Atteint seulement si le client n'a pas pu joindre le serveur
+        for path in (SOCKET_PATH, PID_PATH):
+            if os.path.exists(path):
+                os.unlink(path)
+        print("Aucun serveur en cours d'exécution.")
+    elif action == "status":
+        print("Serveur actif." if is_running() else "Serveur arrêté.")
+    else:
+        print("usage: mygit server start [idle_timeout]|stop|status|run")
+        sys.exit(1)
@@ -0,0 +1,65 @@
+import os
+import sys
+import argparse
+import lockfile
+import repository
+import tags
+
+def run(args):
+    parser = argparse.ArgumentParser(prog="tag", description="Liste, crée ou supprime des tags")
+    parser.add_argument('name', nargs='?', help="Nom du tag (sans nom : liste des tags)")
+    parser.add_argument('rev', nargs='?', default="HEAD", help="Commit à taguer (défaut : HEAD)")
+    parser.add_argument('-a', '--annotate', action='store_true', help="Tag annoté (objet tag avec message)")
+    parser.add_argument('-m', '--message', help="Message du tag (implique -a)")
+    parser.add_argument('-f', '--force', action='store_true', help="Remplacer un tag existant")
+    parser.add_argument('-d', '--delete', action='store_true', help="Supprimer le tag")
+    parser.add_argument('-n', dest='lines', action='store_true', help="Afficher la première ligne du message")
+    opts = parser.parse_intermixed_args(args)
+
+    if not os.path.exists(".mygit"):
+        print("fatal: not a git repository", file=sys.stderr)
+        sys.exit(1)
+
+    if not opts.name:
+        print_tags(opts.lines)
+        return
+
+    if opts.delete:
+        try:
+            tags.delete(opts.name)
+        except FileNotFoundError as e:
+            print(f"error: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Tag '{opts.name}' supprimé.")
+        return
+
+    if opts.annotate and opts.message is None:
+        print("fatal: un tag annoté demande un message (-m)", file=sys.stderr)
+        sys.exit(1)
+    target = repository.Repository().resolve_ref(opts.rev)
+    if not target:
+        print(f"fatal: référence inconnue '{opts.rev}'", file=sys.stderr)
+        sys.exit(1)
+    try:
+        tags.create(opts.name, target, opts.message, force=opts.force)
+    except ValueError as e:
+        print(f"fatal: {e}", file=sys.stderr)
+        sys.exit(1)
+    except lockfile.RefConflict:
+        print(f"fatal: le tag '{opts.name}' existe déjà (-f pour le remplacer)", file=sys.stderr)
+        sys.exit(1)
+    kind = "annoté " if opts.message is not None else ""
+    print(f"Tag {kind}'{opts.name}' créé sur {target[:7]}.")
+
+def print_tags(with_message):
+    for name, oid in sorted(tags.list_tags().items()):
+        if not with_message:
+            print(name)
+            continue
+        obj_type, content = repository.read_object(oid)
+        if obj_type == "tag":
+            subject = tags.parse_tag(content)["message"].split("\n", 1)[0]
+        else:
+            subject = repository.parse_commit(content)["message"].strip().split("\n", 1)[0] \
+                if obj_type == "commit" else ""
+        print(f"{name:<15} {subject}")
@@ -1,9 +1,7 @@
 import sys
-import hashlib
-import zlib
 import os
 from pathlib import Path
-from collections import defaultdict
+import repository
 
 def run(argv):
     try:
@@ -27,8 +25,7 @@ def run(argv):
 
 def read_simple_index(index_file):
     try:
-        with open(index_file, 'r') as f:
-            file_paths = [line.strip() for line in f.readlines() if line.strip()]
+        file_paths = repository.read_index()
         
         entries = []
         for file_path in file_paths:
@@ -38,15 +35,8 @@ def read_simple_index(index_file):
                 continue
             
             try:
-                with open(file_path, 'rb') as f:
-                    file_content = f.read()
-                
-                blob_header = f"blob {len(file_content)}\0".encode()
-                blob_data = blob_header + file_content
-                file_sha = hashlib.sha1(blob_data).hexdigest()
-                
-                # Stocker l'objet blob
-                store_object(blob_data, file_sha)
+                # Calculer et stocker l'objet blob
+                file_sha = repository.file_blob(file_path)
                 file_stat = os.stat(file_path)
                 if file_stat.st_mode & 0o100:
                     mode = 0o100755
@@ -81,7 +71,7 @@ def create_tree_from_entries(entries):
     return create_tree_recursive(tree_structure)
 
 def build_tree_structure(entries):
-    tree = defaultdict(lambda: {'files': [], 'subdirs': defaultdict(lambda: {'files': [], 'subdirs': {}})})
+    tree = {'files': [], 'subdirs': {}}
     
     for entry in entries:
         path_parts = entry['path'].split('/')
@@ -152,27 +142,11 @@ def create_empty_tree():
     return write_tree_object(tree_content)
 
 def write_tree_object(content):
-    header = f"tree {len(content)}\0".encode('ascii')
-    obj_content = header + content
-    
-    # Calculer le SHA-1
-    sha = hashlib.sha1(obj_content).hexdigest()
-    
-    # Stocker l'objet
-    store_object(obj_content, sha)
-    
-    return sha
+    return repository.hash_object(content, "tree")
 
 def store_object(obj_content, sha):
-    git_dir = Path(".mygit")
-    obj_dir = git_dir / "objects" / sha[:2]
-    obj_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Compresser avec zlib
-    obj_file = obj_dir / sha[2:]
-    if not obj_file.exists():
-        compressed = zlib.compress(obj_content)
-        obj_file.write_bytes(compressed)
+    # obj_content contient déjà l'en-tête "<type> <taille>\0"
+    repository.write_object(sha, obj_content)
 
 if __name__ == "__main__":
     run(sys.argv[1:])
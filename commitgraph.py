@@ -0,0 +1,174 @@
+"""Graphe des commits : parents et dates sans décompresser les commits.
+
+.mygit/objects/info/commit-graph, écrit par gc pour tous les commits accessibles :
+    "MYCG" | version | nombre de commits
+    table de répartition : 256 compteurs cumulés par premier octet du SHA
+    SHA binaires triés (20 octets chacun)
+    un enregistrement par commit, dans le même ordre : timestamp (8 octets),
+    position du premier et du second parent (NO_PARENT si absent)
+    positions des parents supplémentaires des fusions à plus de deux parents
+    (le second champ vaut alors EXTRA | indice, la liste se termine par un
+    indice marqué LAST)
+
+Le fichier est lu par mmap : trouver un commit coûte une recherche
+dichotomique dans sa tranche de la table, sans zlib. Les commits plus récents
+que le dernier gc n'y sont pas et sont lus normalement (voir revwalk.commit_links).
+"""
+import os
+import mmap
+import time
+import struct
+
+import repository
+
+MAGIC = b"MYCG"
+VERSION = 1
+HEADER = struct.Struct(">4sII")
+FANOUT = struct.Struct(">256I")
+RECORD = struct.Struct(">qII")
+EDGE = struct.Struct(">I")
+NO_PARENT = 0xFFFFFFFF
+EXTRA = 0x80000000
+LAST = 0x80000000
+RELOAD_INTERVAL = 5.0
+
+_graphs = {}
+
+
+def graph_path(git_dir=repository.GIT_DIR_NAME):
+    return os.path.join(git_dir, "objects", "info", "commit-graph")
+
+
+class CommitGraph:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError("Format de commit-graph inconnu")
+        self.fanout = FANOUT.unpack_from(self.data, HEADER.size)
+        self.oids_at = HEADER.size + FANOUT.size
+        self.records_at = self.oids_at + 20 * self.count
+        self.edges_at = self.records_at + RECORD.size * self.count
+
+    def oid(self, pos):
+        start = self.oids_at + 20 * pos
+        return self.data[start:start + 20].hex()
+
+    def find(self, oid):
+        """Position du commit, ou None s'il n'est pas dans le graphe."""
+        key = bytes.fromhex(oid)
+        lo = self.fanout[key[0] - 1] if key[0] else 0
+        hi = self.fanout[key[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self.oids_at + 20 * mid
+            current = self.data[start:start + 20]
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def links(self, oid):
+        """(parents, timestamp) d'un commit, ou None s'il n'est pas dans le graphe."""
+        pos = self.find(oid)
+        if pos is None:
+            return None
+        timestamp, first, second = RECORD.unpack_from(self.data, self.records_at + RECORD.size * pos)
+        positions = []
+        if first != NO_PARENT:
+            positions.append(first)
+        if second != NO_PARENT:
+            if second & EXTRA:
+                i = second & ~EXTRA
+                while True:
+                    (value,) = EDGE.unpack_from(self.data, self.edges_at + EDGE.size * i)
+                    positions.append(value & ~LAST)
+                    if value & LAST:
+                        break
+                    i += 1
+            else:
+                positions.append(second)
+        return tuple(self.oid(p) for p in positions), timestamp
+
+
+def load(git_dir=repository.GIT_DIR_NAME):
+    """Graphe du dépôt, ou None.
+
+    Son contenu ne peut pas devenir faux (parents et dates d'un commit ne
+    changent jamais) : le fichier n'est revérifié que toutes les
+    RELOAD_INTERVAL secondes, pour profiter d'un gc plus récent.
+    """
+    key = os.path.abspath(git_dir)
+    now = time.monotonic()
+    cached = _graphs.get(key)
+    if cached is not None and now - cached[0] < RELOAD_INTERVAL:
+        return cached[2]
+    path = graph_path(git_dir)
+    try:
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        signature = None
+    if cached is not None and cached[1] == signature:
+        graph = cached[2]
+    elif signature is None:
+        graph = None
+    else:
+        try:
+            graph = CommitGraph(path)
+        except (ValueError, struct.error, OSError):
+            graph = None
+    _graphs[key] = (now, signature, graph)
+    return graph
+
+
+def write_graph(commits, git_dir=repository.GIT_DIR_NAME):
+    """Écrit le graphe de `commits` {sha: (parents, timestamp)} ; un commit
+    dont un parent manque est laissé de côté. Retourne le nombre de commits."""
+    commits = dict(commits)
+    # Sans tous ses parents, un commit ne peut pas être décrit par positions ;
+    # ses descendants non plus
+    children = {}
+    for oid, (parents, _) in commits.items():
+        for parent in parents:
+            children.setdefault(parent, []).append(oid)
+    stack = [oid for oid, (parents, _) in commits.items() if any(p not in commits for p in parents)]
+    while stack:
+        oid = stack.pop()
+        if commits.pop(oid, None) is not None:
+            stack.extend(children.get(oid, ()))
+    oids = sorted(commits)
+    position = {oid: i for i, oid in enumerate(oids)}
+    fanout = [0] * 256
+    for oid in oids:
+        fanout[int(oid[:2], 16)] += 1
+    for i in range(1, 256):
+        fanout[i] += fanout[i - 1]
+    records = []
+    edges = []
+    for oid in oids:
+        parents, timestamp = commits[oid]
+        indexes = [position[parent] for parent in parents]
+        first = indexes[0] if indexes else NO_PARENT
+        if len(indexes) <= 2:
+            second = indexes[1] if len(indexes) == 2 else NO_PARENT
+        else:
+            second = EXTRA | len(edges)
+            edges.extend(indexes[1:-1])
+            edges.append(indexes[-1] | LAST)
+        records.append(RECORD.pack(int(timestamp), first, second))
+    path = graph_path(git_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(oids)))
+        f.write(FANOUT.pack(*fanout))
+        f.write(b"".join(bytes.fromhex(oid) for oid in oids))
+        f.write(b"".join(records))
+        f.write(b"".join(EDGE.pack(edge) for edge in edges))
+    os.replace(path + ".tmp", path)
+    return len(oids)
@@ -0,0 +1,608 @@
+"""Import en masse d'un historique depuis un flux texte (format de git fast-import).
+
+Le flux décrit des blobs, des commits (changements de fichiers par rapport au
+commit précédent de la branche), des tags et des remises à zéro de branches :
+
+    blob
+    mark :1
+    data 6
+    hello
+    commit refs/heads/main
+    mark :2
+    committer Alice <alice@example.com> 1700000000 +0100
+    data 15
+    Premier commit
+    M 100644 :1 src/a.txt
+    D ancien.txt
+
+Les objets sont compressés et ajoutés directement à un pack
+(packfile.PackWriter) : ni fichier isolé par objet, ni copie de travail.
+L'arbre de chaque branche reste en mémoire d'un commit à l'autre ; seuls les
+dossiers touchés par un commit sont réécrits, les autres gardent leur SHA.
+
+Comme avec git, le premier commit d'une branche sans `from` est une racine ;
+`from refs/heads/<branche>^0` prolonge une branche qui existe déjà dans le
+dépôt. Réimporter le même flux redonne donc les mêmes commits.
+
+Les références ne sont mises à jour qu'à la fin du flux (ou à `checkpoint`),
+une fois le pack en place, en une seule transaction. Une branche qui existait
+déjà n'est avancée que si son nouveau commit contient l'ancien (sauf `force`).
+"""
+import os
+import zlib
+import hashlib
+
+import lockfile
+import packfile
+import reflog
+import repository
+import revwalk
+import tags
+from profiling import phase
+
+BLOB_MODES = {"100644", "644", "100755", "755", "120000"}
+TREE_MODES = {"040000", "40000"}
+FEATURES = {"done", "date-format=raw"}
+REFLOG_MESSAGE = "fast-import"
+_ESCAPES = {"a": 7, "b": 8, "f": 12, "n": 10, "r": 13, "t": 9, "v": 11, '"': 34, "\\": 92}
+
+
+class _Tree:
+    """Dossier en mémoire : `oid` vaut None tant qu'il a des changements non
+    écrits ; `entries` ({nom: sha de blob | _Tree}) n'est lu qu'au premier accès."""
+    __slots__ = ("oid", "entries")
+
+    def __init__(self, oid=None, entries=None):
+        self.oid = oid
+        self.entries = entries
+
+
+def _unquote(text):
+    """(chemin, reste de la ligne) pour un chemin entre guillemets à la C."""
+    out = bytearray()
+    i = 1
+    while i < len(text):
+        c = text[i]
+        if c == '"':
+            return out.decode("utf-8", errors="replace"), text[i + 1:]
+        if c == "\\" and i + 1 < len(text):
+            escape = text[i + 1]
+            if escape in "01234567":
+                out.append(int(text[i + 1:i + 4], 8) & 0xFF)
+                i += 4
+                continue
+            if escape not in _ESCAPES:
+                break
+            out.append(_ESCAPES[escape])
+            i += 2
+            continue
+        out += c.encode("utf-8")
+        i += 1
+    raise ValueError(f"chemin mal formé : {text}")
+
+
+def _check_path(path):
+    parts = path.split("/")
+    if not path or "\n" in path or any(part in ("", ".", "..") for part in parts):
+        raise ValueError(f"chemin invalide : '{path}'")
+    return path
+
+
+def _ignored(path):
+    # Un dossier .mygit versionné par erreur ne doit jamais revenir dans une copie de travail
+    return repository.GIT_DIR_NAME in path.split("/")
+
+
+class Importer:
+    """Lit un flux fast-import et écrit ses objets dans un pack.
+
+        importer = Importer(open("historique.stream", "rb"))
+        importer.run()
+        importer.checkpoint()
+    """
+
+    def __init__(self, stream, git_dir=repository.GIT_DIR_NAME, progress=None, export_marks=None, force=False):
+        self.stream = stream
+        self.git_dir = git_dir
+        self.progress = progress  # appelée avec le texte des commandes `progress`
+        self.export_marks_path = export_marks
+        self.force = force
+        self.line_number = 0
+        self.lookahead = None
+        self.marks = {}
+        self.branches = {}  # référence -> {"tip": sha ou None, "tree": _Tree ou None}
+        self.initial = {}  # référence -> valeur au début de l'import (pour le compare-and-swap)
+        self.pack = None
+        self.packs = []
+        self.known_packs = packfile.packs(git_dir)
+        self.commits = []
+        self.rejected = {}  # référence -> raison du refus
+        self.updated = {}  # référence -> SHA écrit
+        self.stats = {"blob": 0, "tree": 0, "commit": 0, "tag": 0, "duplicates": 0, "ignored": 0}
+
+    # --- Lecture du flux ----------------------------------------------------
+
+    def _error(self, message):
+        return ValueError(f"ligne {self.line_number} : {message}")
+
+    def _peek(self):
+        """Prochaine ligne utile (lignes vides et commentaires sautés), ou None."""
+        while self.lookahead is None:
+            raw = self.stream.readline()
+            if not raw:
+                return None
+            self.line_number += 1
+            line = raw.rstrip(b"\n").decode("utf-8", errors="replace")
+            if line and not line.startswith("#"):
+                self.lookahead = line
+        return self.lookahead
+
+    def _next(self):
+        line = self._peek()
+        self.lookahead = None
+        return line
+
+    def _optional(self, keyword):
+        """Argument de la ligne `<keyword> ...` si c'est la suivante, sinon None."""
+        line = self._peek()
+        if line is not None and line.startswith(keyword + " "):
+            self.lookahead = None
+            return line[len(keyword) + 1:]
+        return None
+
+    def _required(self, keyword):
+        value = self._optional(keyword)
+        if value is None:
+            raise self._error(f"'{keyword}' attendu, trouvé : {self._peek()!r}")
+        return value
+
+    def _data(self):
+        """Contenu d'une commande `data <taille>` ou `data <<<délimiteur>`."""
+        spec = self._required("data")
+        if spec.startswith("<<"):
+            delimiter = spec[2:].encode("utf-8")
+            lines = []
+            while True:
+                raw = self.stream.readline()
+                if not raw:
+                    raise self._error(f"fin du flux avant le délimiteur {spec[2:]}")
+                self.line_number += 1
+                if raw.rstrip(b"\n") == delimiter:
+                    return b"".join(lines)
+                lines.append(raw)
+        try:
+            size = int(spec)
+        except ValueError:
+            raise self._error(f"taille de données invalide : {spec}") from None
+        data = self.stream.read(size)
+        if len(data) != size:
+            raise self._error("fin du flux au milieu d'un contenu")
+        self.line_number += data.count(b"\n")
+        return data
+
+    def _mark(self):
+        value = self._optional("mark")
+        if value is None:
+            return None
+        if not value.startswith(":") or not value[1:].isdigit():
+            raise self._error(f"marque invalide : {value}")
+        return int(value[1:])
+
+    def _signature(self, value):
+        """Vérifie "Nom <email> <timestamp> <fuseau>" (format raw de git)."""
+        parts = value.rsplit(" ", 2)
+        if len(parts) != 3 or not parts[1].lstrip("-").isdigit() or \
+                len(parts[2]) != 5 or parts[2][0] not in "+-" or not parts[2][1:].isdigit():
+            raise self._error(f"signature invalide (attendu : Nom <email> <timestamp> <fuseau>) : {value}")
+        return value
+
+    # --- Objets ---------------------------------------------------------------
+
+    def _store(self, data, type_):
+        """SHA de l'objet, ajouté au pack s'il n'est pas déjà dans le dépôt."""
+        full_data = f"{type_} {len(data)}\0".encode() + data
+        with phase("hash", len(full_data)):
+            oid = hashlib.sha1(full_data).hexdigest()
+        if self._exists(oid):
+            self.stats["duplicates"] += 1
+            return oid
+        if self.pack is None:
+            self.pack = packfile.PackWriter(self.git_dir)
+        with phase("compress", len(full_data)):
+            compressed = zlib.compress(full_data)
+        with phase("object_write", len(compressed)):
+            self.pack.add(oid, compressed)
+        self.stats[type_] += 1
+        return oid
+
+    def _read(self, oid):
+        raw = self.pack.read_raw(oid) if self.pack is not None else None
+        if raw is None:
+            return repository.read_object(oid, self.git_dir)
+        header, _, content = zlib.decompress(raw).partition(b"\0")
+        return header.split(b" ", 1)[0].decode(), content
+
+    def _exists(self, oid):
+        # Liste des packs figée (et mise à jour par finish_pack) : repository.object_exists
+        # la revérifierait pour chaque objet
+        if self.pack is not None and oid in self.pack:
+            return True
+        return os.path.exists(repository.object_path(oid, self.git_dir)) or \
+            any(oid in pack for pack in self.known_packs)
+
+    def _commit_tree(self, oid):
+        obj_type, content = self._read(oid)
+        if obj_type == "tag":
+            return self._commit_tree(tags.parse_tag(content)["object"])
+        if obj_type != "commit":
+            raise self._error(f"{oid} n'est pas un commit")
+        return repository.parse_commit(content)["tree_oid"]
+
+    # --- Arbres en mémoire ----------------------------------------------------
+
+    def _entries(self, tree):
+        if tree.entries is None:
+            obj_type, content = self._read(tree.oid)
+            if obj_type != "tree":
+                raise self._error(f"{tree.oid} n'est pas un tree")
+            tree.entries = {name: _Tree(sha) if type_ == "tree" else sha
+                            for type_, sha, name in repository.parse_tree(content)}
+        return tree.entries
+
+    def _get(self, root, path):
+        node = root
+        for part in path.split("/"):
+            if not isinstance(node, _Tree):
+                return None
+            node = self._entries(node).get(part)
+        return node
+
+    def _set(self, root, path, value):
+        parts = path.split("/")
+        node = root
+        for part in parts[:-1]:
+            entries = self._entries(node)
+            node.oid = None
+            child = entries.get(part)
+            if not isinstance(child, _Tree):
+                child = entries[part] = _Tree(entries={})
+            node = child
+        self._entries(node)[parts[-1]] = value
+        node.oid = None
+
+    def _remove(self, root, path):
+        """Retire un fichier ou un dossier (et les dossiers vidés) ; retourne l'entrée retirée."""
+        parts = path.split("/")
+        stack = []
+        node = root
+        for part in parts[:-1]:
+            child = self._entries(node).get(part)
+            if not isinstance(child, _Tree):
+                return None
+            stack.append((node, part))
+            node = child
+        removed = self._entries(node).pop(parts[-1], None)
+        if removed is None:
+            return None
+        node.oid = None
+        while stack:
+            parent, part = stack.pop()
+            parent.oid = None
+            if not node.entries:
+                del parent.entries[part]
+            node = parent
+        return removed
+
+    def _write_tree(self, tree):
+        """Écrit les dossiers modifiés (format texte de commit) ; retourne le SHA du tree."""
+        if tree.oid is None:
+            files, folders = [], []
+            for name in sorted(tree.entries):
+                value = tree.entries[name]
+                if isinstance(value, _Tree):
+                    folders.append(f"tree {self._write_tree(value)} {name}")
+                else:
+                    files.append(f"blob {value} {name}")
+            tree.oid = self._store("\n".join(files + folders).encode("utf-8"), "tree")
+        return tree.oid
+
+    # --- Références -----------------------------------------------------------
+
+    def _ref(self, name):
+        if not name.startswith("refs/"):
+            name = "refs/heads/" + name
+        kind, _, short = name[5:].partition("/")
+        try:
+            tags.check_name(short)
+        except ValueError:
+            short = ""
+        if kind not in ("heads", "tags") or not short or short.endswith(".remote"):
+            raise self._error(f"référence invalide : '{name}'")
+        return name
+
+    def _ref_path(self, ref):
+        return os.path.join(self.git_dir, *ref.split("/"))
+
+    def _branch(self, ref):
+        branch = self.branches.get(ref)
+        if branch is None:
+            try:
+                with open(self._ref_path(ref), encoding="utf-8") as f:
+                    tip = f.read().strip() or None
+            except FileNotFoundError:
+                tip = None
+            self.initial[ref] = tip
+            branch = self.branches[ref] = {"tip": tip, "tree": None}
+        return branch
+
+    def _commitish(self, value):
+        """SHA désigné par une marque (:n), un SHA ou une référence."""
+        if value.endswith("^0"):
+            value = value[:-2]
+        if value.startswith(":"):
+            try:
+                return self.marks[int(value[1:])]
+            except (KeyError, ValueError):
+                raise self._error(f"marque inconnue : {value}") from None
+        if repository.is_sha(value):
+            if not self._exists(value):
+                raise self._error(f"objet introuvable : {value}")
+            return value
+        tip = self._branch(self._ref(value))["tip"]
+        if tip is None:
+            raise self._error(f"la référence '{value}' ne désigne aucun commit")
+        return tip
+
+    # --- Commandes ------------------------------------------------------------
+
+    def run(self):
+        """Traite le flux jusqu'à `done` ou la fin de l'entrée."""
+        require_done = False
+        while True:
+            line = self._next()
+            if line is None:
+                if require_done:
+                    raise self._error("fin du flux sans 'done' (feature done)")
+                return
+            command, _, argument = line.partition(" ")
+            if command == "blob":
+                self._blob()
+            elif command == "commit":
+                self._commit(argument)
+            elif command == "tag":
+                self._tag(argument)
+            elif command == "reset":
+                self._reset(argument)
+            elif command == "checkpoint":
+                self.checkpoint()
+            elif command == "progress":
+                if self.progress is not None:
+                    self.progress(argument)
+            elif command == "done":
+                return
+            elif command == "feature" and argument in FEATURES:
+                require_done = require_done or argument == "done"
+            else:
+                raise self._error(f"commande non prise en charge : {line}")
+
+    def _blob(self):
+        mark = self._mark()
+        self._optional("original-oid")
+        oid = self._store(self._data(), "blob")
+        if mark is not None:
+            self.marks[mark] = oid
+
+    def _commit(self, ref):
+        ref = self._ref(ref)
+        mark = self._mark()
+        self._optional("original-oid")
+        author = self._optional("author")
+        committer = self._signature(self._required("committer"))
+        author = self._signature(author) if author is not None else committer
+        self._optional("encoding")
+        message = self._data().decode("utf-8", errors="replace").rstrip("\n")
+        new = ref not in self.branches
+        branch = self._branch(ref)
+        start = self._optional("from")
+        if start is not None:
+            parent = self._commitish(start)
+            if parent != branch["tip"]:
+                branch["tree"] = None
+            branch["tip"] = parent
+        elif new:
+            # Comme git : sans `from`, le premier commit d'une branche est une racine,
+            # même si elle existe déjà (`from refs/heads/<branche>^0` la prolonge)
+            branch["tip"], branch["tree"] = None, None
+        parents = [branch["tip"]] if branch["tip"] else []
+        while True:
+            merge = self._optional("merge")
+            if merge is None:
+                break
+            merged = self._commitish(merge)
+            if merged not in parents:
+                parents.append(merged)
+        if branch["tree"] is None:
+            tip = branch["tip"]
+            branch["tree"] = _Tree(self._commit_tree(tip)) if tip else _Tree(entries={})
+        self._file_changes(branch)
+
+        lines = [f"tree {self._write_tree(branch['tree'])}"]
+        lines += [f"parent {parent}" for parent in parents]
+        lines += [f"author {author}", f"committer {committer}", "", message]
+        oid = self._store("\n".join(lines).encode("utf-8"), "commit")
+        branch["tip"] = oid
+        self.commits.append(oid)
+        if mark is not None:
+            self.marks[mark] = oid
+
+    def _file_changes(self, branch):
+        while True:
+            line = self._peek()
+            if line is None:
+                return
+            command, _, argument = line.partition(" ")
+            if command not in ("M", "D", "R", "C", "deleteall"):
+                if command == "N":
+                    raise self._error("les notes (N) ne sont pas prises en charge")
+                return
+            self.lookahead = None
+            root = branch["tree"]
+            if command == "deleteall":
+                branch["tree"] = _Tree(entries={})
+            elif command == "M":
+                self._modify(root, argument, branch)
+            elif command == "D":
+                path = self._path(argument)
+                if _ignored(path):
+                    self.stats["ignored"] += 1
+                    continue
+                self._remove(root, path)
+            else:
+                source, target = self._two_paths(argument)
+                if _ignored(source) or _ignored(target):
+                    self.stats["ignored"] += 1
+                    continue
+                entry = self._remove(root, source) if command == "R" else self._get(root, source)
+                if entry is None:
+                    raise self._error(f"'{source}' n'existe pas")
+                if isinstance(entry, _Tree):
+                    entry = _Tree(self._write_tree(entry))  # copie indépendante du dossier
+                self._set(root, target, entry)
+
+    def _modify(self, root, argument, branch):
+        parts = argument.split(" ", 2)
+        if len(parts) != 3:
+            raise self._error(f"M mal formé : {argument}")
+        mode, dataref, path = parts
+        if dataref == "inline":
+            oid = self._store(self._data(), "blob")
+        elif dataref.startswith(":"):
+            oid = self._commitish(dataref)
+        elif repository.is_sha(dataref) and self._exists(dataref):
+            oid = dataref
+        else:
+            raise self._error(f"objet introuvable : {dataref}")
+        path = self._path(path, allow_root=mode in TREE_MODES)
+        if _ignored(path):
+            self.stats["ignored"] += 1
+        elif mode in BLOB_MODES:
+            self._set(root, path, oid)
+        elif mode in TREE_MODES:
+            if self._read(oid)[0] != "tree":
+                raise self._error(f"{dataref} n'est pas un tree")
+            if path:
+                self._set(root, path, _Tree(oid))
+            else:
+                branch["tree"] = _Tree(oid)
+        else:
+            raise self._error(f"mode non pris en charge : {mode} (les sous-modules ne sont pas pris en charge)")
+
+    def _path(self, text, allow_root=False):
+        """Chemin en fin de ligne, éventuellement entre guillemets."""
+        try:
+            if text.startswith('"'):
+                text, rest = _unquote(text)
+                if rest:
+                    raise ValueError(f"texte après le chemin : {rest}")
+            return text if allow_root and text == "" else _check_path(text)
+        except ValueError as e:
+            raise self._error(str(e)) from None
+
+    def _two_paths(self, text):
+        """Source et destination de R et C (la source est entre guillemets si elle contient une espace)."""
+        try:
+            if text.startswith('"'):
+                source, rest = _unquote(text)
+                rest = rest[1:] if rest.startswith(" ") else ""
+            else:
+                source, _, rest = text.partition(" ")
+            if not rest:
+                raise ValueError(f"deux chemins attendus : {text}")
+            _check_path(source)
+        except ValueError as e:
+            raise self._error(str(e)) from None
+        return source, self._path(rest)
+
+    def _tag(self, name):
+        ref = self._ref("refs/tags/" + name)
+        mark = self._mark()
+        target = self._commitish(self._required("from"))
+        self._optional("original-oid")
+        tagger = self._optional("tagger")
+        message = self._data().decode("utf-8", errors="replace")
+        obj_type, _ = self._read(target)
+        lines = [f"object {target}", f"type {obj_type}", f"tag {name}"]
+        if tagger is not None:
+            lines.append(f"tagger {self._signature(tagger)}")
+        oid = self._store(("\n".join(lines) + f"\n\n{message.rstrip()}\n").encode("utf-8"), "tag")
+        branch = self._branch(ref)
+        branch["tip"], branch["tree"] = oid, None
+        if mark is not None:
+            self.marks[mark] = oid
+
+    def _reset(self, ref):
+        ref = self._ref(ref)
+        branch = self._branch(ref)
+        start = self._optional("from")
+        branch["tip"] = self._commitish(start) if start is not None else None
+        branch["tree"] = None
+
+    # --- Fin de l'import ------------------------------------------------------
+
+    def finish_pack(self):
+        """Termine le pack en cours ; ses objets deviennent lisibles par tout le dépôt."""
+        if self.pack is not None:
+            path = self.pack.finish()
+            self.pack = None
+            if path is not None:
+                self.packs.append(path)
+                self.known_packs = packfile.packs(self.git_dir)
+
+    def abort(self):
+        """Abandonne le pack en cours (les checkpoints déjà passés restent acquis)."""
+        if self.pack is not None:
+            self.pack.abort()
+            self.pack = None
+
+    def checkpoint(self):
+        """Termine le pack, puis écrit les références modifiées en une transaction
+        (et les marques avec `export_marks`) ; appelée par `checkpoint` et en fin d'import.
+
+        Une référence est refusée (voir self.rejected) si c'est un tag existant
+        ou une branche dont le nouveau commit ne contient pas l'ancien, sauf
+        avec `force`. Lève lockfile.RefConflict si une référence a changé
+        pendant l'import.
+        """
+        self.finish_pack()
+        updates = {}
+        for ref, branch in self.branches.items():
+            tip, old = branch["tip"], self.initial[ref]
+            if tip is None or tip == old:
+                self.rejected.pop(ref, None)  # refusée à un checkpoint, revenue depuis
+                continue
+            if old and not self.force:
+                if ref.startswith("refs/tags/"):
+                    self.rejected[ref] = "le tag existe déjà"
+                    continue
+                if revwalk.count([old], [tip], self.git_dir, limit=0):
+                    self.rejected[ref] = "le nouveau commit ne contient pas l'ancien"
+                    continue
+            self.rejected.pop(ref, None)
+            updates[ref] = tip
+        with lockfile.RefTransaction(reflog=reflog.record) as transaction:
+            for ref, tip in updates.items():
+                transaction.update(self._ref_path(ref), tip + "\n", old=self.initial[ref],
+                                   message=REFLOG_MESSAGE)
+        self.initial.update(updates)
+        self.updated.update(updates)
+        if self.export_marks_path:
+            lockfile.write_file(self.export_marks_path,
+                                "".join(f":{mark} {oid}\n" for mark, oid in sorted(self.marks.items())))
+        return updates
+
+    def import_marks(self, path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                mark, _, oid = line.strip().partition(" ")
+                if mark.startswith(":") and repository.is_sha(oid):
+                    self.marks[int(mark[1:])] = oid
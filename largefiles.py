@@ -0,0 +1,216 @@
+"""Stockage à part des gros fichiers (binaires, médias...).
+
+Un fichier plus gros que THRESHOLD, ou dont le chemin correspond à un motif
+de .mygitlarge (un motif par ligne, syntaxe fnmatch), n'est pas compressé
+dans .mygit/objects : son contenu est copié tel quel dans .mygit/large/,
+rangé par SHA-256, et le blob committé ne contient qu'un petit pointeur :
+
+    mygit-large v1
+    sha256 <empreinte>
+    size <octets>
+
+Au checkout, le fichier est recréé par clonage (reflink, copie sur écriture)
+si le système de fichiers le permet, sinon par lien physique, sinon par
+copie. Les fichiers du magasin sont en lecture seule : un lien physique
+ne peut donc pas être modifié sur place par erreur.
+
+Le cache stat (.mygit/large/statcache) retient, pour chaque gros fichier (ou
+fichier découpé, voir chunking) de la copie de travail, sa taille, son mtime
+et son inode avec le blob pointeur correspondant : status et commit ne relisent pas un fichier dont
+le stat n'a pas changé.
+"""
+import os
+import json
+import stat
+import shutil
+import fnmatch
+import hashlib
+
+THRESHOLD = int(os.environ.get("MYGIT_LARGE_FILE_THRESHOLD", 8 * 1024 * 1024))
+PATTERNS_FILE = ".mygitlarge"
+POINTER_HEADER = b"mygit-large v1\n"
+POINTER_MAX_SIZE = 200
+CHUNK_SIZE = 1024 * 1024
+
+# Constante ioctl FICLONE de Linux (btrfs, XFS, bcachefs...)
+FICLONE = 0x40049409
+
+_stat_caches = {}
+_patterns = {}
+
+
+def store_dir(git_dir):
+    return os.path.join(git_dir, "large")
+
+
+def store_path(oid, git_dir):
+    return os.path.join(store_dir(git_dir), oid[:2], oid[2:])
+
+
+def read_patterns(worktree, name=PATTERNS_FILE):
+    """Motifs de .mygitlarge (relus seulement si le fichier a changé)."""
+    path = os.path.join(worktree, name)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    cached = _patterns.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, encoding="utf-8") as f:
+            patterns = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        cached = _patterns[path] = (mtime, patterns)
+    return cached[1]
+
+
+def write_patterns(worktree, patterns, name=PATTERNS_FILE):
+    with open(os.path.join(worktree, name), "w", encoding="utf-8") as f:
+        f.write("".join(pattern + "\n" for pattern in patterns))
+
+
+def is_large(rel_path, size, patterns):
+    if size >= THRESHOLD:
+        return True
+    rel_path = rel_path.replace("\\", "/")
+    return any(fnmatch.fnmatch(rel_path, p) or fnmatch.fnmatch(os.path.basename(rel_path), p)
+               for p in patterns)
+
+
+def make_pointer(oid, size):
+    return POINTER_HEADER + f"sha256 {oid}\nsize {size}\n".encode()
+
+
+def parse_pointer(data):
+    """Retourne (sha256, taille) si le blob est un pointeur, sinon None."""
+    if len(data) > POINTER_MAX_SIZE or not data.startswith(POINTER_HEADER):
+        return None
+    fields = dict(line.split(" ", 1) for line in data[len(POINTER_HEADER):].decode().splitlines()
+                  if " " in line)
+    try:
+        return fields["sha256"], int(fields["size"])
+    except (KeyError, ValueError):
+        return None
+
+
+def hash_file(path):
+    """SHA-256 et taille d'un fichier, lu par blocs."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def store(path, git_dir):
+    """Copie un fichier dans le magasin (en une lecture) ; retourne (sha256, taille)."""
+    tmp_dir = os.path.join(store_dir(git_dir), "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, f"{os.getpid()}-{os.path.basename(path)}")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                dst.write(chunk)
+                size += len(chunk)
+        oid = digest.hexdigest()
+        final = store_path(oid, git_dir)
+        if os.path.exists(final):
+            os.unlink(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, final)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return oid, size
+
+
+def _clone(src, dest):
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as s, open(dest, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dest):
+            os.unlink(dest)
+        return False
+
+
+def materialize(oid, dest, git_dir):
+    """Recrée un gros fichier de la copie de travail à partir du magasin.
+
+    Retourne la méthode utilisée ("reflink", "hardlink" ou "copy").
+    """
+    src = store_path(oid, git_dir)
+    if not os.path.exists(src):
+        raise FileNotFoundError(f"Large file {oid} is missing from {store_dir(git_dir)}")
+    if os.path.lexists(dest):
+        if os.path.samefile(src, dest):
+            return "hardlink"
+        os.unlink(dest)
+    if _clone(src, dest):
+        os.chmod(dest, stat.S_IMODE(os.stat(dest).st_mode) | stat.S_IWUSR)
+        return "reflink"
+    try:
+        os.link(src, dest)
+        return "hardlink"
+    except OSError:
+        pass
+    shutil.copyfile(src, dest)
+    return "copy"
+
+
+def _stat_key(st):
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def _load_stat_cache(git_dir):
+    path = os.path.join(store_dir(git_dir), "statcache")
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    cached = _stat_caches.get(path)
+    if cached is None or cached[0] != mtime:
+        entries = {}
+        if mtime is not None:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entries = json.load(f)
+            except ValueError:
+                entries = {}
+        cached = _stat_caches[path] = [mtime, entries]
+    return path, cached
+
+
+def cached_blob(rel_path, st, git_dir):
+    """(blob pointeur, sha256) si le fichier n'a pas changé depuis le dernier passage."""
+    _, (_, entries) = _load_stat_cache(git_dir)
+    entry = entries.get(rel_path)
+    if entry and entry[:3] == _stat_key(st):
+        return entry[3], entry[4]
+    return None
+
+
+def remember(rel_path, st, blob_oid, oid, git_dir):
+    path, cached = _load_stat_cache(git_dir)
+    entries = cached[1]
+    entry = _stat_key(st) + [blob_oid, oid]
+    if entries.get(rel_path) == entry:
+        return
+    entries[rel_path] = entry
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f)
+    os.replace(tmp_path, path)
+    cached[0] = os.stat(path).st_mtime_ns
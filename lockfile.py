@@ -0,0 +1,199 @@
+"""Écritures atomiques des références et de l'index par fichiers verrous.
+
+Pour remplacer `<chemin>`, on crée `<chemin>.lock` en mode exclusif : un
+second écrivain échoue à cette étape et réessaie jusqu'à LOCK_TIMEOUT. Le
+nouveau contenu est écrit dans le verrou, synchronisé sur disque (fsync),
+puis le verrou est renommé sur le chemin : un lecteur voit l'ancienne ou la
+nouvelle valeur, jamais un fichier tronqué.
+
+RefTransaction met à jour plusieurs références d'un bloc : tous les verrous
+sont pris (dans l'ordre des chemins, pour que deux transactions ne s'attendent
+pas mutuellement), les anciennes valeurs attendues sont vérifiées sous verrou
+(compare-and-swap), puis seulement les fichiers sont renommés. Si une valeur a
+changé entre-temps, rien n'est écrit et RefConflict est levée.
+
+Deux jobs qui committent sur des branches différentes ne prennent jamais le
+même verrou et avancent en parallèle.
+"""
+import os
+import time
+
+from profiling import phase
+
+LOCK_SUFFIX = ".lock"
+LOCK_TIMEOUT = 5.0
+RETRY_DELAY = 0.005
+
+# Ancienne valeur attendue : ANY ne vérifie rien, None exige une référence absente ou vide
+ANY = object()
+
+
+class LockError(RuntimeError):
+    """Le verrou d'un fichier est tenu par un autre processus."""
+
+
+class RefConflict(RuntimeError):
+    """Une référence n'a plus la valeur attendue par la transaction."""
+
+
+def _fsync_dir(directory):
+    # Rend le renommage durable ; ignoré là où un dossier ne s'ouvre pas (Windows)
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class LockFile:
+    """Verrou `<chemin>.lock` dont le contenu remplace `<chemin>` à commit()."""
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT):
+        self.path = os.fspath(path)
+        self.lock_path = self.path + LOCK_SUFFIX
+        self.fd = None
+        deadline = time.monotonic() + timeout
+        delay = RETRY_DELAY
+        while True:
+            try:
+                self.fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+                return
+            except FileExistsError:
+                if time.monotonic() >= deadline:
+                    raise LockError(f"{self.lock_path} existe : un autre processus écrit ce fichier "
+                                    "(supprimez le verrou s'il est abandonné)")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self.fd, view):]
+
+    def commit(self, sync=True):
+        """Remplace le fichier par le contenu du verrou et libère le verrou."""
+        try:
+            if sync:
+                os.fsync(self.fd)
+            os.close(self.fd)
+            self.fd = None
+            os.replace(self.lock_path, self.path)
+        except BaseException:
+            self.rollback()
+            raise
+        if sync:
+            _fsync_dir(os.path.dirname(os.path.abspath(self.path)))
+
+    def rollback(self):
+        """Libère le verrou sans toucher au fichier."""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        try:
+            os.unlink(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.fd is not None:
+            self.rollback()
+        return False
+
+
+def write_file(path, data, sync=True):
+    """Remplace atomiquement le contenu d'un fichier (verrou, fsync, renommage)."""
+    lock = LockFile(path)
+    try:
+        lock.write(data)
+    except BaseException:
+        lock.rollback()
+        raise
+    lock.commit(sync)
+
+
+def _current_value(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class RefTransaction:
+    """Mises à jour de références appliquées ensemble, ou pas du tout.
+
+        with RefTransaction() as tx:
+            tx.update(".mygit/refs/heads/main", new_oid, old=parent_oid)
+            tx.update(".mygit/refs/heads/main.remote", new_oid)
+    """
+
+    def __init__(self, reflog=None):
+        # reflog(chemin, ancienne valeur, nouvelle valeur, message) : appelé sous
+        # verrou, juste avant les renommages, pour les mises à jour avec message
+        self.reflog = reflog
+        self.updates = {}
+
+    def update(self, path, value, old=ANY, message=None):
+        """Prévoit d'écrire `value` (None : supprimer la référence) dans `path`
+        si la référence vaut encore `old` (ANY : pas de vérification ; None :
+        absente ou vide)."""
+        self.updates[os.path.abspath(os.fspath(path))] = (value, old, message)
+
+    def commit(self):
+        locks = []
+        try:
+            with phase("ref_update", sum(len(value or "") for value, _, _ in self.updates.values())):
+                for path in sorted(self.updates):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    locks.append(LockFile(path))
+                previous = {}
+                for lock in locks:
+                    value, old, _ = self.updates[lock.path]
+                    current = previous[lock.path] = _current_value(lock.path)
+                    if old is not ANY and current != (old or None):
+                        raise RefConflict(f"{lock.path} vaut {current or '(vide)'} "
+                                          f"au lieu de {old or '(vide)'}")
+                    if value is not None:
+                        lock.write(value)
+                for lock in locks:
+                    os.fsync(lock.fd)
+                if self.reflog is not None:
+                    for lock in locks:
+                        value, _, message = self.updates[lock.path]
+                        if message is not None and value is not None:
+                            self.reflog(lock.path, previous[lock.path], value.strip(), message)
+                # Tous les verrous sont pris et vérifiés : les renommages ne peuvent plus être refusés
+                while locks:
+                    lock = locks.pop(0)
+                    if self.updates[lock.path][0] is None:
+                        try:
+                            os.unlink(lock.path)
+                        except FileNotFoundError:
+                            pass
+                        lock.rollback()
+                    else:
+                        lock.commit(sync=False)
+                for directory in {os.path.dirname(path) for path in self.updates}:
+                    _fsync_dir(directory)
+        finally:
+            for lock in locks:
+                lock.rollback()
+        self.updates.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        return False
@@ -2,58 +2,205 @@
 import sys
 import traceback
 
+def forward_to_server(argv):
+    """Client léger du serveur de commandes (voir commands/server.py).
+
+    Si un serveur tourne pour ce dépôt, on lui transmet la commande et on
+    recopie ses trames (o=stdout, e=stderr, x=code de sortie). Retourne None
+    si aucun serveur ne répond, pour exécuter la commande localement. Seules
+    les variables d'environnement MYGIT_* sont transmises au serveur.
+    """
+    import os
+    import socket
+    sock_path = os.path.join(".mygit", "server.sock")
+    if os.environ.get("MYGIT_NO_SERVER") or not hasattr(socket, "AF_UNIX") or not os.path.exists(sock_path):
+        return None
+    if argv[:1] == ["server"] and argv[1:2] != ["stop"]:
+        return None
+    if "--batch" in argv or "--batch-check" in argv or argv[:1] == ["fast_import"]:
+        # Le serveur ne relaie pas stdin : les modes batch et fast_import tournent en local
+        return None
+    import json
+    import struct
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(sock_path)
+    except OSError:
+        conn.close()
+        return None
+    with conn:
+        # Répertoire courant et variables MYGIT_* : la commande s'exécute comme en local
+        env = {key: value for key, value in os.environ.items() if key.startswith("MYGIT_")}
+        request = {"argv": argv, "cwd": os.getcwd(), "env": env}
+        conn.sendall(json.dumps(request).encode() + b"\n")
+        stream = conn.makefile("rb")
+        while True:
+            header = stream.read(5)
+            if len(header) < 5:
+                return 1
+            kind, size = header[:1], struct.unpack("!I", header[1:])[0]
+            if kind == b"x":
+                return size
+            out = sys.stdout.buffer if kind == b"o" else sys.stderr.buffer
+            out.write(stream.read(size))
+            out.flush()
+
+def parse_global_options(argv):
+    """Retire de argv les options placées avant la commande (--profile...)."""
+    options = {}
+    while argv and argv[0].startswith("--"):
+        opt = argv.pop(0)
+        if opt == "--profile":
+            options["profile"] = True
+        elif opt == "--cprofile" or opt.startswith("--cprofile="):
+            options["cprofile"] = opt.partition("=")[2]
+        elif opt.startswith("--trace-json="):
+            options["trace"] = opt.partition("=")[2]
+        else:
+            print(f"Unknown option: {opt}")
+            sys.exit(1)
+    return options
+
+def run_profiled(command, options, func):
+    """Exécute la commande avec le chronométrage par phase (voir profiling.py)."""
+    import time
+    import profiling
+    profiling.enable(trace=bool(options.get("trace")))
+    profiler = None
+    if "cprofile" in options:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        func()
+    finally:
+        end = time.perf_counter()
+        if profiler is not None:
+            profiler.disable()
+        profiling.report(end - start)
+        if profiler is not None:
+            if options["cprofile"]:
+                profiler.dump_stats(options["cprofile"])
+                print(f"Profil cProfile écrit dans {options['cprofile']}", file=sys.stderr)
+            else:
+                import pstats
+                pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
+        if options.get("trace"):
+            profiling.write_chrome_trace(options["trace"], command, start, end)
+            print(f"Trace Chrome écrite dans {options['trace']}", file=sys.stderr)
+        profiling.reset()
+
 def main():
+    argv = sys.argv[1:]
+    options = parse_global_options(argv)
+    sys.argv = sys.argv[:1] + argv
     try:
         if len(sys.argv) < 2:
-            print("usage: mygit <command> [<args>]")
+            print("usage: mygit [--profile] [--cprofile[=fichier]] [--trace-json=fichier] <command> [<args>]")
             sys.exit(1)
 
         command = sys.argv[1]
 
-        if command == "hash-object":
-            from commands import hash_object
-            hash_object.run(sys.argv[2:])
-        elif command == "my_git_init":
-            from commands import my_git_init
-            my_git_init.run(sys.argv[2:])
-        elif command == "git_cat_file":
-            from commands import git_cat_file
-            git_cat_file.run(sys.argv[2:])
-        elif command == "my_git_add":
-            from commands import my_git_add
-            my_git_add.run(sys.argv[2:])
-        elif command == "commit":
-            from commands import commit
-            commit.run(sys.argv[2:])
-        elif command == "push":
-            from commands import push
-            push.run(sys.argv[2:])
-        elif command == "branch":
-            from commands import branch
-            branch.run(sys.argv[2:])
-        elif command == "checkout":
-            from commands import checkout 
-            checkout.run(sys.argv[2:])   
-        elif command == "reset":
-            from commands import reset
-            reset.run(sys.argv[2:])                  
-        elif command == "merge":
-            from commands import merge
-            merge.run_merge(sys.argv[2:])
-        elif command == "status":
-            from commands import status
-            status.run_status(sys.argv[2:])
-        elif command == "log":
-            from commands import log
-            log.run_log(sys.argv[2:])
-        else:
-            print(f"Unknown command: {command}")
-            sys.exit(1)
+        try:
+            if options:
+                run_profiled(command, options, dispatch)
+            else:
+                dispatch()
+        finally:
+            # MYGIT_FSYNC=batch : objets de la commande synchronisés en une fois
+            import repository
+            repository.sync_objects()
 
     except ImportError as e:
         print(f"Error: could not import module for command '{command}'.")
         print(f"Details: {e}")
         sys.exit(1)
 
+def dispatch():
+    command = sys.argv[1]
+
+    if command == "hash-object":
+        from commands import hash_object
+        hash_object.run(sys.argv[2:])
+    elif command == "my_git_init":
+        from commands import my_git_init
+        my_git_init.run(sys.argv[2:])
+    elif command == "git_cat_file":
+        from commands import git_cat_file
+        git_cat_file.run(sys.argv[2:])
+    elif command == "my_git_add":
+        from commands import my_git_add
+        my_git_add.run(sys.argv[2:])
+    elif command == "commit":
+        from commands import commit
+        commit.run(sys.argv[2:])
+    elif command == "push":
+        from commands import push
+        push.run(sys.argv[2:])
+    elif command == "branch":
+        from commands import branch
+        branch.run(sys.argv[2:])
+    elif command == "checkout":
+        from commands import checkout 
+        checkout.run(sys.argv[2:])   
+    elif command == "reset":
+        from commands import reset
+        reset.run(sys.argv[2:])                  
+    elif command == "merge":
+        from commands import merge
+        merge.run_merge(sys.argv[2:])
+    elif command == "status":
+        from commands import status
+        status.run_status(sys.argv[2:])
+    elif command == "log":
+        from commands import log
+        log.run_log(sys.argv[2:])
+    elif command == "write_tree":
+        from commands import write_tree
+        write_tree.run(sys.argv[2:])
+    elif command == "commit_tree":
+        from commands import commit_tree
+        commit_tree.run(sys.argv[2:])
+    elif command == "ls_files":
+        from commands import ls_files
+        ls_files.run(sys.argv[2:])
+    elif command == "fsck":
+        from commands import fsck
+        fsck.run(sys.argv[2:])
+    elif command == "count_objects":
+        from commands import count_objects
+        count_objects.run(sys.argv[2:])
+    elif command == "blame":
+        from commands import blame
+        blame.run(sys.argv[2:])
+    elif command == "tag":
+        from commands import tag
+        tag.run(sys.argv[2:])
+    elif command == "describe":
+        from commands import describe
+        describe.run(sys.argv[2:])
+    elif command == "archive":
+        from commands import archive
+        archive.run(sys.argv[2:])
+    elif command == "fast_import":
+        from commands import fast_import
+        fast_import.run(sys.argv[2:])
+    elif command == "gc":
+        from commands import gc
+        gc.run(sys.argv[2:])
+    elif command == "large":
+        from commands import large
+        large.run(sys.argv[2:])
+    elif command == "server":
+        from commands import server
+        server.run(sys.argv[2:])
+    else:
+        print(f"Unknown command: {command}")
+        sys.exit(1)
+
 if __name__ == "__main__":
+    code = forward_to_server(sys.argv[1:])
+    if code is not None:
+        sys.exit(code)
     main()
\ No newline at end of file
@@ -0,0 +1,257 @@
+"""Ramasse-miettes du dépôt : marquage, élagage et recompactage (commande gc).
+
+1. Marquage : tout ce qui est accessible depuis les références (branches,
+   .remote, tags, HEAD détaché) en suivant commits, trees, tags et listes de
+   morceaux. Les blobs ne sont décompressés qu'en tête, pour reconnaître les
+   pointeurs (gros fichiers, listes de morceaux).
+2. Recompactage : les objets accessibles (isolés et déjà empaquetés) sont
+   copiés tels quels, au fil du marquage, dans un seul nouveau pack écrit
+   directement sur disque (packfile.PackWriter), accompagné de ses bitmaps
+   d'accessibilité (voir bitmaps) ; les anciens packs et les objets isolés
+   empaquetés sont supprimés. Les filtres de chemins modifiés (voir bloom)
+   sont réécrits pour tous les commits accessibles, de même que l'index de
+   recherche des commits (voir search) s'il existe.
+3. Élagage : les objets isolés inaccessibles plus vieux que le délai de grâce
+   sont supprimés, ainsi que les fichiers du magasin des gros fichiers que plus
+   rien ne désigne. Le délai protège ce qu'une commande en cours vient d'écrire
+   (blobs d'un my_git_add pas encore committé...).
+
+Le mode automatique (gc --auto, lancé après commit et my_git_add) ne fait rien
+tant que le nombre d'objets isolés reste sous MYGIT_GC_AUTO (0 : désactivé).
+"""
+import os
+import time
+
+import bitmaps
+import bloom
+import chunking
+import commitgraph
+import largefiles
+import packfile
+import reflog
+import repository
+import revwalk
+import search
+
+GRACE_PERIOD = 14 * 24 * 3600
+AUTO_THRESHOLD = int(os.environ.get("MYGIT_GC_AUTO", 6700))
+LOCK_NAME = "gc.pid"
+LOCK_MAX_AGE = 12 * 3600
+
+
+def parse_grace(value):
+    """Délai de grâce en secondes : "now", "<n>d", "<n>h", "<n>m" ou "<n>s"."""
+    if value == "now":
+        return 0
+    units = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+    try:
+        if value and value[-1] in units:
+            return int(value[:-1]) * units[value[-1]]
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Délai invalide : {value}")
+
+
+def mark_reachable(git_dir=repository.GIT_DIR_NAME, roots=None, writer=None):
+    """Retourne (objets accessibles {sha: type}, gros fichiers accessibles).
+
+    Avec `writer` (packfile.PackWriter), chaque objet accessible y est copié
+    dès qu'il est marqué.
+    """
+    if roots is None:
+        roots = list(repository.all_refs(git_dir).values())
+    reachable = {}
+    large = set()
+    stack = [(None, oid) for oid in roots]
+    while stack:
+        expected, oid = stack.pop()
+        if oid in reachable:
+            continue
+        reachable[oid] = expected
+        try:
+            if expected in ("blob", "chunk"):
+                obj_type, head = repository.peek_object(oid, git_dir)
+                reachable[oid] = obj_type
+                if obj_type != "blob" or not (head.startswith(chunking.POINTER_HEADER) or
+                                              head.startswith(largefiles.POINTER_HEADER)):
+                    if writer is not None:
+                        writer.add(oid, bytes(repository.read_raw_object(oid, git_dir)))
+                    continue
+            obj_type, content = repository.read_object(oid, git_dir)
+            if writer is not None:
+                writer.add(oid, bytes(repository.read_raw_object(oid, git_dir)))
+        except (FileNotFoundError, ValueError):
+            # Objet manquant ou abîmé : fsck le signalera, on ne l'empaquette pas
+            continue
+        reachable[oid] = obj_type
+        pointer = largefiles.parse_pointer(content) if obj_type == "blob" else None
+        if pointer is not None:
+            large.add(pointer[0])
+        stack.extend(repository.object_links(obj_type, content))
+    return reachable, large
+
+
+def repack(writer, git_dir=repository.GIT_DIR_NAME):
+    """Termine le pack de `writer`, rempli par mark_reachable, qui remplace
+    tous les anciens packs.
+
+    Retourne (chemin du pack, nombre d'objets).
+    """
+    old_packs = list(packfile.packs(git_dir))
+    packed = writer.oids()
+    writer.count = len(packed)  # écrit même vide, comme les bitmaps l'attendent
+    pack_path = writer.finish()
+    for pack in old_packs:
+        if os.path.abspath(pack.pack_path) != os.path.abspath(pack_path):
+            pack.close()
+            packfile.remove_pack(pack.pack_path)
+    # Les objets isolés désormais empaquetés ne servent plus
+    for oid in packed:
+        path = repository.object_path(oid, git_dir)
+        if os.path.exists(path):
+            os.unlink(path)
+    return pack_path, len(packed)
+
+
+def prune_loose(reachable, git_dir=repository.GIT_DIR_NAME, grace=GRACE_PERIOD, now=None):
+    now = time.time() if now is None else now
+    pruned = 0
+    for oid in list(repository.loose_object_ids(git_dir)):
+        if oid in reachable:
+            continue
+        path = repository.object_path(oid, git_dir)
+        if now - os.stat(path).st_mtime >= grace:
+            os.unlink(path)
+            pruned += 1
+    objects_dir = os.path.join(git_dir, "objects")
+    for prefix in os.listdir(objects_dir):
+        subdir = os.path.join(objects_dir, prefix)
+        if len(prefix) != 2 or not os.path.isdir(subdir):
+            continue
+        # Fichiers temporaires laissés par une écriture d'objet interrompue
+        for name in os.listdir(subdir):
+            path = os.path.join(subdir, name)
+            if name.startswith(repository.OBJECT_TMP_PREFIX) and now - os.stat(path).st_mtime >= grace:
+                os.unlink(path)
+        if not os.listdir(subdir):
+            os.rmdir(subdir)
+    return pruned
+
+
+def prune_large(large, git_dir=repository.GIT_DIR_NAME, grace=GRACE_PERIOD, now=None):
+    """Supprime du magasin les gros fichiers qu'aucun pointeur accessible ne désigne."""
+    now = time.time() if now is None else now
+    store = largefiles.store_dir(git_dir)
+    if not os.path.isdir(store):
+        return 0
+    pruned = 0
+    for prefix in os.listdir(store):
+        subdir = os.path.join(store, prefix)
+        if not os.path.isdir(subdir):
+            continue
+        for name in os.listdir(subdir):
+            oid = prefix + name
+            path = os.path.join(subdir, name)
+            if (prefix == "tmp" or oid not in large) and now - os.stat(path).st_mtime >= grace:
+                os.unlink(path)
+                pruned += 1
+        if prefix != "tmp" and not os.listdir(subdir):
+            os.rmdir(subdir)
+    return pruned
+
+
+def collect_garbage(git_dir=repository.GIT_DIR_NAME, grace=GRACE_PERIOD, now=None):
+    """Marque, recompacte et élague ; retourne un dict de statistiques."""
+    now = time.time() if now is None else now
+    # Les commits encore cités par le reflog (après expiration) restent accessibles
+    expired = reflog.expire(git_dir, now=now)
+    roots = set(repository.all_refs(git_dir).values()) | reflog.referenced_oids(git_dir)
+    writer = packfile.PackWriter(git_dir)
+    try:
+        reachable, large = mark_reachable(git_dir, roots, writer)
+        # Objets empaquetés inaccessibles d'un pack encore récent : ressortis en
+        # objets isolés datés du pack, pour que le délai de grâce s'applique à eux
+        # (les remettre dans le nouveau pack les rajeunirait à chaque gc)
+        for pack in packfile.packs(git_dir):
+            pack_mtime = os.stat(pack.pack_path).st_mtime
+            if now - pack_mtime >= grace:
+                continue
+            for oid in pack.oids():
+                path = repository.object_path(oid, git_dir)
+                if oid in reachable or os.path.exists(path):
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(pack.read_raw(oid))
+                os.utime(path, (pack_mtime, pack_mtime))
+    except BaseException:
+        writer.abort()
+        raise
+    pack_path, packed = repack(writer, git_dir)
+    selected = bitmaps.write_bitmaps(pack_path, repository.all_refs(git_dir).values(), git_dir, reachable)
+    commits = [oid for oid, type_ in reachable.items() if type_ == "commit"]
+    graph = commitgraph.write_graph({oid: revwalk.commit_links(oid, git_dir) for oid in commits}, git_dir)
+    filters = bloom.write_filters(commits, git_dir)
+    if search.exists(git_dir):
+        # L'index de recherche ne garde que les commits accessibles, journal fusionné
+        search.update(commits, git_dir)
+        search.compact(git_dir, keep=set(commits))
+    return {
+        "reachable": len(reachable),
+        "packed": packed,
+        "pack": pack_path,
+        "bitmaps": selected,
+        "bloom_filters": filters,
+        "commit_graph": graph,
+        "pruned": prune_loose(reachable, git_dir, grace, now),
+        "large_pruned": prune_large(large, git_dir, grace, now),
+        "reflog_expired": expired,
+    }
+
+
+def count_loose_objects(git_dir=repository.GIT_DIR_NAME, limit=None):
+    """Nombre d'objets isolés (on s'arrête dès que `limit` est dépassé)."""
+    objects_dir = os.path.join(git_dir, "objects")
+    count = 0
+    if not os.path.isdir(objects_dir):
+        return 0
+    for prefix in os.listdir(objects_dir):
+        subdir = os.path.join(objects_dir, prefix)
+        if len(prefix) == 2 and os.path.isdir(subdir):
+            count += len(os.listdir(subdir))
+            if limit is not None and count > limit:
+                break
+    return count
+
+
+def acquire_lock(git_dir=repository.GIT_DIR_NAME):
+    """Empêche deux gc simultanés ; un verrou de plus de 12 h est considéré abandonné."""
+    path = os.path.join(git_dir, LOCK_NAME)
+    if os.path.exists(path) and time.time() - os.stat(path).st_mtime > LOCK_MAX_AGE:
+        os.unlink(path)
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as f:
+        f.write(str(os.getpid()))
+    return True
+
+
+def release_lock(git_dir=repository.GIT_DIR_NAME):
+    path = os.path.join(git_dir, LOCK_NAME)
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+def auto_gc(git_dir=repository.GIT_DIR_NAME, threshold=None):
+    """gc si trop d'objets isolés se sont accumulés ; retourne les statistiques ou None."""
+    threshold = AUTO_THRESHOLD if threshold is None else threshold
+    if threshold <= 0 or count_loose_objects(git_dir, threshold) <= threshold:
+        return None
+    if not acquire_lock(git_dir):
+        return None
+    try:
+        return collect_garbage(git_dir)
+    finally:
+        release_lock(git_dir)
@@ -0,0 +1,272 @@
+"""Instrumentation du serveur web : latences par route, lectures d'objets, caches.
+
+Désactivé par défaut. On l'active avec MYGIT_METRICS=1 (ou enable()) ; les
+requêtes plus lentes que MYGIT_SLOW_MS millisecondes sont alors journalisées
+avec le détail de leurs phases. Quand c'est désactivé, chaque point de mesure
+se résume à un test de booléen.
+
+Chaque compteur est une série de nombres désignée par (sorte, nom) : une route
+(seaux de latence, nombre, somme, objets, octets, erreurs), une phase, un
+cache (succès, échecs) ou les lectures d'objets. En mode multi-processus,
+share() les range avant le fork dans une table en mémoire partagée (mmap
+anonyme, comme le cache d'objets de app.py) : tous les workers y ajoutent leurs
+mesures, et /metrics renvoie le total quel que soit le worker qui répond.
+"""
+import os
+import mmap
+import time
+import zlib
+import struct
+import logging
+import threading
+import multiprocessing
+from contextlib import contextmanager, nullcontext
+
+ENABLED = os.environ.get("MYGIT_METRICS", "") not in ("", "0")
+SLOW_REQUEST_MS = float(os.environ.get("MYGIT_SLOW_MS", "0") or 0)
+
+# Bornes des seaux de l'histogramme de latence (en secondes)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Série d'une route : un compteur par seau, puis ces champs
+ROUTE_FIELDS = ("count", "sum", "reads", "bytes", "errors")
+ROUTE = {name: len(LATENCY_BUCKETS) + i for i, name in enumerate(ROUTE_FIELDS)}
+SHARED_SLOTS = 1024
+KEY_SIZE = 120
+
+logger = logging.getLogger("mygit.metrics")
+
+_lock = threading.Lock()
+_local = threading.local()
+_series = {}  # (sorte, nom) -> [valeurs], si la table n'est pas partagée
+_shared = None
+
+
+class SharedCounters:
+    """Séries de compteurs dans une zone mmap anonyme, créée avant le fork.
+
+    Chaque case contient la clé (sorte et nom séparés par un octet nul,
+    tronquée à KEY_SIZE octets) et les valeurs de la série ; les cases sont
+    attribuées par hachage (sondage linéaire). Un verrou de multiprocessing
+    protège les ajouts de tous les processus ; la position d'une clé déjà
+    trouvée est gardée par processus, et revérifiée (reset() vide la table).
+    """
+
+    def __init__(self, slots=SHARED_SLOTS):
+        self.values = len(LATENCY_BUCKETS) + len(ROUTE_FIELDS)
+        self.slot = struct.Struct(f"<{KEY_SIZE}s{self.values}d")
+        self.slots = slots
+        self.buffer = mmap.mmap(-1, slots * self.slot.size)
+        self.lock = multiprocessing.Lock()
+        self.positions = {}
+
+    def _find(self, key):
+        """Début de la case de `key` (attribuée si besoin), ou None si la table est pleine."""
+        cached = self.positions.get(key)
+        if cached is not None and self.buffer[cached[0]:cached[0] + KEY_SIZE] == cached[1]:
+            return cached[0]
+        encoded = f"{key[0]}\0{key[1]}".encode("utf-8")[:KEY_SIZE].ljust(KEY_SIZE, b"\0")
+        start = zlib.crc32(encoded) % self.slots
+        for probe in range(self.slots):
+            offset = (start + probe) % self.slots * self.slot.size
+            stored = self.buffer[offset:offset + KEY_SIZE]
+            if not stored.strip(b"\0"):
+                self.buffer[offset:offset + KEY_SIZE] = encoded
+            elif stored != encoded:
+                continue
+            self.positions[key] = (offset, encoded)
+            return offset
+        return None
+
+    def add(self, key, amounts):
+        with self.lock:
+            offset = self._find(key)
+            if offset is None:
+                return  # table pleine : la mesure est perdue
+            for index, amount in amounts:
+                position = offset + KEY_SIZE + 8 * index
+                struct.pack_into("<d", self.buffer, position,
+                                 struct.unpack_from("<d", self.buffer, position)[0] + amount)
+
+    def items(self):
+        """{(sorte, nom): [valeurs]} de toutes les séries écrites."""
+        series = {}
+        with self.lock:
+            for i in range(self.slots):
+                key, *values = self.slot.unpack_from(self.buffer, i * self.slot.size)
+                key = key.rstrip(b"\0")
+                if key:
+                    kind, _, name = key.decode("utf-8", errors="replace").partition("\0")
+                    series[(kind, name)] = values
+        return series
+
+    def clear(self):
+        with self.lock:
+            self.buffer[:] = bytes(len(self.buffer))
+            self.positions.clear()
+
+
+def _add(kind, name, amounts):
+    """Ajoute [(position, valeur)] à la série (kind, name)."""
+    if _shared is not None:
+        _shared.add((kind, name), amounts)
+        return
+    with _lock:
+        values = _series.get((kind, name))
+        if values is None:
+            values = _series[(kind, name)] = [0] * (len(LATENCY_BUCKETS) + len(ROUTE_FIELDS))
+        for index, amount in amounts:
+            values[index] += amount
+
+
+def _snapshot():
+    if _shared is not None:
+        return _shared.items()
+    with _lock:
+        return {key: list(values) for key, values in _series.items()}
+
+
+def share():
+    """Range les compteurs en mémoire partagée ; à appeler avant de créer les workers."""
+    global _shared
+    if _shared is not None:
+        return
+    shared = SharedCounters()
+    with _lock:
+        for key, values in _series.items():
+            shared.add(key, list(enumerate(values)))
+        _series.clear()
+    _shared = shared
+
+
+def enable(slow_ms=None):
+    global ENABLED, SLOW_REQUEST_MS
+    ENABLED = True
+    if slow_ms is not None:
+        SLOW_REQUEST_MS = float(slow_ms)
+
+
+def reset():
+    if _shared is not None:
+        _shared.clear()
+    with _lock:
+        _series.clear()
+
+
+def start_request():
+    _local.request = {"start": time.perf_counter(), "reads": 0, "bytes": 0, "phases": {}}
+
+
+def finish_request(route, status):
+    current = getattr(_local, "request", None)
+    if current is None:
+        return
+    _local.request = None
+    elapsed = time.perf_counter() - current["start"]
+    amounts = [(i, 1) for i, bound in enumerate(LATENCY_BUCKETS) if elapsed <= bound]
+    amounts += [(ROUTE["count"], 1), (ROUTE["sum"], elapsed), (ROUTE["reads"], current["reads"]),
+                (ROUTE["bytes"], current["bytes"]), (ROUTE["errors"], 1 if status >= 500 else 0)]
+    _add("route", route, amounts)
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        phases = ", ".join(f"{name}={seconds * 1000:.1f}ms"
+                           for name, seconds in sorted(current["phases"].items()))
+        logger.warning("slow request %s %.1fms status=%s objects=%d inflated=%dB %s",
+                       route, elapsed * 1000, status, current["reads"], current["bytes"], phases)
+
+
+def record_object_read(size):
+    _add("objects", "", [(0, 1), (1, size)])
+    current = getattr(_local, "request", None)
+    if current is not None:
+        current["reads"] += 1
+        current["bytes"] += size
+
+
+def record_cache(name, hit):
+    _add("cache", name, [(0 if hit else 1, 1)])
+
+
+@contextmanager
+def _timed_phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _add("phase", name, [(0, elapsed)])
+        current = getattr(_local, "request", None)
+        if current is not None:
+            current["phases"][name] = current["phases"].get(name, 0.0) + elapsed
+
+
+def phase(name):
+    """Chronomètre un bloc (inflation, parsing de commits.txt, rendu...)."""
+    if not ENABLED:
+        return nullcontext()
+    return _timed_phase(name)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def render_prometheus():
+    """Exporte les compteurs au format texte de Prometheus."""
+    series = _snapshot()
+
+    def of(kind):
+        return sorted((name, values) for (series_kind, name), values in series.items() if series_kind == kind)
+
+    routes = of("route")
+    objects = series.get(("objects", ""), [0, 0])
+    out = []
+    out.append("# HELP mygit_request_duration_seconds Latence des requêtes par route.")
+    out.append("# TYPE mygit_request_duration_seconds histogram")
+    for route, values in routes:
+        label = _label(route)
+        count = int(values[ROUTE["count"]])
+        for bound, bucket in zip(LATENCY_BUCKETS, values):
+            out.append(f'mygit_request_duration_seconds_bucket{{route="{label}",le="{bound}"}} {int(bucket)}')
+        out.append(f'mygit_request_duration_seconds_bucket{{route="{label}",le="+Inf"}} {count}')
+        out.append(f'mygit_request_duration_seconds_sum{{route="{label}"}} {values[ROUTE["sum"]]:.6f}')
+        out.append(f'mygit_request_duration_seconds_count{{route="{label}"}} {count}')
+
+    out.append("# HELP mygit_request_errors_total Réponses 5xx par route.")
+    out.append("# TYPE mygit_request_errors_total counter")
+    for route, values in routes:
+        out.append(f'mygit_request_errors_total{{route="{_label(route)}"}} {int(values[ROUTE["errors"]])}')
+
+    out.append("# HELP mygit_request_objects_read_total Objets lus par route.")
+    out.append("# TYPE mygit_request_objects_read_total counter")
+    for route, values in routes:
+        out.append(f'mygit_request_objects_read_total{{route="{_label(route)}"}} {int(values[ROUTE["reads"]])}')
+
+    out.append("# HELP mygit_request_bytes_inflated_total Octets décompressés par route.")
+    out.append("# TYPE mygit_request_bytes_inflated_total counter")
+    for route, values in routes:
+        out.append(f'mygit_request_bytes_inflated_total{{route="{_label(route)}"}} {int(values[ROUTE["bytes"]])}')
+
+    out.append("# HELP mygit_objects_read_total Objets lus depuis .mygit/objects.")
+    out.append("# TYPE mygit_objects_read_total counter")
+    out.append(f'mygit_objects_read_total {int(objects[0])}')
+    out.append("# HELP mygit_bytes_inflated_total Octets décompressés depuis .mygit/objects.")
+    out.append("# TYPE mygit_bytes_inflated_total counter")
+    out.append(f'mygit_bytes_inflated_total {int(objects[1])}')
+
+    out.append("# HELP mygit_phase_seconds_total Temps cumulé par phase.")
+    out.append("# TYPE mygit_phase_seconds_total counter")
+    for name, values in of("phase"):
+        out.append(f'mygit_phase_seconds_total{{phase="{_label(name)}"}} {values[0]:.6f}')
+
+    caches = [(name, int(values[0]), int(values[1])) for name, values in of("cache")]
+    out.append("# HELP mygit_cache_requests_total Accès aux caches, par résultat.")
+    out.append("# TYPE mygit_cache_requests_total counter")
+    for name, hits, misses in caches:
+        out.append(f'mygit_cache_requests_total{{cache="{_label(name)}",result="hit"}} {hits}')
+        out.append(f'mygit_cache_requests_total{{cache="{_label(name)}",result="miss"}} {misses}')
+    out.append("# HELP mygit_cache_hit_ratio Proportion d'accès servis par le cache.")
+    out.append("# TYPE mygit_cache_hit_ratio gauge")
+    for name, hits, misses in caches:
+        ratio = hits / (hits + misses) if hits + misses else 0.0
+        out.append(f'mygit_cache_hit_ratio{{cache="{_label(name)}"}} {ratio:.4f}')
+    return "\n".join(out) + "\n"
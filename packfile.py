@@ -0,0 +1,270 @@
+"""Fichiers pack : plusieurs objets dans un seul fichier, avec un index trié.
+
+.mygit/objects/pack/pack-<sha>.pack :
+    "MYPK" | version (4 octets) | nombre d'objets (4 octets)
+    puis chaque objet tel qu'il est stocké isolé (zlib de "type taille\\0contenu")
+    puis le SHA-1 de tout ce qui précède
+
+.mygit/objects/pack/pack-<sha>.idx :
+    "MYIX" | version | nombre d'objets
+    table de répartition : 256 compteurs cumulés (premier octet du SHA)
+    SHA binaires triés (20 octets chacun)
+    pour chaque SHA, dans le même ordre : position (8 octets) et taille (4 octets)
+    puis le SHA-1 du pack
+
+Les objets gardent leur compression d'origine : empaqueter revient à copier
+des octets, sans recompresser. La recherche d'un SHA est une dichotomie dans
+la tranche de la table de répartition, sur l'index projeté en mémoire.
+"""
+import os
+import mmap
+import struct
+import hashlib
+import tempfile
+import threading
+
+PACK_MAGIC = b"MYPK"
+IDX_MAGIC = b"MYIX"
+VERSION = 1
+HEADER = struct.Struct(">4sII")
+ENTRY = struct.Struct(">QI")
+
+_packs = {}
+_lock = threading.Lock()
+
+
+def pack_dir(git_dir):
+    return os.path.join(git_dir, "objects", "pack")
+
+
+class Pack:
+    def __init__(self, pack_path):
+        self.pack_path = pack_path
+        self.idx_path = pack_path[:-len(".pack")] + ".idx"
+        with open(self.idx_path, "rb") as f:
+            self.idx = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(pack_path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self.idx, 0)
+        if magic != IDX_MAGIC or version != VERSION:
+            raise ValueError(f"{self.idx_path}: invalid pack index")
+        self.fanout = struct.unpack_from(">256I", self.idx, HEADER.size)
+        self.names_offset = HEADER.size + 256 * 4
+        self.entries_offset = self.names_offset + 20 * self.count
+
+    def _name(self, i):
+        start = self.names_offset + 20 * i
+        return self.idx[start:start + 20]
+
+    def find(self, oid):
+        """Position de l'objet dans l'index, ou -1."""
+        try:
+            key = bytes.fromhex(oid)
+        except ValueError:
+            return -1
+        lo = self.fanout[key[0] - 1] if key[0] else 0
+        hi = self.fanout[key[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            name = self._name(mid)
+            if name < key:
+                lo = mid + 1
+            elif name > key:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def __contains__(self, oid):
+        return self.find(oid) >= 0
+
+    def read_raw(self, oid):
+        """Octets compressés de l'objet, ou None s'il n'est pas dans ce pack."""
+        i = self.find(oid)
+        if i < 0:
+            return None
+        offset, size = ENTRY.unpack_from(self.idx, self.entries_offset + ENTRY.size * i)
+        return self.data[offset:offset + size]
+
+    def oids(self):
+        for i in range(self.count):
+            yield self._name(i).hex()
+
+    def verify(self):
+        """Vrai si le SHA-1 final correspond au contenu du pack."""
+        digest = hashlib.sha1()
+        end = len(self.data) - 20
+        for start in range(0, end, 1 << 20):
+            digest.update(self.data[start:min(end, start + (1 << 20))])
+        return digest.digest() == self.data[end:]
+
+    def close(self):
+        self.idx.close()
+        self.data.close()
+
+
+def packs(git_dir):
+    """Packs du dépôt, rouverts seulement si le dossier pack a changé."""
+    directory = pack_dir(git_dir)
+    try:
+        mtime = os.stat(directory).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    key = os.path.abspath(directory)
+    with _lock:
+        cached = _packs.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        opened = []
+        for name in sorted(os.listdir(directory)):
+            if name.startswith("pack-") and name.endswith(".pack") and \
+                    os.path.exists(os.path.join(directory, name[:-5] + ".idx")):
+                try:
+                    opened.append(Pack(os.path.join(directory, name)))
+                except (OSError, ValueError):
+                    continue
+        _packs[key] = (mtime, opened)
+        return opened
+
+
+def read_packed(oid, git_dir):
+    for pack in packs(git_dir):
+        raw = pack.read_raw(oid)
+        if raw is not None:
+            return raw
+    return None
+
+
+def has_packed(oid, git_dir):
+    return any(oid in pack for pack in packs(git_dir))
+
+
+class PackWriter:
+    """Pack écrit objet par objet sur disque, sans garder les objets en mémoire.
+
+    Si le nombre d'objets n'est pas connu d'avance (`count`), l'en-tête est
+    réécrit à finish() et le pack relu une fois pour calculer son SHA-1 final.
+    Les objets déjà écrits restent lisibles par read_raw() avant finish().
+    """
+
+    def __init__(self, git_dir, count=None):
+        self.directory = pack_dir(git_dir)
+        os.makedirs(self.directory, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(prefix="tmp-", suffix=".pack", dir=self.directory)
+        self.file = os.fdopen(fd, "w+b")
+        self.count = count
+        self.digest = hashlib.sha1() if count is not None else None
+        self.index = {}
+        self.offset = 0
+        self._write(HEADER.pack(PACK_MAGIC, VERSION, count or 0))
+
+    def _write(self, data):
+        self.file.write(data)
+        if self.digest is not None:
+            self.digest.update(data)
+        self.offset += len(data)
+
+    def add(self, oid, raw):
+        """Ajoute les octets compressés d'un objet ; faux s'il est déjà dans le pack."""
+        key = bytes.fromhex(oid)
+        if key in self.index:
+            return False
+        self.index[key] = (self.offset, len(raw))
+        self._write(raw)
+        return True
+
+    def __contains__(self, oid):
+        return bytes.fromhex(oid) in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def oids(self):
+        return [name.hex() for name in self.index]
+
+    def read_raw(self, oid):
+        entry = self.index.get(bytes.fromhex(oid))
+        if entry is None:
+            return None
+        offset, size = entry
+        self.file.seek(offset)
+        raw = self.file.read(size)
+        self.file.seek(0, os.SEEK_END)
+        return raw
+
+    def finish(self):
+        """Termine le pack et son index ; retourne son chemin (None si aucun
+        objet n'a été ajouté à un pack de taille inconnue)."""
+        if not self.index and self.count is None:
+            self.abort()
+            return None
+        try:
+            if self.digest is None or self.count != len(self.index):
+                self.file.seek(0)
+                self.file.write(HEADER.pack(PACK_MAGIC, VERSION, len(self.index)))
+                self.file.seek(0)
+                self.digest = hashlib.sha1()
+                for data in iter(lambda: self.file.read(1 << 20), b""):
+                    self.digest.update(data)
+            pack_sha = self.digest.digest()
+            self.file.seek(0, os.SEEK_END)
+            self.file.write(pack_sha)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            os.chmod(self.tmp_path, 0o644)  # mkstemp crée le fichier en 0600
+            index = sorted((name, offset, size) for name, (offset, size) in self.index.items())
+            fanout = [0] * 256
+            for name, _, _ in index:
+                fanout[name[0]] += 1
+            for i in range(1, 256):
+                fanout[i] += fanout[i - 1]
+            tmp_idx = self.tmp_path[:-5] + ".idx"
+            with open(tmp_idx, "wb") as f:
+                f.write(HEADER.pack(IDX_MAGIC, VERSION, len(index)))
+                f.write(struct.pack(">256I", *fanout))
+                for name, _, _ in index:
+                    f.write(name)
+                for _, offset, size in index:
+                    f.write(ENTRY.pack(offset, size))
+                f.write(pack_sha)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            self.abort()
+            raise
+        # L'index d'abord : un lecteur ne voit jamais de pack sans son index
+        final = os.path.join(self.directory, f"pack-{pack_sha.hex()}.pack")
+        os.replace(tmp_idx, final[:-5] + ".idx")
+        os.replace(self.tmp_path, final)
+        # Deux packs écrits dans le même tick d'horloge laissent le dossier à la même date
+        with _lock:
+            _packs.pop(os.path.abspath(self.directory), None)
+        return final
+
+    def abort(self):
+        """Abandonne le pack en cours."""
+        if not self.file.closed:
+            self.file.close()
+        for path in (self.tmp_path, self.tmp_path[:-5] + ".idx"):
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+def write_pack(git_dir, entries):
+    """Écrit un pack à partir de [(sha, octets compressés)] ; retourne son chemin."""
+    entries = list(entries)
+    writer = PackWriter(git_dir, len(entries))
+    try:
+        for oid, raw in entries:
+            writer.add(oid, raw)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.finish()
+
+
+def remove_pack(pack_path):
+    for path in (pack_path[:-5] + ".idx", pack_path, pack_path[:-5] + ".bitmap"):
+        if os.path.exists(path):
+            os.unlink(path)
@@ -0,0 +1,120 @@
+"""Chronométrage par phase des commandes (option globale --profile de main.py).
+
+Les points de mesure sont posés dans le code partagé (repository.py : objets,
+index, références) et dans les parcours de la copie de travail. Chaque phase
+cumule un nombre d'appels, un volume en octets et un temps réel :
+
+    walk, stat, read, hash, compress, decompress, object_write, index_write, ref_update
+
+Désactivé, phase() retourne un objet vide partagé : le coût se limite à un
+appel de fonction et un test de booléen.
+"""
+import os
+import sys
+import json
+import time
+import threading
+
+ENABLED = False
+
+_stats = {}
+_events = None
+_lock = threading.Lock()
+_origin = time.perf_counter()
+
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, nbytes):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ("name", "nbytes", "start")
+
+    def __init__(self, name, nbytes):
+        self.name = name
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def add(self, nbytes):
+        self.nbytes += nbytes
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        with _lock:
+            stats = _stats.get(self.name)
+            if stats is None:
+                stats = _stats[self.name] = [0, 0, 0.0]
+            stats[0] += 1
+            stats[1] += self.nbytes
+            stats[2] += end - self.start
+            if _events is not None:
+                _events.append({
+                    "name": self.name, "ph": "X", "pid": os.getpid(),
+                    "tid": threading.get_ident() % 100000,
+                    "ts": round((self.start - _origin) * 1e6, 3),
+                    "dur": round((end - self.start) * 1e6, 3),
+                    "args": {"bytes": self.nbytes},
+                })
+        return False
+
+
+def enable(trace=False):
+    """Active les mesures ; trace=True garde aussi chaque événement (trace Chrome)."""
+    global ENABLED, _events
+    ENABLED = True
+    if trace and _events is None:
+        _events = []
+
+
+def reset():
+    """Désactive les mesures et oublie les compteurs (serveur de commandes)."""
+    global ENABLED, _events
+    ENABLED = False
+    _events = None
+    with _lock:
+        _stats.clear()
+
+
+def phase(name, nbytes=0):
+    """Chronomètre un bloc : `with phase("read") as p: ...; p.add(len(data))`."""
+    if not ENABLED:
+        return _NULL_PHASE
+    return _Phase(name, nbytes)
+
+
+def report(total=None, stream=None):
+    """Affiche le tableau des phases (sur stderr par défaut)."""
+    stream = stream or sys.stderr
+    with _lock:
+        rows = sorted(_stats.items(), key=lambda item: -item[1][2])
+    print("", file=stream)
+    print(f"{'phase':<14} {'appels':>8} {'octets':>12} {'temps (ms)':>11}", file=stream)
+    for name, (count, nbytes, seconds) in rows:
+        print(f"{name:<14} {count:>8} {nbytes:>12} {seconds * 1000:>11.2f}", file=stream)
+    if total is not None:
+        print(f"{'total':<14} {'':>8} {'':>12} {total * 1000:>11.2f}", file=stream)
+
+
+def write_chrome_trace(path, command=None, start=None, end=None):
+    """Écrit les événements au format Trace Event (chrome://tracing, Perfetto)."""
+    events = list(_events or [])
+    if command is not None and start is not None and end is not None:
+        events.insert(0, {"name": command, "ph": "X", "pid": os.getpid(),
+                          "tid": threading.get_ident() % 100000,
+                          "ts": round((start - _origin) * 1e6, 3),
+                          "dur": round((end - start) * 1e6, 3), "args": {}})
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
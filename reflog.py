@@ -0,0 +1,230 @@
+"""Journal des valeurs successives de chaque référence (reflog).
+
+Chaque mise à jour d'une branche, d'un .remote ou de HEAD (commit, push,
+checkout) ajoute un enregistrement à .mygit/logs/<référence> ; la mise à jour
+de la branche courante est aussi journalisée dans logs/HEAD.
+
+Format : "MYRL" | version, puis des enregistrements de taille fixe :
+ancien SHA (20 octets, zéros si aucun), nouveau SHA, timestamp (8 octets),
+message UTF-8 complété par des zéros (MESSAGE_SIZE octets, tronqué au-delà).
+L'entrée n (0 = la plus récente) est à une position calculable depuis la fin :
+`<ref>@{n}` ne lit qu'un enregistrement, `log -g -n 10` que les dix derniers.
+
+Le fichier ne fait que grandir (un seul write en mode ajout, sous le verrou
+de la référence) ; gc le réécrit sans les entrées de plus de EXPIRE_DAYS
+jours et en garde au plus MAX_ENTRIES.
+"""
+import os
+import time
+import struct
+
+import lockfile
+import repository
+
+MAGIC = b"MYRL"
+VERSION = 1
+HEADER = struct.Struct(">4sI")
+MESSAGE_SIZE = 80
+RECORD = struct.Struct(f">20s20sq{MESSAGE_SIZE}s")
+ZERO = b"\0" * 20
+EXPIRE_DAYS = 90
+MAX_ENTRIES = 10000
+READ_BATCH = 64
+
+
+def log_path(name, git_dir=repository.GIT_DIR_NAME):
+    return os.path.join(git_dir, "logs", *name.split("/"))
+
+
+def ref_name(name, git_dir=repository.GIT_DIR_NAME):
+    """Nom complet d'une référence : HEAD, refs/... ou une branche ou un tag."""
+    if name == "HEAD" or name.startswith("refs/"):
+        return name
+    for candidate in (f"refs/heads/{name}", f"refs/tags/{name}"):
+        if os.path.exists(os.path.join(git_dir, *candidate.split("/"))):
+            return candidate
+    return f"refs/heads/{name}"
+
+
+def _split_ref_path(path):
+    """(git_dir, nom) d'un fichier de référence, ou (None, None)."""
+    path = os.path.abspath(path)
+    if os.path.basename(path) == "HEAD":
+        return os.path.dirname(path), "HEAD"
+    parts = path.split(os.sep)
+    if "refs" not in parts:
+        return None, None
+    i = len(parts) - 1 - parts[::-1].index("refs")
+    return os.sep.join(parts[:i]), "/".join(parts[i:])
+
+
+def _read_value(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def _target(value, git_dir):
+    """SHA désigné par une valeur de référence (HEAD symbolique compris)."""
+    value = (value or "").strip()
+    if value.startswith("ref: "):
+        value = _read_value(os.path.join(git_dir, *value[5:].split("/")))
+    return value if repository.is_sha(value) else None
+
+
+def append(name, old, new, message, git_dir=repository.GIT_DIR_NAME, now=None):
+    """Ajoute une entrée au journal de la référence `name`."""
+    data = message.replace("\n", " ").encode("utf-8")[:MESSAGE_SIZE]
+    record = RECORD.pack(bytes.fromhex(old) if old else ZERO, bytes.fromhex(new),
+                         int(time.time() if now is None else now), data)
+    path = log_path(name, git_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        size = os.fstat(fd).st_size
+        if size < HEADER.size:
+            os.ftruncate(fd, 0)
+            record = HEADER.pack(MAGIC, VERSION) + record
+        elif (size - HEADER.size) % RECORD.size:
+            # Enregistrement tronqué par une interruption : on le retire
+            os.ftruncate(fd, size - (size - HEADER.size) % RECORD.size)
+        os.write(fd, record)
+    finally:
+        os.close(fd)
+
+
+def record(ref_path, old_value, new_value, message):
+    """Journalise la mise à jour d'un fichier de référence (voir lockfile.RefTransaction)."""
+    git_dir, name = _split_ref_path(ref_path)
+    if name is None:
+        return
+    old = _target(old_value, git_dir)
+    new = _target(new_value, git_dir)
+    if new is None:
+        return  # branche créée vide : rien à journaliser
+    append(name, old, new, message, git_dir)
+    if name != "HEAD" and _read_value(os.path.join(git_dir, "HEAD")) == f"ref: {name}":
+        append("HEAD", old, new, message, git_dir)
+
+
+def _decode(data):
+    old, new, timestamp, message = RECORD.unpack(data)
+    return {
+        "old": old.hex() if old != ZERO else None,
+        "new": new.hex(),
+        "timestamp": timestamp,
+        "message": message.rstrip(b"\0").decode("utf-8", errors="ignore"),
+    }
+
+
+def _open(name, git_dir):
+    """(fichier, nombre d'entrées complètes), ou (None, 0) sans journal."""
+    try:
+        f = open(log_path(name, git_dir), "rb")
+    except FileNotFoundError:
+        return None, 0
+    size = os.fstat(f.fileno()).st_size
+    if size < HEADER.size or HEADER.unpack(f.read(HEADER.size)) != (MAGIC, VERSION):
+        f.close()
+        return None, 0
+    return f, (size - HEADER.size) // RECORD.size
+
+
+def count(name, git_dir=repository.GIT_DIR_NAME):
+    f, n = _open(name, git_dir)
+    if f is not None:
+        f.close()
+    return n
+
+
+def entry(name, n, git_dir=repository.GIT_DIR_NAME):
+    """Entrée `name@{n}` (0 = la plus récente), ou None ; une seule lecture."""
+    f, total = _open(name, git_dir)
+    if f is None:
+        return None
+    with f:
+        if not 0 <= n < total:
+            return None
+        f.seek(HEADER.size + (total - 1 - n) * RECORD.size)
+        return _decode(f.read(RECORD.size))
+
+
+def entries(name, git_dir=repository.GIT_DIR_NAME):
+    """Entrées de la plus récente à la plus ancienne, lues depuis la fin par
+    paquets de READ_BATCH : s'arrêter tôt ne lit pas le reste du fichier."""
+    f, total = _open(name, git_dir)
+    if f is None:
+        return
+    with f:
+        end = total
+        while end > 0:
+            start = max(0, end - READ_BATCH)
+            f.seek(HEADER.size + start * RECORD.size)
+            data = f.read((end - start) * RECORD.size)
+            for i in range(end - start - 1, -1, -1):
+                yield _decode(data[i * RECORD.size:(i + 1) * RECORD.size])
+            end = start
+
+
+def names(git_dir=repository.GIT_DIR_NAME):
+    """Références qui ont un journal."""
+    logs_dir = os.path.join(git_dir, "logs")
+    found = []
+    for root, _, files in os.walk(logs_dir):
+        for file_name in files:
+            if file_name.endswith(lockfile.LOCK_SUFFIX):
+                continue
+            found.append(os.path.relpath(os.path.join(root, file_name), logs_dir).replace(os.sep, "/"))
+    return sorted(found)
+
+
+def referenced_oids(git_dir=repository.GIT_DIR_NAME):
+    """Commits cités par les journaux : gc les garde accessibles."""
+    oids = set()
+    for name in names(git_dir):
+        for item in entries(name, git_dir):
+            oids.add(item["new"])
+            if item["old"]:
+                oids.add(item["old"])
+    return oids
+
+
+def expire(git_dir=repository.GIT_DIR_NAME, days=EXPIRE_DAYS, max_entries=MAX_ENTRIES, now=None):
+    """Retire les entrées de plus de `days` jours et au-delà des `max_entries`
+    plus récentes ; retourne le nombre d'entrées supprimées.
+
+    Le journal est réécrit sous le verrou de sa référence (et, pour HEAD, de
+    la branche courante) : aucune entrée ajoutée pendant ce temps n'est perdue.
+    """
+    cutoff = (time.time() if now is None else now) - days * 86400
+    removed = 0
+    for name in names(git_dir):
+        locked = [name]
+        if name == "HEAD":
+            head = _read_value(os.path.join(git_dir, "HEAD"))
+            if head.startswith("ref: "):
+                locked.append(head[5:])
+        locks = []
+        try:
+            for ref in sorted(locked):
+                locks.append(lockfile.LockFile(os.path.join(git_dir, *ref.split("/"))))
+            kept = []
+            for item in entries(name, git_dir):
+                if len(kept) >= max_entries or item["timestamp"] < cutoff:
+                    break
+                kept.append(item)
+            total = count(name, git_dir)
+            if len(kept) == total:
+                continue
+            removed += total - len(kept)
+            records = [RECORD.pack(bytes.fromhex(item["old"]) if item["old"] else ZERO,
+                                   bytes.fromhex(item["new"]), item["timestamp"],
+                                   item["message"].encode("utf-8")[:MESSAGE_SIZE])
+                       for item in reversed(kept)]
+            lockfile.write_file(log_path(name, git_dir), HEADER.pack(MAGIC, VERSION) + b"".join(records))
+        finally:
+            for lock in locks:
+                lock.rollback()
+    return removed
@@ -0,0 +1,226 @@
+"""Détection des renommages et des copies par similarité de contenu.
+
+Un fichier supprimé et un fichier ajouté forment un renommage quand leurs
+contenus se ressemblent assez (DEFAULT_THRESHOLD, comme git -M50%). Comparer
+toutes les paires serait quadratique ; on procède en trois temps :
+
+1. Même SHA de blob : renommage exact, sans rien lire (appariement un à un,
+   de même nom de fichier de préférence).
+2. Esquisse de chaque contenu : ses lignes sont hachées (crc32 et adler32, soit
+   64 bits), puis réduites à SKETCH_SIZE minima par hachage à une permutation
+   (chaque ligne tombe dans une case, on garde le plus petit haché de chaque
+   case). Deux contenus partagent une case avec une probabilité égale à leur
+   indice de Jaccard. Les cases sont groupées en BANDS bandes de deux cases :
+   deux fichiers qui ont une bande identique deviennent candidats (LSH). Au
+   seuil de 50 % (Jaccard 1/3), une paire l'est avec une probabilité de
+   1 - (1 - 1/9)^32, soit 98 % ; avec des bandes plus larges, une bonne partie
+   des renommages à 60 % passaient inaperçus.
+3. Les candidats sont confirmés par la similarité exacte des lignes
+   (2 x lignes communes / lignes des deux fichiers), écartée d'avance quand
+   l'écart de taille la rend impossible ou que trop peu de cases des deux
+   esquisses sont égales (min_matching_bins).
+
+Pour les fichiers découpés (chunking), le blob est la liste des morceaux :
+la similarité porte sur les morceaux partagés, sans réassembler le contenu.
+"""
+import os
+import zlib
+from collections import Counter
+
+import repository
+
+DEFAULT_THRESHOLD = 0.5
+SKETCH_SIZE = 64
+BANDS = 32
+ROWS = SKETCH_SIZE // BANDS
+MAX_SIZE = 4 * 1024 * 1024
+MAX_CANDIDATES = 50
+MASK = (1 << 64) - 1
+BIN_SHIFT = 64 - (SKETCH_SIZE.bit_length() - 1)
+
+
+def line_features(content):
+    """Lignes (sans les blancs de fin) hachées sur 64 bits, avec leur nombre."""
+    features = Counter()
+    for line in content.split(b"\n"):
+        line = line.rstrip()
+        if line:
+            features[(zlib.crc32(line) << 32) | zlib.adler32(line)] += 1
+    return features
+
+
+def sketch(features):
+    """SKETCH_SIZE minima (hachage à une permutation), ou None sans contenu."""
+    if not features:
+        return None
+    bins = [None] * SKETCH_SIZE
+    for feature in features:
+        h = (feature * 0x9E3779B97F4A7C15) & MASK
+        index = h >> BIN_SHIFT
+        if bins[index] is None or h < bins[index]:
+            bins[index] = h
+    # Cases vides : elles empruntent la case pleine suivante (densification)
+    filled = [i for i, value in enumerate(bins) if value is not None]
+    for i, value in enumerate(bins):
+        if value is None:
+            donor = next((j for j in filled if j > i), filled[0])
+            bins[i] = (bins[donor] + (donor - i) * 0x9E3779B97F4A7C15) & MASK
+    return bins
+
+
+def min_matching_bins(threshold):
+    """Cases égales en dessous desquelles deux esquisses ne peuvent pas
+    atteindre `threshold` : l'indice de Jaccard au seuil, moins quatre
+    écarts-types de son estimation sur SKETCH_SIZE cases."""
+    jaccard = threshold / (2 - threshold)
+    deviation = (jaccard * (1 - jaccard) / SKETCH_SIZE) ** 0.5
+    return max(0, int((jaccard - 4 * deviation) * SKETCH_SIZE))
+
+
+def similarity(a, b):
+    """Similarité de deux Counter de lignes : 2 x communes / total."""
+    total = sum(a.values()) + sum(b.values())
+    if not total:
+        return 1.0
+    return 2 * sum((a & b).values()) / total
+
+
+def read_blob(path, oid, git_dir=repository.GIT_DIR_NAME):
+    """Contenu d'un blob du dépôt, ou None s'il est illisible."""
+    try:
+        obj_type, content = repository.read_object(oid, git_dir)
+    except (FileNotFoundError, ValueError):
+        return None
+    return content if obj_type == "blob" else None
+
+
+class _Side:
+    """Esquisses et lignes des fichiers d'un côté (supprimés ou ajoutés)."""
+
+    def __init__(self, files, read, git_dir):
+        self.features = {}
+        self.sketches = {}
+        for path, oid in files.items():
+            content = read(path, oid, git_dir)
+            if content is None or len(content) > MAX_SIZE:
+                continue
+            features = line_features(content)
+            bins = sketch(features)
+            if bins is not None:
+                self.features[path] = features
+                self.sketches[path] = bins
+
+    def bands(self, path):
+        bins = self.sketches[path]
+        return [(band, tuple(bins[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+def find_renames(deleted, added, git_dir=repository.GIT_DIR_NAME, threshold=DEFAULT_THRESHOLD,
+                 copies=False, sources=None, read=None):
+    """Associe des fichiers ajoutés à des fichiers supprimés. Avec `copies`,
+    un fichier supprimé peut servir plusieurs fois, et les fichiers de
+    `sources` (restés en place) peuvent aussi avoir été copiés.
+
+    `deleted`, `added` et `sources` sont des {chemin: sha de blob} ; `read(chemin,
+    sha, git_dir)` retourne le contenu (par défaut : le blob du dépôt).
+    Retourne [(statut "R" ou "C", ancien chemin, nouveau chemin, score en %)].
+    """
+    read = read or read_blob
+    sources = (sources or {}) if copies else {}
+    origins = dict(sources)
+    origins.update(deleted)
+    renamed = set()
+    results = []
+
+    def same_name(old, new):
+        return os.path.basename(old) == os.path.basename(new)
+
+    # 1. Contenus identiques : appariés un à un, de même nom de préférence
+    by_oid = {}
+    for path, oid in origins.items():
+        by_oid.setdefault(oid, []).append(path)
+    inexact = {}
+    for path, oid in sorted(added.items()):
+        olds = by_oid.get(oid)
+        if not olds:
+            inexact[path] = oid
+            continue
+        free = [old for old in olds if old in deleted and old not in renamed]
+        if free:
+            old = next((old for old in free if same_name(old, path)), free[0])
+            renamed.add(old)
+            results.append(("R", old, path, 100))
+        elif copies:
+            old = next((old for old in olds if same_name(old, path)), olds[0])
+            results.append(("C", old, path, 100))
+        else:
+            inexact[path] = oid
+
+    # 2. Candidats par bandes d'esquisses, 3. confirmation
+    pairs = []
+    candidates_side = {path: oid for path, oid in origins.items() if copies or path not in renamed}
+    if inexact and candidates_side and threshold < 1:
+        old_side = _Side(candidates_side, read, git_dir)
+        new_side = _Side(inexact, read, git_dir)
+        min_bins = min_matching_bins(threshold)
+        buckets = {}
+        for path in old_side.sketches:
+            for key in old_side.bands(path):
+                buckets.setdefault(key, []).append(path)
+        for path in new_side.sketches:
+            candidates = Counter()
+            for key in new_side.bands(path):
+                candidates.update(buckets.get(key, ()))
+            new_features = new_side.features[path]
+            new_total = sum(new_features.values())
+            new_bins = new_side.sketches[path]
+            for old, _ in candidates.most_common(MAX_CANDIDATES):
+                old_features = old_side.features[old]
+                old_total = sum(old_features.values())
+                # Borne : même si toutes les lignes du plus petit étaient communes
+                if 2 * min(old_total, new_total) / (old_total + new_total) < threshold:
+                    continue
+                # Esquisses trop éloignées pour le seuil : pas de comparaison exacte
+                if sum(a == b for a, b in zip(old_side.sketches[old], new_bins)) < min_bins:
+                    continue
+                score = similarity(old_features, new_features)
+                if score >= threshold:
+                    pairs.append((score, old, path))
+
+    # Les meilleurs scores d'abord (à score égal, un fichier supprimé de même
+    # nom) ; un fichier supprimé n'est renommé qu'une fois, ses autres
+    # correspondances sont des copies
+    pairs.sort(key=lambda pair: (-pair[0], pair[1] not in deleted, not same_name(pair[1], pair[2]),
+                                 pair[2], pair[1]))
+    matched = set()
+    for score, old, new in pairs:
+        if new in matched:
+            continue
+        if old in deleted and old not in renamed:
+            renamed.add(old)
+            status = "R"
+        elif copies:
+            status = "C"
+        else:
+            continue
+        matched.add(new)
+        results.append((status, old, new, int(score * 100)))
+    results.sort(key=lambda result: result[2])
+    return results
+
+
+def apply_renames(changes, renames):
+    """Remplace, dans une liste [(statut, chemin)] de A / M / D, les paires
+    détectées par des entrées ("R" ou "C", "ancien -> nouveau")."""
+    paired = {new: (status, old) for status, old, new, _ in renames}
+    moved = {old for status, old, _, _ in renames if status == "R"}
+    result = []
+    for status, path in changes:
+        if status == "A" and path in paired:
+            kind, old = paired[path]
+            result.append((kind, f"{old} -> {path}"))
+        elif status == "D" and path in moved:
+            continue
+        else:
+            result.append((status, path))
+    return result
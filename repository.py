@@ -0,0 +1,910 @@
+"""API Python du dépôt .mygit, utilisable sans passer par main.py.
+
+    from repository import Repository
+    repo = Repository("chemin/du/projet")
+    repo.add(["README.md"])
+    sha = repo.commit("Premier commit")
+    for commit in repo.log(max_count=10):
+        print(commit["oid"], commit["message"])
+
+Contrairement aux commandes, les méthodes ne font ni print ni sys.exit : elles
+retournent des résultats structurés et lèvent des exceptions (RuntimeError,
+FileNotFoundError, ValueError). Une instance garde ses caches (objets, trees,
+index) d'un appel à l'autre.
+"""
+import os
+import zlib
+import atexit
+import fnmatch
+import getpass
+import hashlib
+import tempfile
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import chunking
+import largefiles
+import lockfile
+import packfile
+from profiling import phase
+
+GIT_DIR_NAME = ".mygit"
+OBJECT_CACHE_SIZE = 4096
+IGNORED_DIRS = {".mygit", ".git", "__pycache__"}
+
+
+def find_repository(start_path: Path = None) -> Path:
+    """Trouve la racine du dépôt .mygit en remontant l'arborescence."""
+    current = Path(start_path or Path.cwd()).resolve()
+    while True:
+        if (current / GIT_DIR_NAME).is_dir():
+            return current
+        if current == current.parent:
+            raise RuntimeError("Not in a mygit repository")
+        current = current.parent
+
+
+def is_sha(value: str) -> bool:
+    return len(value) == 40 and all(c in "0123456789abcdef" for c in value)
+
+
+# --- Accès disque partagé ----------------------------------------------------
+# Les commandes (commit, my_git_add, write_tree, checkout...) et la classe
+# Repository passent toutes par ces fonctions : c'est là que sont posés les
+# points de mesure de --profile.
+
+def object_path(oid: str, git_dir=GIT_DIR_NAME) -> str:
+    return os.path.join(git_dir, "objects", oid[:2], oid[2:])
+
+
+def object_exists(oid: str, git_dir=GIT_DIR_NAME) -> bool:
+    path = object_path(oid, git_dir)
+    if path in _unsynced:
+        return True
+    with phase("stat"):
+        return os.path.exists(path) or packfile.has_packed(oid, git_dir)
+
+
+def read_file(path) -> bytes:
+    """Lit un fichier de la copie de travail."""
+    with phase("read") as p:
+        with open(path, "rb") as f:
+            data = f.read()
+        p.add(len(data))
+    return data
+
+
+# Synchronisation des objets sur disque, choisie par MYGIT_FSYNC :
+#   off    (défaut) pas de fsync ; l'écriture reste atomique (fichier
+#          temporaire puis renommage), mais une coupure de courant peut perdre
+#          les derniers objets ;
+#   object un fsync par objet avant son renommage ;
+#   batch  les objets restent dans leur fichier temporaire (lisibles quand
+#          même) jusqu'à sync_objects : un fsync par fichier temporaire, puis
+#          tous les renommages et un fsync par dossier touché, sans attendre
+#          le disque entre deux écritures. sync_objects est appelée avant
+#          toute mise à jour de référence et à la fin de main.py.
+FSYNC_MODES = ("off", "object", "batch")
+OBJECT_TMP_PREFIX = "tmp_obj_"
+_unsynced = {}  # chemin final -> fichier temporaire (mode batch)
+
+
+def fsync_mode() -> str:
+    mode = os.environ.get("MYGIT_FSYNC", "off").lower()
+    return mode if mode in FSYNC_MODES else "off"
+
+
+def _fsync_dir(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Windows : un dossier ne s'ouvre pas
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_object(oid: str, full_data: bytes, git_dir=GIT_DIR_NAME) -> bool:
+    """Compresse et écrit un objet (en-tête compris) s'il n'existe pas déjà.
+
+    L'objet est écrit dans un fichier temporaire de son dossier puis renommé :
+    un écrivain concurrent ou une interruption ne laisse jamais d'objet tronqué.
+    """
+    path = object_path(oid, git_dir)
+    if object_exists(oid, git_dir):
+        return False
+    mode = fsync_mode()
+    with phase("compress", len(full_data)):
+        compressed = zlib.compress(full_data)
+    with phase("object_write", len(compressed)):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=OBJECT_TMP_PREFIX, dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(compressed)
+                if mode == "object":
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o644)  # mkstemp crée le fichier en 0600
+            if mode == "batch":
+                if not _unsynced:
+                    atexit.register(sync_objects)
+                _unsynced[path] = tmp_path
+                return True
+            # Un autre écrivain a pu renommer le même objet entre-temps : même contenu
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        if mode == "object":
+            _fsync_dir(directory)
+    return True
+
+
+def sync_objects() -> int:
+    """Mode batch : synchronise les fichiers temporaires des objets en
+    attente, les renomme à leur place puis synchronise leurs dossiers ;
+    retourne leur nombre."""
+    if not _unsynced:
+        return 0
+    count = len(_unsynced)
+    with phase("fsync", count):
+        # Seulement nos fichiers : os.sync() attendrait tout le système
+        for tmp_path in _unsynced.values():
+            with open(tmp_path, "rb+") as f:
+                os.fsync(f.fileno())
+        directories = set()
+        for path, tmp_path in list(_unsynced.items()):
+            os.replace(tmp_path, path)
+            directories.add(os.path.dirname(path))
+            del _unsynced[path]
+        for directory in directories:
+            _fsync_dir(directory)
+    atexit.unregister(sync_objects)
+    return count
+
+
+def hash_object(data: bytes, type_: str = "blob", write: bool = True, git_dir=GIT_DIR_NAME) -> str:
+    """Calcule le SHA-1 d'un objet et l'écrit dans le dépôt si write=True."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    full_data = f"{type_} {len(data)}\0".encode() + data
+    with phase("hash", len(full_data)):
+        oid = hashlib.sha1(full_data).hexdigest()
+    if write:
+        write_object(oid, full_data, git_dir)
+    return oid
+
+
+def file_blob(path, write: bool = True, git_dir=GIT_DIR_NAME) -> str:
+    """SHA du blob d'un fichier de la copie de travail.
+
+    Les gros fichiers (voir largefiles) sont copiés dans le magasin à part et
+    seul leur pointeur devient un blob ; les fichiers découpés (voir chunking)
+    deviennent une liste de morceaux. Tant que leur stat ne change pas, ni
+    les uns ni les autres ne sont relus.
+    """
+    worktree = os.path.dirname(os.path.abspath(git_dir))
+    rel_path = os.path.relpath(os.path.abspath(path), worktree).replace("\\", "/")
+    with phase("stat"):
+        st = os.stat(path)
+    large = largefiles.is_large(rel_path, st.st_size, largefiles.read_patterns(worktree))
+    chunked = not large and chunking.is_chunked(
+        rel_path, st.st_size, largefiles.read_patterns(worktree, chunking.PATTERNS_FILE))
+    if not large and not chunked:
+        return hash_object(read_file(path), "blob", write, git_dir)
+    cached = largefiles.cached_blob(rel_path, st, git_dir)
+    if cached and (not write or (object_exists(cached[0], git_dir) and
+                                 (cached[1] is None or
+                                  os.path.exists(largefiles.store_path(cached[1], git_dir))))):
+        return cached[0]
+    with phase("read", st.st_size):
+        if chunked:
+            oid = None
+            with open(path, "rb") as f:
+                chunks = [(hash_object(chunk, "chunk", write, git_dir), len(chunk))
+                          for chunk in chunking.split(f)]
+            pointer = chunking.make_pointer(st.st_size, chunks)
+        else:
+            if write:
+                oid, size = largefiles.store(path, git_dir)
+            else:
+                oid, size = largefiles.hash_file(path)
+            pointer = largefiles.make_pointer(oid, size)
+    blob = hash_object(pointer, "blob", write, git_dir)
+    largefiles.remember(rel_path, st, blob, oid, git_dir)
+    return blob
+
+
+def iter_blob_content(data: bytes, git_dir=GIT_DIR_NAME) -> Iterator[bytes]:
+    """Contenu réel d'un blob, morceau par morceau : les listes de morceaux et
+    les pointeurs vers le magasin des gros fichiers sont suivis sans jamais
+    tout charger en mémoire."""
+    chunk_list = chunking.parse_pointer(data)
+    if chunk_list is not None:
+        for sha, _ in chunk_list[1]:
+            obj_type, content = read_object(sha, git_dir)
+            if obj_type != "chunk":
+                raise ValueError(f"Object {sha} is not a chunk")
+            yield content
+        return
+    pointer = largefiles.parse_pointer(data)
+    if pointer is not None:
+        path = largefiles.store_path(pointer[0], git_dir)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Large file {pointer[0]} is missing")
+        with open(path, "rb") as f:
+            yield from iter(lambda: f.read(largefiles.CHUNK_SIZE), b"")
+        return
+    yield data
+
+
+def write_worktree_file(path, blob_oid: str, data: bytes, git_dir=GIT_DIR_NAME):
+    """Écrit un blob dans la copie de travail ; un pointeur est remplacé par
+    le gros fichier qu'il désigne, une liste par ses morceaux."""
+    pointer = largefiles.parse_pointer(data)
+    chunk_list = chunking.parse_pointer(data) if pointer is None else None
+    if os.path.isfile(path) and os.stat(path).st_nlink > 1:
+        # Lien physique vers le magasin : on ne réécrit jamais à travers
+        os.unlink(path)
+    if pointer is None and chunk_list is None:
+        with phase("worktree_write", len(data)):
+            with open(path, "wb") as f:
+                f.write(data)
+        return
+    if pointer is not None:
+        oid, size = pointer
+        with phase("worktree_write", size):
+            largefiles.materialize(oid, path, git_dir)
+    else:
+        oid = None
+        with phase("worktree_write", chunk_list[0]):
+            with open(path, "wb") as f:
+                for content in iter_blob_content(data, git_dir):
+                    f.write(content)
+    worktree = os.path.dirname(os.path.abspath(git_dir))
+    rel_path = os.path.relpath(os.path.abspath(path), worktree).replace("\\", "/")
+    largefiles.remember(rel_path, os.stat(path), blob_oid, oid, git_dir)
+
+
+def read_raw_object(oid: str, git_dir=GIT_DIR_NAME) -> bytes:
+    """Octets compressés d'un objet, isolé ou dans un pack ; lève FileNotFoundError."""
+    path = object_path(oid, git_dir)
+    try:
+        with phase("read") as p:
+            with open(_unsynced.get(path, path), "rb") as f:
+                compressed = f.read()
+            p.add(len(compressed))
+        return compressed
+    except FileNotFoundError:
+        pass
+    with phase("read") as p:
+        compressed = packfile.read_packed(oid, git_dir)
+        if compressed is None:
+            raise FileNotFoundError(f"Object {oid} not found")
+        p.add(len(compressed))
+    return compressed
+
+
+def peek_object(oid: str, git_dir=GIT_DIR_NAME, size: int = 256) -> Tuple[str, bytes]:
+    """(type, début du contenu) en ne décompressant que le début de l'objet."""
+    compressed = read_raw_object(oid, git_dir)
+    try:
+        head = zlib.decompressobj().decompress(compressed, size + 32)
+    except zlib.error:
+        raise ValueError(f"Object {oid} is corrupted")
+    null_pos = head.find(b"\0")
+    if null_pos == -1:
+        raise ValueError(f"Object {oid} has invalid format")
+    return head[:null_pos].split(b" ", 1)[0].decode(), head[null_pos + 1:null_pos + 1 + size]
+
+
+def object_header(oid: str, git_dir=GIT_DIR_NAME) -> Tuple[str, int]:
+    """(type, taille) d'un objet en ne décompressant que son en-tête ; lève
+    FileNotFoundError ou ValueError."""
+    compressed = read_raw_object(oid, git_dir)
+    try:
+        head = zlib.decompressobj().decompress(compressed, 64)
+    except zlib.error:
+        raise ValueError(f"Object {oid} is corrupted")
+    null_pos = head.find(b"\0")
+    if null_pos == -1:
+        raise ValueError(f"Object {oid} has invalid format")
+    try:
+        obj_type, size = head[:null_pos].decode().split(" ", 1)
+        return obj_type, int(size)
+    except ValueError:
+        raise ValueError(f"Object {oid} has invalid header")
+
+
+def read_object(oid: str, git_dir=GIT_DIR_NAME) -> Tuple[str, bytes]:
+    """Retourne (type, contenu) ; lève FileNotFoundError ou ValueError."""
+    return decode_object(oid, read_raw_object(oid, git_dir))
+
+
+def decode_object(oid: str, compressed: bytes) -> Tuple[str, bytes]:
+    """(type, contenu) des octets compressés d'un objet ; lève ValueError."""
+    try:
+        with phase("decompress") as p:
+            serialized = zlib.decompress(compressed)
+            p.add(len(serialized))
+    except zlib.error:
+        raise ValueError(f"Object {oid} is corrupted")
+    null_pos = serialized.find(b"\0")
+    if null_pos == -1:
+        raise ValueError(f"Object {oid} has invalid format")
+    try:
+        obj_type, size = serialized[:null_pos].decode().split(" ", 1)
+        size = int(size)
+    except ValueError:
+        raise ValueError(f"Object {oid} has invalid header")
+    content = serialized[null_pos + 1:]
+    if len(content) != size:
+        raise ValueError(f"Object {oid} size mismatch")
+    return obj_type, content
+
+
+def read_index(git_dir=GIT_DIR_NAME) -> List[str]:
+    """Chemins listés dans l'index (un par ligne)."""
+    index_file = os.path.join(git_dir, "index")
+    if not os.path.exists(index_file):
+        return []
+    with phase("read") as p:
+        with open(index_file, "r") as f:
+            paths = [line.strip() for line in f if line.strip()]
+        p.add(sum(len(path) + 1 for path in paths))
+    return paths
+
+
+def write_index(paths: List[str], git_dir=GIT_DIR_NAME):
+    """Remplace l'index de façon atomique (voir lockfile)."""
+    data = "".join(path + "\n" for path in paths)
+    with phase("index_write", len(data)):
+        lockfile.write_file(os.path.join(git_dir, "index"), data)
+
+
+def write_ref(ref_path, value: str, old=lockfile.ANY, message: str = None):
+    """Écrit une référence (branche, .remote, HEAD) à partir de son chemin.
+
+    Avec `old`, l'écriture n'a lieu que si la référence a encore cette valeur
+    (None : absente ou vide) ; sinon lockfile.RefConflict est levée. Avec
+    `message`, la mise à jour est ajoutée au reflog.
+    """
+    import reflog
+
+    sync_objects()  # une référence ne doit jamais désigner un objet pas encore sur disque
+    with lockfile.RefTransaction(reflog=reflog.record) as transaction:
+        transaction.update(ref_path, value, old, message)
+
+
+def parse_tree(content: bytes) -> List[Tuple[str, str, str]]:
+    """Retourne [(type, sha, nom)] pour un tree.
+
+    Deux formats coexistent : le format texte de commit ("blob <sha> <nom>"
+    par ligne) et le format binaire de Git écrit par write_tree
+    ("<mode> <nom>\\0<sha brut>").
+    """
+    if not content:
+        return []
+    entries = []
+    if content.startswith(b"blob ") or content.startswith(b"tree "):
+        for line in content.decode("utf-8", errors="replace").splitlines():
+            if line.startswith("blob ") or line.startswith("tree "):
+                type_, sha, name = line.split(" ", 2)
+                entries.append((type_, sha, name))
+        return entries
+    pos = 0
+    while pos < len(content):
+        space = content.index(b" ", pos)
+        null = content.index(b"\0", space)
+        mode = content[pos:space].decode("ascii")
+        name = content[space + 1:null].decode("utf-8", errors="replace")
+        sha = content[null + 1:null + 21].hex()
+        entries.append(("tree" if mode in ("40000", "040000") else "blob", sha, name))
+        pos = null + 21
+    return entries
+
+
+def parse_commit(content: bytes) -> dict:
+    """Parse le contenu d'un commit (dates "AAAA-MM-JJ HH:MM:SS" ou timestamp)."""
+    text = content.decode("utf-8", errors="replace")
+    lines = text.split("\n")
+    commit = {
+        "tree_oid": None, "parent_oids": [], "author": None, "author_date": None,
+        "committer": None, "committer_date": None, "message": "",
+    }
+    for i, line in enumerate(lines):
+        if line == "":
+            commit["message"] = "\n".join(lines[i + 1:])
+            break
+        if line.startswith("tree "):
+            commit["tree_oid"] = line[5:].strip()
+        elif line.startswith("parent "):
+            commit["parent_oids"].append(line[7:].strip())
+        elif line.startswith("author ") or line.startswith("committer "):
+            field, value = line.split(" ", 1)
+            name, date = parse_signature(value)
+            commit[field] = name
+            commit[f"{field}_date"] = date
+    return commit
+
+
+def parse_signature(value: str) -> Tuple[str, Optional[datetime]]:
+    """Sépare "<nom> <date>" ; accepte "AAAA-MM-JJ HH:MM:SS" et "<timestamp> <tz>"."""
+    parts = value.rsplit(" ", 2)
+    if len(parts) == 3:
+        try:
+            return parts[0], datetime.strptime(f"{parts[1]} {parts[2]}", "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+        try:
+            return parts[0], datetime.fromtimestamp(int(parts[1]))
+        except (ValueError, OSError):
+            pass
+    return value, None
+
+
+def loose_object_ids(git_dir=GIT_DIR_NAME) -> Iterator[str]:
+    """SHA de tous les objets isolés de .mygit/objects."""
+    objects_dir = os.path.join(git_dir, "objects")
+    if not os.path.isdir(objects_dir):
+        return
+    for prefix in sorted(os.listdir(objects_dir)):
+        subdir = os.path.join(objects_dir, prefix)
+        if len(prefix) != 2 or not os.path.isdir(subdir):
+            continue
+        for name in sorted(os.listdir(subdir)):
+            if is_sha(prefix + name):
+                yield prefix + name
+
+
+def packed_object_ids(git_dir=GIT_DIR_NAME) -> Iterator[str]:
+    """SHA des objets rangés dans les packs."""
+    for pack in packfile.packs(git_dir):
+        yield from pack.oids()
+
+
+def all_object_ids(git_dir=GIT_DIR_NAME) -> List[str]:
+    """Tous les objets du dépôt, isolés ou empaquetés, sans doublon."""
+    return list(dict.fromkeys(list(loose_object_ids(git_dir)) + list(packed_object_ids(git_dir))))
+
+
+def all_refs(git_dir=GIT_DIR_NAME) -> Dict[str, str]:
+    """{nom: sha} de toutes les références non vides : branches, .remote,
+    tags, et HEAD s'il est détaché."""
+    refs = {}
+    refs_dir = os.path.join(git_dir, "refs")
+    for root, _, files in os.walk(refs_dir):
+        for name in files:
+            if name.endswith(".lock"):
+                continue
+            path = os.path.join(root, name)
+            with open(path) as f:
+                value = f.read().strip()
+            if is_sha(value):
+                refs[os.path.relpath(path, git_dir).replace("\\", "/")] = value
+    head_file = os.path.join(git_dir, "HEAD")
+    if os.path.exists(head_file):
+        with open(head_file) as f:
+            head = f.read().strip()
+        if is_sha(head):
+            refs["HEAD"] = head
+    return refs
+
+
+def object_links(obj_type: str, content: bytes) -> List[Tuple[str, str]]:
+    """[(type attendu, sha)] des objets directement référencés par un objet
+    (tree et parents d'un commit, entrées d'un tree, morceaux d'un blob...)."""
+    if obj_type == "commit":
+        commit = parse_commit(content)
+        links = [("tree", commit["tree_oid"])] if commit["tree_oid"] else []
+        return links + [("commit", parent) for parent in commit["parent_oids"]]
+    if obj_type == "tree":
+        return [(type_, sha) for type_, sha, _ in parse_tree(content)]
+    if obj_type == "tag":
+        target, target_type = None, "commit"
+        for line in content.decode("utf-8", errors="replace").splitlines():
+            if not line:
+                break
+            if line.startswith("object "):
+                target = line[7:].strip()
+            elif line.startswith("type "):
+                target_type = line[5:].strip()
+        return [(target_type, target)] if target else []
+    if obj_type == "blob":
+        chunk_list = chunking.parse_pointer(content)
+        if chunk_list is not None:
+            return [("chunk", sha) for sha, _ in chunk_list[1]]
+    return []
+
+
+class Repository:
+    """Un dépôt .mygit désigné par son chemin (et non par le répertoire courant)."""
+
+    def __init__(self, path: str = ".", discover: bool = False):
+        root = find_repository(Path(path)) if discover else Path(path).resolve()
+        if not (root / GIT_DIR_NAME).is_dir():
+            raise RuntimeError(f"Not a mygit repository: {root}")
+        self.root = root
+        self.git_dir = root / GIT_DIR_NAME
+        self._objects = OrderedDict()
+        self._tree_files = OrderedDict()
+        self._index = None
+
+    @classmethod
+    def init(cls, path: str = ".") -> "Repository":
+        """Crée la structure .mygit (comme my_git_init) et retourne le dépôt."""
+        git_dir = Path(path).resolve() / GIT_DIR_NAME
+        (git_dir / "objects").mkdir(parents=True, exist_ok=True)
+        heads = git_dir / "refs" / "heads"
+        heads.mkdir(parents=True, exist_ok=True)
+        for name in ("main", "main.remote"):
+            if not (heads / name).exists():
+                (heads / name).write_text("")
+        if not (git_dir / "HEAD").exists():
+            (git_dir / "HEAD").write_text("ref: refs/heads/main\n")
+        if not (git_dir / "index").exists():
+            (git_dir / "index").write_text("")
+        return cls(path)
+
+    def clear_caches(self):
+        self._objects.clear()
+        self._tree_files.clear()
+        self._index = None
+
+    # --- Objets -----------------------------------------------------------
+
+    def object_path(self, oid: str) -> Path:
+        return Path(object_path(oid, self.git_dir))
+
+    def has_object(self, oid: str) -> bool:
+        return oid in self._objects or object_exists(oid, self.git_dir)
+
+    def read_object(self, oid: str) -> Tuple[str, bytes]:
+        """Retourne (type, contenu) ; lève FileNotFoundError ou ValueError."""
+        cached = self._objects.get(oid)
+        if cached is not None:
+            self._objects.move_to_end(oid)
+            return cached
+        result = read_object(oid, self.git_dir)
+        self._objects[oid] = result
+        if len(self._objects) > OBJECT_CACHE_SIZE:
+            self._objects.popitem(last=False)
+        return result
+
+    def hash_object(self, data: bytes, type_: str = "blob", write: bool = True) -> str:
+        return hash_object(data, type_, write, self.git_dir)
+
+    def read_commit(self, oid: str) -> dict:
+        obj_type, content = self.read_object(oid)
+        if obj_type != "commit":
+            raise ValueError(f"Object {oid} is not a commit")
+        commit = parse_commit(content)
+        commit["oid"] = oid
+        return commit
+
+    def read_tree(self, oid: str) -> List[Tuple[str, str, str]]:
+        obj_type, content = self.read_object(oid)
+        if obj_type != "tree":
+            raise ValueError(f"Object {oid} is not a tree")
+        return parse_tree(content)
+
+    def tree_files(self, tree_oid: str) -> Dict[str, str]:
+        """Aplatie un tree en {chemin: sha du blob} (mis en cache par tree)."""
+        cached = self._tree_files.get(tree_oid)
+        if cached is not None:
+            return cached
+        files = {}
+        for type_, oid, name in self.read_tree(tree_oid):
+            if type_ == "tree":
+                for path, blob in self.tree_files(oid).items():
+                    files[f"{name}/{path}"] = blob
+            else:
+                files[name] = oid
+        self._tree_files[tree_oid] = files
+        if len(self._tree_files) > OBJECT_CACHE_SIZE:
+            self._tree_files.popitem(last=False)
+        return files
+
+    # --- Références -------------------------------------------------------
+
+    def head(self) -> str:
+        head_file = self.git_dir / "HEAD"
+        return head_file.read_text().strip() if head_file.exists() else "ref: refs/heads/main"
+
+    def current_branch(self) -> Optional[str]:
+        head = self.head()
+        if head.startswith("ref: refs/heads/"):
+            return head[len("ref: refs/heads/"):]
+        return None
+
+    def read_ref(self, ref: str) -> Optional[str]:
+        """Lit refs/... (ou un nom de branche) ; None si absente ou vide."""
+        if not ref.startswith("refs/"):
+            ref = f"refs/heads/{ref}"
+        ref_file = self.git_dir / ref
+        if not ref_file.is_file():
+            return None
+        return ref_file.read_text().strip() or None
+
+    def update_ref(self, ref: str, oid: str, old=lockfile.ANY, message: str = None):
+        """Écrit refs/... (ou une branche) ; `old` et `message` comme pour write_ref."""
+        if not ref.startswith("refs/"):
+            ref = f"refs/heads/{ref}"
+        write_ref(self.git_dir / ref, oid, old, message)
+
+    def branches(self, include_remote: bool = False) -> List[str]:
+        heads = self.git_dir / "refs" / "heads"
+        if not heads.is_dir():
+            return []
+        return sorted(f.name for f in heads.iterdir()
+                      if f.is_file() and not f.name.endswith(lockfile.LOCK_SUFFIX)
+                      and (include_remote or not f.name.endswith(".remote")))
+
+    def resolve_ref(self, ref: str) -> Optional[str]:
+        """Résout HEAD, une branche, refs/..., un tag, un SHA (même court) ou
+        <ref>@{n}, la n-ième valeur précédente d'après le reflog."""
+        if not ref:
+            return None
+        if is_sha(ref):
+            return ref
+        if ref.endswith("}") and "@{" in ref:
+            import reflog
+
+            name, _, n = ref[:-1].rpartition("@{")
+            if not n.isdigit():
+                return None
+            entry = reflog.entry(reflog.ref_name(name or "HEAD", self.git_dir), int(n), self.git_dir)
+            return entry["new"] if entry else None
+        if ref == "HEAD":
+            head = self.head()
+            return self.read_ref(head[5:]) if head.startswith("ref: ") else (head or None)
+        for candidate in (ref, f"refs/heads/{ref}", f"refs/tags/{ref}"):
+            if candidate.startswith("refs/"):
+                oid = self.read_ref(candidate)
+                if oid:
+                    return oid
+        if len(ref) >= 4 and all(c in "0123456789abcdef" for c in ref):
+            obj_dir = self.git_dir / "objects" / ref[:2]
+            matches = set()
+            if obj_dir.is_dir():
+                matches.update(ref[:2] + f.name for f in obj_dir.iterdir() if (ref[:2] + f.name).startswith(ref))
+            matches.update(oid for oid in packed_object_ids(self.git_dir) if oid.startswith(ref))
+            if len(matches) == 1:
+                return matches.pop()
+        return None
+
+    # --- Index ------------------------------------------------------------
+
+    def read_index(self) -> List[str]:
+        """Chemins indexés (relus seulement si le fichier index a changé)."""
+        index_file = self.git_dir / "index"
+        if not index_file.exists():
+            return []
+        st = index_file.stat()
+        key = (st.st_mtime_ns, st.st_size)
+        if self._index is None or self._index[0] != key:
+            self._index = (key, read_index(self.git_dir))
+        return list(self._index[1])
+
+    def write_index(self, paths: List[str]):
+        write_index(paths, self.git_dir)
+        self._index = None
+
+    # --- Opérations -------------------------------------------------------
+
+    def _relative(self, path) -> str:
+        path = Path(path)
+        if not path.is_absolute():
+            path = self.root / path
+        return path.resolve().relative_to(self.root).as_posix()
+
+    def _is_ignored(self, rel_path: str) -> bool:
+        return any(part in IGNORED_DIRS for part in rel_path.split("/")) or \
+            os.path.basename(rel_path).startswith(".")
+
+    def _walk_files(self, start: Path) -> List[str]:
+        found = []
+        with phase("walk") as p:
+            for root, dirs, files in os.walk(start):
+                dirs[:] = [d for d in dirs if d not in IGNORED_DIRS and not d.startswith(".")]
+                for name in files:
+                    rel_path = self._relative(Path(root) / name)
+                    if not self._is_ignored(rel_path):
+                        found.append(rel_path)
+            p.add(len(found))
+        return found
+
+    def add(self, paths: List[str]) -> List[str]:
+        """Écrit les blobs et ajoute les fichiers à l'index ; retourne les chemins ajoutés."""
+        files = []
+        for path in paths:
+            full = Path(path) if Path(path).is_absolute() else self.root / path
+            if full.is_file():
+                files.append(self._relative(full))
+            elif full.is_dir():
+                files.extend(self._walk_files(full))
+            else:
+                raise FileNotFoundError(f"{path} did not match any file")
+        for rel_path in files:
+            file_blob(self.root / rel_path, True, self.git_dir)
+        index = self.read_index()
+        known = set(index)
+        added = [f for f in dict.fromkeys(files) if f not in known]
+        self.write_index(sorted(known | set(files)))
+        return added
+
+    def build_tree(self, paths: List[str]) -> Tuple[str, List[str]]:
+        """Construit les trees (format texte de commit) à partir des fichiers du disque."""
+        def build(file_list, base_path=""):
+            entries = []
+            folders = {}
+            for f in file_list:
+                parts = f.split("/", 1)
+                if len(parts) == 1:
+                    file_path = f"{base_path}/{parts[0]}" if base_path else parts[0]
+                    blob = file_blob(self.root / file_path, True, self.git_dir)
+                    entries.append(f"blob {blob} {parts[0]}")
+                else:
+                    folders.setdefault(parts[0], []).append(parts[1])
+            for folder, subfiles in folders.items():
+                sub_tree, _ = build(subfiles, f"{base_path}/{folder}" if base_path else folder)
+                entries.append(f"tree {sub_tree} {folder}")
+            return self.hash_object("\n".join(entries).encode(), "tree"), entries
+        return build(paths)
+
+    def write_tree(self) -> str:
+        """Écrit le tree de l'index et retourne son SHA."""
+        tree_oid, _ = self.build_tree(self.read_index())
+        return tree_oid
+
+    def commit(self, message: str, author: str = None, record: bool = True) -> str:
+        """Committe l'index sur la branche courante (comme `commit -m`), ou
+        directement sur HEAD quand elle est détachée.
+
+        Avec record=True, le commit est aussi ajouté à commits.txt pour l'interface web.
+        """
+        files = self.read_index()
+        if not files:
+            raise ValueError("Nothing to commit: the index is empty")
+        author = author or getpass.getuser()
+        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        head = self.head()
+        detached = not head.startswith("ref: ")
+        branch = self.current_branch() or "main"
+        parent = (head or None) if detached else self.read_ref(branch)
+        tree_oid, entries = self.build_tree(files)
+        lines = [f"tree {tree_oid}"]
+        if parent:
+            lines.append(f"parent {parent}")
+        lines += [f"author {author} {date}", f"committer {author} {date}", "", message]
+        commit_oid = self.hash_object("\n".join(lines).encode(), "commit")
+        subject = message.split("\n", 1)[0]
+        reflog_message = f"commit{'' if parent else ' (initial)'}: {subject}"
+        if detached:
+            # HEAD détachée : le commit avance HEAD, aucune branche ne bouge
+            write_ref(self.git_dir / "HEAD", commit_oid + "\n", old=parent, message=reflog_message)
+        else:
+            self.update_ref(branch, commit_oid, old=parent, message=reflog_message)
+        if record:
+            with open(self.root / "commits.txt", "a", encoding="utf-8") as f:
+                f.write(f"Commit: {commit_oid}\n")
+                f.write(f"Date: {date}\n")
+                f.write(f"Auteur: {author}\n")
+                f.write(f"Message: {message}\n")
+                f.write(f"Tree: {tree_oid}\n")
+                f.write("Fichiers:\n")
+                for entry in entries:
+                    f.write(f"  - {entry}\n")
+                f.write("\n")
+        return commit_oid
+
+    def log(self, start: str = "HEAD", max_count: int = None) -> Iterator[dict]:
+        """Itère sur les commits depuis `start` en suivant le premier parent."""
+        oid = self.resolve_ref(start)
+        if start and not oid and start != "HEAD":
+            raise ValueError(f"Could not resolve reference '{start}'")
+        seen = set()
+        count = 0
+        while oid and oid not in seen:
+            if max_count is not None and count >= max_count:
+                return
+            seen.add(oid)
+            commit = self.read_commit(oid)
+            yield commit
+            count += 1
+            oid = commit["parent_oids"][0] if commit["parent_oids"] else None
+
+    def status(self) -> Dict[str, List[str]]:
+        """Compare index, dernier commit et copie de travail.
+
+        Retourne les listes triées : staged_new, staged_modified, staged_deleted
+        (fichiers de l'index), staged_renamed ("ancien -> nouveau" : un nouveau
+        fichier de l'index au contenu proche d'un fichier supprimé, voir
+        renames), modified, deleted (suivis par le dernier commit mais hors
+        index) et untracked.
+        """
+        head_oid = self.resolve_ref("HEAD")
+        head_files = self.tree_files(self.read_commit(head_oid)["tree_oid"]) if head_oid else {}
+        index = set(self.read_index())
+        patterns = self._ignore_patterns()
+        result = {key: [] for key in
+                  ("staged_new", "staged_modified", "staged_deleted", "staged_renamed",
+                   "modified", "deleted", "untracked")}
+
+        def blob_oid(rel_path):
+            return file_blob(self.root / rel_path, False, self.git_dir)
+
+        def is_file(rel_path):
+            with phase("stat"):
+                return (self.root / rel_path).is_file()
+
+        for rel_path in sorted(index):
+            if not is_file(rel_path):
+                result["staged_deleted"].append(rel_path)
+            elif rel_path not in head_files:
+                result["staged_new"].append(rel_path)
+            elif blob_oid(rel_path) != head_files[rel_path]:
+                result["staged_modified"].append(rel_path)
+        for rel_path in sorted(set(head_files) - index):
+            if not is_file(rel_path):
+                result["deleted"].append(rel_path)
+            elif blob_oid(rel_path) != head_files[rel_path]:
+                result["modified"].append(rel_path)
+        for rel_path in sorted(self._walk_files(self.root)):
+            if rel_path not in index and rel_path not in head_files and \
+                    not self._matches_ignore(rel_path, patterns):
+                result["untracked"].append(rel_path)
+        self._detect_renames(result, head_files, blob_oid)
+        return result
+
+    def _detect_renames(self, result: Dict[str, List[str]], head_files: Dict[str, str], blob_oid) -> None:
+        """Regroupe les nouveaux fichiers de l'index et les fichiers supprimés
+        qui leur ressemblent en entrées staged_renamed."""
+        import renames
+
+        deleted = {path: head_files[path] for path in result["staged_deleted"] + result["deleted"]
+                   if path in head_files}
+        if not deleted or not result["staged_new"]:
+            return
+        added = {path: blob_oid(path) for path in result["staged_new"]}
+
+        def read(rel_path, oid, git_dir):
+            if rel_path not in added:
+                return renames.read_blob(rel_path, oid, git_dir)
+            path = self.root / rel_path
+            if path.stat().st_size > renames.MAX_SIZE:
+                return None
+            return read_file(path)
+
+        found = renames.find_renames(deleted, added, self.git_dir, read=read)
+        if not found:
+            return
+        paired = {new for _, _, new, _ in found} | {old for _, old, _, _ in found}
+        result["staged_renamed"] = [f"{old} -> {new}" for _, old, new, _ in found]
+        for key in ("staged_new", "staged_deleted", "deleted"):
+            result[key] = [path for path in result[key] if path not in paired]
+
+    def _ignore_patterns(self) -> List[str]:
+        gitignore = self.root / ".gitignore"
+        if not gitignore.exists():
+            return []
+        lines = gitignore.read_text(encoding="utf-8", errors="replace").splitlines()
+        return [line.strip().lstrip("/") for line in lines if line.strip() and not line.startswith("#")]
+
+    @staticmethod
+    def _matches_ignore(rel_path: str, patterns: List[str]) -> bool:
+        for pattern in patterns:
+            if pattern.endswith("/"):
+                if rel_path.startswith(pattern) or rel_path == pattern.rstrip("/"):
+                    return True
+            elif fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(os.path.basename(rel_path), pattern):
+                return True
+        return False
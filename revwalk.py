@@ -0,0 +1,350 @@
+"""Parcours de l'historique (révisions) partagés par les commandes et l'interface web.
+
+Les commits sont immuables : leur résumé (parents, date, sujet) est gardé en
+mémoire, ce qui profite aux parcours successifs (branch -v puis page des
+branches dans le même serveur, par exemple).
+
+ahead_behind calcule en un seul parcours les écarts de toutes les paires
+(branche, branche.remote) : chaque commit porte un masque de bits, un bit par
+pointe dont il est l'ancêtre. Les commits sont visités du plus récent au plus
+ancien ; un commit ancêtre de toutes les pointes n'apporte plus rien à aucun
+écart (ses ancêtres non plus), et le parcours s'arrête dès que la file n'en
+contient plus d'autres (et qu'aucun commit déjà vu de même date ne peut encore
+en recevoir les bits). Une paire dont un côté manque (branche jamais poussée)
+compte tous les ancêtres de l'autre : le parcours va alors jusqu'au bout.
+
+walk est le parcours de log : une file de priorité sur tous les parents
+(du plus récent au plus ancien), qui produit les commits un par un. Avec des
+exclusions (^A, A..B), l'ensemble est d'abord délimité par _limit (comme
+limit_list dans git) : à dates égales, un commit peut sortir de la file avant
+le descendant exclu qui l'exclut, et l'exclusion est alors propagée après
+coup ; rien n'est produit avant que la file ne contienne plus que des
+commits exclus plus anciens que tous ceux retenus. L'ordre topologique
+(aucun parent avant ses enfants) demande de connaître tout l'ensemble : il
+n'est produit qu'après le parcours complet.
+"""
+import os
+import heapq
+from collections import Counter, OrderedDict
+
+import commitgraph
+import repository
+
+COMMIT_CACHE_SIZE = 65536
+
+_commits = OrderedDict()
+
+
+def peel(oid, git_dir=repository.GIT_DIR_NAME):
+    """SHA du commit désigné par `oid` (les tags annotés sont suivis)."""
+    obj_type, content = repository.read_object(oid, git_dir)
+    while obj_type == "tag":
+        oid = repository.object_links(obj_type, content)[0][1]
+        obj_type, content = repository.read_object(oid, git_dir)
+    if obj_type != "commit":
+        raise ValueError(f"Object {oid} is not a commit")
+    return oid, content
+
+
+def read_commit(oid, git_dir=repository.GIT_DIR_NAME):
+    """Commit analysé (clés de repository.parse_commit, plus "oid" et
+    "timestamp") ; lève FileNotFoundError ou ValueError."""
+    oid, content = peel(oid, git_dir)
+    commit = repository.parse_commit(content)
+    commit["oid"] = oid
+    date = commit["committer_date"] or commit["author_date"]
+    commit["timestamp"] = date.timestamp() if date else 0
+    if oid not in _commits:
+        _remember(oid, commit)
+    return commit
+
+
+def _remember(oid, commit):
+    _commits[oid] = (
+        tuple(commit["parent_oids"]),
+        commit["timestamp"],
+        commit["message"].strip().split("\n", 1)[0],
+    )
+    if len(_commits) > COMMIT_CACHE_SIZE:
+        _commits.popitem(last=False)
+
+
+def commit_summary(oid, git_dir=repository.GIT_DIR_NAME):
+    """(parents, timestamp, sujet) d'un commit, ou du commit visé par un tag
+    annoté ; lève FileNotFoundError ou ValueError."""
+    cached = _commits.get(oid)
+    if cached is None:
+        # Un tag est mis en cache sous le SHA du commit qu'il désigne
+        oid = read_commit(oid, git_dir)["oid"]
+        cached = _commits[oid]
+    _commits.move_to_end(oid)
+    return cached
+
+
+def commit_links(oid, git_dir=repository.GIT_DIR_NAME):
+    """(parents, timestamp) d'un commit : depuis le cache, sinon le graphe des
+    commits (sans décompresser), sinon le commit lui-même."""
+    cached = _commits.get(oid)
+    if cached is not None:
+        return cached[0], cached[1]
+    graph = commitgraph.load(git_dir)
+    links = graph.links(oid) if graph is not None else None
+    if links is not None:
+        return links
+    return commit_summary(oid, git_dir)[:2]
+
+
+def _limit(include, exclude, read, first_parent=False, limit=None):
+    """Valeurs des commits accessibles depuis `include` et pas depuis
+    `exclude`, du plus récent au plus ancien ; `read(oid)` retourne
+    (oid du commit, parents, timestamp, valeur).
+
+    Un commit sorti de la file comme visible peut encore être exclu ensuite
+    par un descendant exclu de même date : l'exclusion est alors propagée à
+    ses ancêtres déjà vus, et rien n'est retourné avant la fin du parcours.
+    Celui-ci s'arrête quand la file ne contient plus que des commits exclus,
+    tous plus anciens que le dernier commit visible. Avec `limit`, il
+    s'arrête dès que plus de `limit` commits sont visibles pour de bon
+    (plus récents que toute la file).
+    """
+    heap = []
+    seen = set()
+    entries = {}  # oid -> (parents, timestamp, valeur) des commits lus
+    popped = set()
+    hidden = set()
+    shown = []  # (oid, timestamp, valeur) sortis de la file comme visibles
+    waiting = 0  # entrées de la file pas encore exclues
+    sequence = 0
+
+    def push(oid):
+        nonlocal waiting, sequence
+        try:
+            commit_oid, parents, timestamp, value = read(oid)
+        except (FileNotFoundError, ValueError):
+            return
+        seen.add(oid)
+        if commit_oid in entries:
+            return commit_oid  # tag d'un commit déjà dans la file
+        seen.add(commit_oid)
+        entries[commit_oid] = (parents, timestamp, value)
+        sequence += 1
+        heapq.heappush(heap, (-timestamp, sequence, commit_oid))
+        if commit_oid not in hidden:
+            waiting += 1
+        return commit_oid
+
+    def hide(oids):
+        nonlocal waiting
+        stack = list(oids)
+        unread = []
+        while stack:
+            oid = stack.pop()
+            if oid in hidden:
+                continue
+            hidden.add(oid)
+            if oid in popped:
+                # Déjà sorti comme visible : ses parents (tous, même avec
+                # first_parent) sont exclus et lus s'ils ne l'ont pas été
+                stack.extend(entries[oid][0])
+                unread.extend(parent for parent in entries[oid][0] if parent not in seen)
+            elif oid in entries:
+                waiting -= 1
+        for oid in unread:
+            if oid not in seen:
+                push(oid)
+
+    for oid in exclude:
+        if oid not in seen:
+            commit_oid = push(oid)
+            if commit_oid:
+                hide([commit_oid])
+    for oid in include:
+        if oid not in seen:
+            push(oid)
+    settled = total = 0
+    while heap:
+        top = -heap[0][0]
+        if limit is not None:
+            while settled < len(shown) and shown[settled][1] > top:
+                total += shown[settled][0] not in hidden
+                settled += 1
+            if total > limit:
+                return [entry[2] for entry in shown[:settled] if entry[0] not in hidden]
+        if not waiting and (not shown or top < shown[-1][1]):
+            break
+        oid = heapq.heappop(heap)[2]
+        popped.add(oid)
+        parents, timestamp, value = entries[oid]
+        if oid in hidden:
+            hide(parents)
+        else:
+            waiting -= 1
+            shown.append((oid, timestamp, value))
+            if first_parent:
+                parents = parents[:1]
+        for parent in parents:
+            if parent not in seen:
+                push(parent)
+    return [value for oid, _, value in shown if oid not in hidden]
+
+
+def count(include, exclude=(), git_dir=repository.GIT_DIR_NAME, limit=None):
+    """Nombre de commits accessibles depuis `include` et pas depuis `exclude`
+    (parcours par date sur commit_links) ; s'arrête au-delà de `limit`."""
+    def read(oid):
+        parents, timestamp = commit_links(oid, git_dir)
+        return oid, parents, timestamp, None
+
+    return len(_limit(include, exclude, read, limit=limit))
+
+
+def ahead_behind(pairs, git_dir=repository.GIT_DIR_NAME):
+    """Pour chaque paire (commit local, commit amont), retourne (en avance, en retard).
+
+    Un commit absent (None, branche jamais poussée) compte comme un historique vide.
+    """
+    tips = {oid for pair in pairs for oid in pair if oid}
+    bit_of = {oid: 1 << i for i, oid in enumerate(sorted(tips))}
+    full = (1 << len(bit_of)) - 1
+    if any(bool(local) != bool(upstream) for local, upstream in pairs):
+        full = None  # aucun commit ne porte les deux bits de cette paire
+    flags = dict(bit_of)
+    propagated = {}
+    heap = []
+    partial = 0  # entrées de la file pas encore communes à toutes les pointes
+    oldest = None  # date du dernier commit sorti de la file sans tous les bits
+
+    def push(oid, mask):
+        nonlocal partial
+        try:
+            timestamp = commit_links(oid, git_dir)[1]
+        except (FileNotFoundError, ValueError):
+            timestamp = 0
+        heapq.heappush(heap, (-timestamp, oid, mask))
+        if mask != full:
+            partial += 1
+
+    for oid, mask in bit_of.items():
+        push(oid, mask)
+    while heap:
+        if not partial and (oldest is None or -heap[0][0] < oldest):
+            break
+        timestamp, oid, mask = heapq.heappop(heap)
+        if mask != full:
+            partial -= 1
+        mask = flags[oid]
+        if mask != full:
+            oldest = -timestamp
+        if propagated.get(oid) == mask:
+            continue
+        propagated[oid] = mask
+        try:
+            parents = commit_links(oid, git_dir)[0]
+        except (FileNotFoundError, ValueError):
+            continue
+        for parent in parents:
+            merged = flags.get(parent, 0) | mask
+            if merged != flags.get(parent):
+                flags[parent] = merged
+                # Un commit déjà visité qui reçoit de nouveaux bits (dates
+                # décalées) est revisité pour les transmettre à ses ancêtres
+                push(parent, merged)
+
+    masks = Counter(flags.values())
+    results = []
+    for local, upstream in pairs:
+        local_bit = bit_of.get(local, 0)
+        upstream_bit = bit_of.get(upstream, 0)
+        ahead = behind = 0
+        for mask, count in masks.items():
+            if mask & local_bit and not mask & upstream_bit:
+                ahead += count
+            elif mask & upstream_bit and not mask & local_bit:
+                behind += count
+        results.append((ahead, behind))
+    return results
+
+
+def branch_overview(git_dir=repository.GIT_DIR_NAME):
+    """[{name, oid, subject, ahead, behind}] pour chaque branche locale, face à son .remote."""
+    repo = repository.Repository(os.path.dirname(os.path.abspath(git_dir)))
+    names = repo.branches()
+    pairs = [(repo.read_ref(name), repo.read_ref(name + ".remote")) for name in names]
+    counts = ahead_behind(pairs, git_dir)
+    overview = []
+    for name, (oid, _), (ahead, behind) in zip(names, pairs, counts):
+        try:
+            subject = commit_summary(oid, git_dir)[2] if oid else ""
+        except (FileNotFoundError, ValueError):
+            subject = ""
+        overview.append({"name": name, "oid": oid, "subject": subject, "ahead": ahead, "behind": behind})
+    return overview
+
+
+def walk(include, exclude=(), order="date", first_parent=False, git_dir=repository.GIT_DIR_NAME):
+    """Génère les commits (dicts de read_commit) accessibles depuis `include`
+    et pas depuis `exclude`, du plus récent au plus ancien (`order="date"`)
+    ou sans jamais un parent avant ses enfants (`order="topo"`).
+
+    Avec `first_parent`, seuls les premiers parents des commits affichés sont suivis.
+    """
+    if order == "topo":
+        yield from _topo_order(list(walk(include, exclude, "date", first_parent, git_dir)), first_parent)
+        return
+    if exclude:
+        # Exclusions : tout l'ensemble est délimité avant d'être produit
+        def read(oid):
+            commit = read_commit(oid, git_dir)
+            return commit["oid"], commit["parent_oids"], commit["timestamp"], commit
+
+        yield from _limit(include, exclude, read, first_parent)
+        return
+    heap = []
+    queued = set()
+    sequence = 0
+
+    def push(oid):
+        nonlocal sequence
+        try:
+            commit = read_commit(oid, git_dir)
+        except (FileNotFoundError, ValueError):
+            return
+        queued.add(oid)
+        queued.add(commit["oid"])
+        sequence += 1
+        heapq.heappush(heap, (-commit["timestamp"], sequence, commit))
+
+    for oid in include:
+        if oid not in queued:
+            push(oid)
+    while heap:
+        commit = heapq.heappop(heap)[2]
+        yield commit
+        parents = commit["parent_oids"][:1] if first_parent else commit["parent_oids"]
+        for parent in parents:
+            if parent not in queued:
+                push(parent)
+
+
+def _topo_order(commits, first_parent=False):
+    """Ordonne des commits (du plus récent au plus ancien) pour qu'un parent
+    ne vienne qu'après tous ses enfants, en suivant chaque lignée le plus
+    longtemps possible."""
+    by_oid = {commit["oid"]: commit for commit in commits}
+    children = Counter()
+    for commit in commits:
+        parents = commit["parent_oids"][:1] if first_parent else commit["parent_oids"]
+        for parent in parents:
+            if parent in by_oid:
+                children[parent] += 1
+    stack = [commit for commit in reversed(commits) if not children[commit["oid"]]]
+    while stack:
+        commit = stack.pop()
+        yield commit
+        parents = commit["parent_oids"][:1] if first_parent else commit["parent_oids"]
+        # Le premier parent est empilé en dernier : c'est lui qui sort ensuite
+        for parent in reversed(parents):
+            if parent in by_oid:
+                children[parent] -= 1
+                if not children[parent]:
+                    stack.append(by_oid[parent])
@@ -0,0 +1,423 @@
+"""Index inversé des commits : mots des messages, auteurs et committers, dates.
+
+Un terme est un mot en minuscules préfixé par son champ : "m:" (message),
+"a:" (auteur), "c:" (committer). Une recherche intersecte les listes de
+commits des termes demandés puis filtre sur les dates, sans décompresser un
+seul commit. Un terme demandé désigne tous les termes indexés de son champ qui
+contiennent son mot ("m:fix" : fix, fixed, bugfix...), trouvés par une
+recherche d'octets dans le lexique. Les résultats vont du plus récent au plus
+ancien ; à date égale, chaque commit passe avant ses ancêtres.
+
+.mygit/search/index (projeté en mémoire, réécrit en entier) :
+    "MYSI" | version | nombre de commits | nombre de termes
+    commits dans l'ordre d'indexation : SHA binaire (20 octets), timestamp (8)
+    table de recherche triée par SHA : SHA binaire, numéro du commit (4)
+    table des termes triée : position et longueur du terme dans le lexique,
+        position et nombre de numéros de commits
+    lexique (termes en UTF-8), puis les listes de numéros (4 octets chacun)
+
+.mygit/search/journal : les commits indexés depuis la dernière réécriture,
+une ligne "<sha>\\t<timestamp>\\t<termes>" chacun, ajoutée par commit,
+commit_tree et les recherches (log --grep, /search). Au-delà de JOURNAL_MAX
+lignes (et à chaque gc), le journal est fusionné dans l'index : les listes
+existantes sont recopiées telles quelles, les nouveaux numéros ajoutés à la
+suite.
+
+L'index est fermé par ancêtres : update() part des pointes et s'arrête aux
+commits déjà indexés, si bien qu'un commit indexé a tous ses ancêtres indexés.
+"""
+import os
+import re
+import mmap
+import time
+import struct
+import itertools
+from array import array
+from collections import Counter
+
+import repository
+import revwalk
+
+MAGIC = b"MYSI"
+VERSION = 1
+HEADER = struct.Struct(">4sIII")
+DOC = struct.Struct(">20sq")
+LOOKUP = struct.Struct(">20sI")
+TERM = struct.Struct(">IHQI")
+JOURNAL_MAX = 5000
+WORD = re.compile(r"\w+")
+LOCK_NAME = "lock"
+LOCK_MAX_AGE = 3600
+
+
+def index_dir(git_dir=repository.GIT_DIR_NAME):
+    return os.path.join(git_dir, "search")
+
+
+def exists(git_dir=repository.GIT_DIR_NAME):
+    return os.path.isdir(index_dir(git_dir))
+
+
+def words(text):
+    return WORD.findall((text or "").lower())
+
+
+def commit_terms(commit):
+    """Termes d'un commit (dict de revwalk.read_commit)."""
+    terms = {"m:" + word for word in words(commit["message"])}
+    terms.update("a:" + word for word in words(commit["author"]))
+    terms.update("c:" + word for word in words(commit["committer"]))
+    return terms
+
+
+class Segment:
+    """Index principal projeté en mémoire."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.ndocs, self.nterms = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: index de recherche invalide")
+        self.docs_offset = HEADER.size
+        self.lookup_offset = self.docs_offset + DOC.size * self.ndocs
+        self.terms_offset = self.lookup_offset + LOOKUP.size * self.ndocs
+        self.pool_offset = self.terms_offset + TERM.size * self.nterms
+
+    def doc(self, docid):
+        """(sha, timestamp) du commit numéro `docid`."""
+        sha, timestamp = DOC.unpack_from(self.data, self.docs_offset + DOC.size * docid)
+        return sha.hex(), timestamp
+
+    def find(self, oid):
+        """Numéro du commit, ou -1 s'il n'est pas indexé."""
+        key = bytes.fromhex(oid)
+        lo, hi = 0, self.ndocs
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self.lookup_offset + LOOKUP.size * mid
+            sha = self.data[start:start + 20]
+            if sha < key:
+                lo = mid + 1
+            elif sha > key:
+                hi = mid
+            else:
+                return LOOKUP.unpack_from(self.data, start)[1]
+        return -1
+
+    def _term(self, i):
+        offset, length, postings, count = TERM.unpack_from(self.data, self.terms_offset + TERM.size * i)
+        start = self.pool_offset + offset
+        return self.data[start:start + length], postings, count
+
+    def postings(self, term):
+        """Numéros des commits qui contiennent `term` (array d'entiers)."""
+        key = term.encode("utf-8")
+        lo, hi = 0, self.nterms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            name, postings, count = self._term(mid)
+            if name < key:
+                lo = mid + 1
+            elif name > key:
+                hi = mid
+            else:
+                return self._read_postings(postings, count)
+        return array("I")
+
+    def containing(self, term):
+        """Numéros des commits dont un terme du champ de `term` contient son
+        mot ("m:fix" : m:fix, m:fixed, m:bugfix...)."""
+        field, word = term[:2].encode("utf-8"), term[2:].encode("utf-8")
+        ids = set()
+        if not self.nterms or not word:
+            return ids
+        offset, length = TERM.unpack_from(self.data, self.terms_offset + TERM.size * (self.nterms - 1))[:2]
+        end = self.pool_offset + offset + length
+        pos = self.data.find(word, self.pool_offset, end)
+        while pos >= 0:
+            # Terme qui contient cette position : le dernier qui commence avant elle
+            lo, hi = 0, self.nterms
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.pool_offset + TERM.unpack_from(self.data, self.terms_offset + TERM.size * mid)[0] <= pos:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            offset, length, postings, count = TERM.unpack_from(self.data, self.terms_offset + TERM.size * (lo - 1))
+            start = self.pool_offset + offset
+            if pos < start + len(field) or pos + len(word) > start + length:
+                pos = self.data.find(word, pos + 1, end)  # à cheval sur le champ ou le terme suivant
+                continue
+            if self.data[start:start + len(field)] == field:
+                ids.update(self._read_postings(postings, count))
+            pos = self.data.find(word, start + length, end)
+        return ids
+
+    def _read_postings(self, offset, count):
+        ids = array("I")
+        ids.frombytes(self.data[offset:offset + 4 * count])
+        if struct.pack("=I", 1) != struct.pack("<I", 1):
+            ids.byteswap()
+        return ids
+
+    def items(self):
+        """(terme, numéros) de tous les termes, dans l'ordre."""
+        for i in range(self.nterms):
+            name, postings, count = self._term(i)
+            yield name.decode("utf-8"), self._read_postings(postings, count)
+
+    def close(self):
+        self.data.close()
+
+
+class CommitIndex:
+    """Index principal + journal, lus une fois à l'ouverture."""
+
+    def __init__(self, git_dir=repository.GIT_DIR_NAME):
+        self.git_dir = git_dir
+        path = os.path.join(index_dir(git_dir), "index")
+        try:
+            self.segment = Segment(path) if os.path.exists(path) else None
+        except (OSError, ValueError, struct.error):
+            self.segment = None
+        self.journal = {}  # sha -> (timestamp, termes)
+        # journal.old : journal en cours de fusion par compact()
+        for name in ("journal.old", "journal"):
+            try:
+                with open(os.path.join(index_dir(git_dir), name), encoding="utf-8") as f:
+                    for line in f:
+                        parts = line.rstrip("\n").split("\t")
+                        if len(parts) == 3 and repository.is_sha(parts[0]):
+                            self.journal[parts[0]] = (int(parts[1]), set(parts[2].split()))
+            except FileNotFoundError:
+                pass
+
+    def __len__(self):
+        return (self.segment.ndocs if self.segment else 0) + len(self.journal)
+
+    def __contains__(self, oid):
+        return oid in self.journal or (self.segment is not None and self.segment.find(oid) >= 0)
+
+    def query(self, terms, since=None, until=None):
+        """[(sha, timestamp)] des commits qui ont, pour chacun des `terms`, un
+        terme du même champ qui contient son mot, du plus récent au plus ancien."""
+        terms = sorted(set(terms))
+        results = []
+        if self.segment is not None:
+            docids = None
+            # Les listes les plus courtes d'abord : l'intersection ne fait que rétrécir
+            for ids in sorted((self.segment.containing(term) for term in terms), key=len):
+                docids = set(ids) if docids is None else docids.intersection(ids)
+                if not docids:
+                    break
+            if docids is None:
+                docids = range(self.segment.ndocs)
+            results.extend(self.segment.doc(docid) for docid in docids)
+        for oid, (timestamp, doc_terms) in self.journal.items():
+            # Pendant une fusion, un commit peut être à la fois dans l'index et le journal
+            if all(any(doc_term[:2] == term[:2] and term[2:] in doc_term[2:] for doc_term in doc_terms)
+                   for term in terms) and \
+                    (self.segment is None or self.segment.find(oid) < 0):
+                results.append((oid, timestamp))
+        results = [(oid, ts) for oid, ts in results
+                   if (since is None or ts >= since) and (until is None or ts <= until)]
+        results.sort(key=lambda item: -item[1])
+        ordered = []
+        for timestamp, group in itertools.groupby(results, key=lambda item: item[1]):
+            group = [oid for oid, _ in group]
+            if len(group) > 1:
+                group = _descendants_first(group, timestamp, self.git_dir)
+            ordered.extend((oid, timestamp) for oid in group)
+        return ordered
+
+    def close(self):
+        if self.segment is not None:
+            self.segment.close()
+
+
+def _descendants_first(group, timestamp, git_dir):
+    """Commits de même date dans l'ordre de l'historique : chacun avant ses
+    ancêtres (les moins de descendants dans le groupe d'abord). Seuls les
+    ancêtres de cette date sont parcourus."""
+    members = set(group)
+    descendants = Counter()
+    for oid in group:
+        seen = {oid}
+        stack = [oid]
+        while stack:
+            try:
+                parents, commit_time = revwalk.commit_links(stack.pop(), git_dir)
+            except (FileNotFoundError, ValueError):
+                continue
+            if int(commit_time) < timestamp:
+                continue
+            for parent in parents:
+                if parent not in seen:
+                    seen.add(parent)
+                    stack.append(parent)
+        descendants.update((seen & members) - {oid})
+    return sorted(group, key=lambda oid: (descendants[oid], oid))
+
+
+def query_terms(grep=None, author=None):
+    """Termes d'une recherche : tous les mots de `grep` dans le message, de
+    `author` dans l'auteur (chacun éventuellement dans un mot plus long)."""
+    return ["m:" + word for word in words(grep)] + ["a:" + word for word in words(author)]
+
+
+def update(tips, git_dir=repository.GIT_DIR_NAME):
+    """Indexe les commits accessibles depuis `tips` qui ne le sont pas encore
+    (le parcours s'arrête aux commits indexés) ; retourne leur nombre."""
+    index = CommitIndex(git_dir)
+    try:
+        lines = []
+        seen = set()
+        stack = [oid for oid in tips if oid]
+        while stack:
+            oid = stack.pop()
+            if oid in seen:
+                continue
+            seen.add(oid)
+            if oid in index:
+                continue
+            try:
+                commit = revwalk.read_commit(oid, git_dir)
+            except (FileNotFoundError, ValueError):
+                continue
+            if commit["oid"] != oid:
+                stack.append(commit["oid"])  # tag annoté
+                continue
+            terms = " ".join(sorted(commit_terms(commit)))
+            lines.append(f"{commit['oid']}\t{int(commit['timestamp'])}\t{terms}\n")
+            stack.extend(commit["parent_oids"])
+        journal_size = len(index.journal) + len(lines)
+    finally:
+        index.close()
+    if lines:
+        os.makedirs(index_dir(git_dir), exist_ok=True)
+        # Un seul write en mode ajout par mise à jour
+        with open(os.path.join(index_dir(git_dir), "journal"), "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+    if journal_size > JOURNAL_MAX:
+        compact(git_dir)
+    return len(lines)
+
+
+def _write_segment(path, docs, postings):
+    """docs : [(sha, timestamp)] dans l'ordre des numéros ; postings : {terme: array}."""
+    lookup = sorted((bytes.fromhex(oid), docid) for docid, (oid, _) in enumerate(docs))
+    names = sorted(postings)
+    pool = bytearray()
+    table = []
+    offset = (HEADER.size + (DOC.size + LOOKUP.size) * len(docs) + TERM.size * len(names)
+              + sum(len(name.encode("utf-8")) for name in names))
+    for name in names:
+        encoded = name.encode("utf-8")
+        table.append(TERM.pack(len(pool), len(encoded), offset, len(postings[name])))
+        pool += encoded
+        offset += 4 * len(postings[name])
+    with open(path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(docs), len(names)))
+        f.write(b"".join(DOC.pack(bytes.fromhex(oid), int(ts)) for oid, ts in docs))
+        f.write(b"".join(LOOKUP.pack(sha, docid) for sha, docid in lookup))
+        f.write(b"".join(table))
+        f.write(pool)
+        for name in names:
+            ids = postings[name]
+            if struct.pack("=I", 1) != struct.pack("<I", 1):
+                ids = array("I", ids)
+                ids.byteswap()
+            f.write(ids.tobytes())
+    os.replace(path + ".tmp", path)
+
+
+def _abandoned(path):
+    """Vrai pour un verrou de plus d'une heure, ou dont le processus n'existe plus."""
+    try:
+        if time.time() - os.stat(path).st_mtime > LOCK_MAX_AGE:
+            return True
+        with open(path) as f:
+            pid = int(f.read().strip())
+    except (OSError, ValueError):
+        return False  # disparu, ou pas encore écrit
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass
+    return False
+
+
+def _acquire(git_dir):
+    path = os.path.join(index_dir(git_dir), LOCK_NAME)
+    if os.path.exists(path) and _abandoned(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as f:
+        f.write(str(os.getpid()))
+    return True
+
+
+def _release(git_dir):
+    try:
+        os.unlink(os.path.join(index_dir(git_dir), LOCK_NAME))
+    except FileNotFoundError:
+        pass
+
+
+def compact(git_dir=repository.GIT_DIR_NAME, keep=None):
+    """Fusionne le journal dans l'index principal. Avec `keep` (ensemble de
+    SHA), l'index est reconstruit avec ces seuls commits (gc). Retourne le
+    nombre de commits indexés, ou None si une autre fusion est en cours."""
+    os.makedirs(index_dir(git_dir), exist_ok=True)
+    if not _acquire(git_dir):
+        return None
+    # Le journal est mis de côté : ce qui s'y ajoute pendant la fusion est gardé
+    journal = os.path.join(index_dir(git_dir), "journal")
+    if os.path.exists(journal) and not os.path.exists(journal + ".old"):
+        os.replace(journal, journal + ".old")
+    index = CommitIndex(git_dir)
+    try:
+        docs = []
+        postings = {}
+        remap = None
+        if index.segment is not None:
+            if keep is None:
+                docs = [index.segment.doc(docid) for docid in range(index.segment.ndocs)]
+                postings = dict(index.segment.items())
+            else:
+                # Numéros des commits gardés, dans l'ordre d'origine
+                remap = {}
+                for docid in range(index.segment.ndocs):
+                    oid, timestamp = index.segment.doc(docid)
+                    if oid in keep:
+                        remap[docid] = len(docs)
+                        docs.append((oid, timestamp))
+                for name, ids in index.segment.items():
+                    kept = array("I", (remap[docid] for docid in ids if docid in remap))
+                    if kept:
+                        postings[name] = kept
+        known = {oid for oid, _ in docs}
+        for oid, (timestamp, terms) in index.journal.items():
+            if oid in known or (keep is not None and oid not in keep):
+                continue
+            docid = len(docs)
+            docs.append((oid, timestamp))
+            for term in terms:
+                postings.setdefault(term, array("I")).append(docid)
+        path = os.path.join(index_dir(git_dir), "index")
+        _write_segment(path, docs, postings)
+        if os.path.exists(journal + ".old"):
+            os.unlink(journal + ".old")
+        return len(docs)
+    finally:
+        index.close()
+        _release(git_dir)
@@ -0,0 +1,153 @@
+"""Tags (légers ou annotés) et describe.
+
+Un tag léger est une référence refs/tags/<nom> qui contient le SHA d'un
+commit. Un tag annoté est un objet "tag" (objet visé, type, nom, auteur du
+tag, date, message) dont refs/tags/<nom> contient le SHA.
+
+describe cherche le tag le plus proche d'un commit par un parcours en largeur
+de ses ancêtres, à partir des parents et dates de revwalk.commit_links (graphe
+des commits écrit par gc, sans décompresser les commits). Le parcours est
+borné par MAX_WALK commits. Le nombre de commits depuis le tag est ensuite
+compté par revwalk.count (les ancêtres du tag sont exclus au fil du parcours).
+"""
+import os
+import getpass
+from collections import deque
+from datetime import datetime
+
+import lockfile
+import repository
+import revwalk
+
+MAX_WALK = 100000
+ABBREV = 7
+
+
+def tag_path(name, git_dir=repository.GIT_DIR_NAME):
+    return os.path.join(git_dir, "refs", "tags", *name.split("/"))
+
+
+def check_name(name):
+    """Lève ValueError si `name` ne peut pas être un nom de tag."""
+    parts = name.split("/")
+    if (not name or name.startswith("-") or ".." in name or "@{" in name or
+            name.endswith(lockfile.LOCK_SUFFIX) or any(c.isspace() or c in "~^:?*[\\" for c in name) or
+            any(not part or part.startswith(".") for part in parts)):
+        raise ValueError(f"Nom de tag invalide : '{name}'")
+
+
+def list_tags(git_dir=repository.GIT_DIR_NAME):
+    """{nom: sha de la référence (commit ou objet tag)} de tous les tags."""
+    tags_dir = os.path.join(git_dir, "refs", "tags")
+    found = {}
+    for root, _, files in os.walk(tags_dir):
+        for file_name in files:
+            if file_name.endswith(lockfile.LOCK_SUFFIX):
+                continue
+            path = os.path.join(root, file_name)
+            with open(path) as f:
+                value = f.read().strip()
+            if repository.is_sha(value):
+                found[os.path.relpath(path, tags_dir).replace(os.sep, "/")] = value
+    return found
+
+
+def parse_tag(content):
+    """Champs d'un objet tag : object, type, tag, tagger, date et message."""
+    text = content.decode("utf-8", errors="replace")
+    header, _, message = text.partition("\n\n")
+    tag = {"object": None, "type": "commit", "tag": None, "tagger": None, "date": None,
+           "message": message.rstrip("\n")}
+    for line in header.split("\n"):
+        field, _, value = line.partition(" ")
+        if field == "tagger":
+            tag["tagger"], tag["date"] = repository.parse_signature(value)
+        elif field in ("object", "type", "tag"):
+            tag[field] = value.strip()
+    return tag
+
+
+def create(name, target, message=None, tagger=None, force=False, git_dir=repository.GIT_DIR_NAME):
+    """Crée refs/tags/<name> vers `target` (un SHA) ; avec un message, un
+    objet tag annoté est écrit. Retourne le SHA de la référence.
+
+    Lève ValueError pour un nom invalide et lockfile.RefConflict si le tag
+    existe déjà (sauf avec `force`).
+    """
+    check_name(name)
+    if message is not None:
+        obj_type, _ = repository.peek_object(target, git_dir)
+        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        content = (f"object {target}\ntype {obj_type}\ntag {name}\n"
+                   f"tagger {tagger or getpass.getuser()} {date}\n\n{message.rstrip()}\n")
+        oid = repository.hash_object(content.encode("utf-8"), "tag", True, git_dir)
+    else:
+        oid = target
+    repository.write_ref(tag_path(name, git_dir), oid + "\n",
+                         old=lockfile.ANY if force else None)
+    return oid
+
+
+def delete(name, git_dir=repository.GIT_DIR_NAME):
+    """Supprime un tag ; lève FileNotFoundError s'il n'existe pas."""
+    path = tag_path(name, git_dir)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Le tag '{name}' n'existe pas")
+    with lockfile.RefTransaction() as transaction:
+        transaction.update(path, None)
+
+
+def _candidates(git_dir, all_tags):
+    """{sha du commit: [(annoté, date, nom)]} des tags utilisables par describe."""
+    by_commit = {}
+    for name, oid in list_tags(git_dir).items():
+        try:
+            obj_type, content = repository.read_object(oid, git_dir)
+        except (FileNotFoundError, ValueError):
+            continue
+        date = None
+        annotated = obj_type == "tag"
+        if annotated:
+            date = parse_tag(content)["date"]
+        elif not all_tags:
+            continue  # comme git : sans --tags, seuls les tags annotés comptent
+        try:
+            commit, _ = revwalk.peel(oid, git_dir)
+        except (FileNotFoundError, ValueError):
+            continue
+        by_commit.setdefault(commit, []).append((annotated, date or datetime.min, name))
+    return by_commit
+
+
+def describe(oid, all_tags=False, long=False, git_dir=repository.GIT_DIR_NAME, max_walk=MAX_WALK):
+    """"<tag>" si `oid` est tagué, sinon "<tag>-<commits depuis le tag>-g<sha court>",
+    ou None sans tag accessible en moins de `max_walk` commits."""
+    candidates = _candidates(git_dir, all_tags)
+    if not candidates:
+        return None
+    queue = deque([oid])
+    seen = {oid}
+    found = None
+    while queue:
+        current = queue.popleft()
+        if current in candidates:
+            found = current
+            break
+        if len(seen) > max_walk:
+            return None
+        try:
+            parents = revwalk.commit_links(current, git_dir)[0]
+        except (FileNotFoundError, ValueError):
+            continue
+        for parent in parents:
+            if parent not in seen:
+                seen.add(parent)
+                queue.append(parent)
+    if found is None:
+        return None
+    # Plusieurs tags sur le même commit : l'annoté le plus récent, puis par nom
+    name = max(candidates[found], key=lambda tag: (tag[0], tag[1], tag[2]))[2]
+    if found == oid and not long:
+        return name
+    depth = revwalk.count([oid], [found], git_dir)
+    return f"{name}-{depth}-g{oid[:ABBREV]}"
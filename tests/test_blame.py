@@ -0,0 +1,25 @@
+import io
+import os
+
+import blame
+import fastimport
+import repository
+import revwalk
+
+
+def test_same_content_under_two_paths(tmp_path):
+    """b.txt, ajouté par B avec le contenu de a.txt (ajouté par A), revient à B."""
+    repository.Repository.init(str(tmp_path))
+    git_dir = os.path.join(str(tmp_path), repository.GIT_DIR_NAME)
+    stream = ("commit refs/heads/main\nmark :1\ncommitter A U Thor <a@example.com> 1700000000 +0000\n"
+              "data 1\nA\nM 644 inline a.txt\ndata 4\none\n\n"
+              "commit refs/heads/main\nmark :2\ncommitter A U Thor <a@example.com> 1700000100 +0000\n"
+              "data 1\nB\nfrom :1\nM 644 inline b.txt\ndata 4\none\n\n")
+    importer = fastimport.Importer(io.BytesIO(stream.encode()), git_dir)
+    importer.run()
+    importer.checkpoint()
+    tip = importer.branches["refs/heads/main"]["tip"]
+    first = revwalk.read_commit(tip, git_dir)["parent_oids"][0]
+
+    assert [line[0] for line in blame.blame(tip, "a.txt", git_dir)] == [first]
+    assert [line[0] for line in blame.blame(tip, "b.txt", git_dir)] == [tip]
@@ -0,0 +1,21 @@
+import renames
+
+
+def test_recall_at_60_percent():
+    """200 fichiers renommés avec 30 lignes gardées sur 50 (similarité 60 %)."""
+    contents = {}
+    deleted = {}
+    added = {}
+    for i in range(200):
+        lines = [f"file {i} line {j} = value({i * 7 + j})" for j in range(50)]
+        changed = lines[:30] + [f"changed {i} line {j}" for j in range(20)]
+        deleted[f"old/{i}.txt"] = f"old{i}"
+        added[f"new/{i}.txt"] = f"new{i}"
+        contents[f"old{i}"] = "\n".join(lines).encode()
+        contents[f"new{i}"] = "\n".join(changed).encode()
+
+    results = renames.find_renames(deleted, added, read=lambda path, oid, git_dir: contents[oid])
+    found = [(old, new) for _, old, new, _ in results
+             if old.split("/")[1] == new.split("/")[1]]
+    assert len(found) >= 196
+    assert all(score == 60 for _, _, _, score in results)
@@ -0,0 +1,69 @@
+import io
+import os
+
+import pytest
+
+import fastimport
+import repository
+import revwalk
+import tags
+
+
+def commit(ref, mark, message, parent=None, date=1700000000):
+    lines = [f"commit {ref}", f"mark :{mark}",
+             f"committer A U Thor <author@example.com> {date} +0000",
+             f"data {len(message)}", message]
+    if parent:
+        lines.append(f"from :{parent}")
+    lines.append(f"M 644 inline f{mark}")
+    lines += ["data 1", str(mark), ""]
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture
+def history(tmp_path):
+    """c0 <- c1 <- m1 <- m2 <- m3 (main) et c1 <- onb (b), tous à la même date :
+    c1 est atteint depuis b avant de l'être depuis main."""
+    repository.Repository.init(str(tmp_path))
+    git_dir = os.path.join(str(tmp_path), repository.GIT_DIR_NAME)
+    stream = (commit("refs/heads/main", 1, "c0") + commit("refs/heads/main", 2, "c1", 1)
+              + commit("refs/heads/b", 3, "onb", 2) + commit("refs/heads/main", 4, "m1", 2)
+              + commit("refs/heads/main", 5, "m2", 4) + commit("refs/heads/main", 6, "m3", 5))
+    importer = fastimport.Importer(io.BytesIO(stream.encode()), git_dir)
+    importer.run()
+    importer.checkpoint()
+    revwalk._commits.clear()
+    return git_dir, importer.branches["refs/heads/main"]["tip"], importer.branches["refs/heads/b"]["tip"]
+
+
+def test_count_same_timestamp(history):
+    git_dir, main, b = history
+    assert revwalk.count([b], [main], git_dir) == 1
+    assert revwalk.count([main], [b], git_dir) == 3
+    assert revwalk.count([b], [main], git_dir, limit=0) == 1
+
+
+def test_walk_same_timestamp(history):
+    git_dir, main, b = history
+    subjects = [c["message"].strip() for c in revwalk.walk([b], [main], git_dir=git_dir)]
+    assert subjects == ["onb"]
+    subjects = [c["message"].strip() for c in revwalk.walk([main], [b], git_dir=git_dir)]
+    assert subjects == ["m3", "m2", "m1"]
+    assert len(list(revwalk.walk([b], git_dir=git_dir))) == 3
+
+
+def test_ahead_behind(history):
+    git_dir, main, b = history
+    assert revwalk.ahead_behind([(b, main), (main, b)], git_dir) == [(1, 3), (3, 1)]
+    # Branche jamais poussée : tout son historique est en avance
+    assert revwalk.ahead_behind([(b, None)], git_dir) == [(3, 0)]
+    assert revwalk.ahead_behind([(b, main), (main, None)], git_dir) == [(1, 3), (5, 0)]
+
+
+def test_commit_summary_of_annotated_tag(history):
+    git_dir, main, b = history
+    tag = tags.create("v1", b, message="version 1", tagger="A U Thor", git_dir=git_dir)
+    assert tag != b
+    summary = revwalk.commit_summary(tag, git_dir)
+    assert summary[2] == "onb"
+    assert revwalk.commit_summary(b, git_dir) == summary
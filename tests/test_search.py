@@ -0,0 +1,38 @@
+import io
+import itertools
+import os
+
+import fastimport
+import maintenance
+import repository
+import search
+from commands import log
+
+
+def test_same_timestamp_in_history_order(tmp_path):
+    """Huit commits de root dans la même seconde : chacun avant son parent."""
+    repository.Repository.init(str(tmp_path))
+    git_dir = os.path.join(str(tmp_path), repository.GIT_DIR_NAME)
+    stream = ""
+    for i in range(1, 9):
+        stream += (f"commit refs/heads/main\nmark :{i}\n"
+                   f"committer root <root@example.com> 1700000000 +0000\ndata 2\nc{i}\n"
+                   + (f"from :{i - 1}\n" if i > 1 else "")
+                   + f"M 644 inline f{i}\ndata 1\n{i}\n\n")
+    importer = fastimport.Importer(io.BytesIO(stream.encode()), git_dir)
+    importer.run()
+    importer.checkpoint()
+    tip = importer.branches["refs/heads/main"]["tip"]
+    expected = [importer.marks[i] for i in range(8, 0, -1)]
+
+    search.update([tip], git_dir)
+    index = search.CommitIndex(git_dir)
+    try:
+        assert [oid for oid, _ in index.query(search.query_terms(None, "root"))] == expected
+    finally:
+        index.close()
+
+    # Avec les bitmaps de gc, log -n 2 garde les deux derniers commits
+    maintenance.collect_garbage(git_dir)
+    commits = log.search_commits(git_dir, [tip], [], None, "root", None, None)
+    assert [commit["oid"] for commit in itertools.islice(commits, 2)] == expected[:2]
@@ -0,0 +1,133 @@
+"""Serveur WSGI de production, sans dépendance externe (wsgiref + socketserver).
+
+Le processus maître ouvre la socket d'écoute, préchauffe les caches partagés de
+l'application puis crée `workers` processus par fork. Chaque worker sert les
+requêtes avec un pool de `threads` threads sur la socket héritée : le noyau
+répartit les connexions entre les workers, ce qui permet d'utiliser tous les
+cœurs malgré le GIL. Sans fork (Windows), on sert dans un seul processus.
+"""
+import os
+import gc
+import sys
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGIServer qui traite chaque connexion dans un pool de threads borné."""
+
+    # SO_REUSEADDR posé par server_bind(), avant bind : un redémarrage
+    # n'attend pas la fin des connexions en TIME_WAIT
+    allow_reuse_address = True
+
+    def __init__(self, server_address, threads=8, bind_and_activate=True, access_log=False):
+        super().__init__(server_address, QuietRequestHandler, bind_and_activate)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+        self.access_log = access_log
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+def make_server(app, host, port, threads, access_log=False):
+    server = PooledWSGIServer((host, port), threads=threads, access_log=access_log)
+    server.set_app(app)
+    return server
+
+
+def _serve_worker(server):
+    signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        server.serve_forever()
+    finally:
+        os._exit(0)
+
+
+def serve(app, host="127.0.0.1", port=8000, workers=1, threads=8, access_log=False, before_fork=None):
+    """Lance le serveur ; bloque jusqu'à SIGINT/SIGTERM."""
+    server = make_server(app, host, port, threads, access_log=access_log)
+
+    if before_fork:
+        before_fork()
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        print(f"Serveur prêt sur http://{host}:{port} (1 processus, {threads} threads)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+
+    # Ce qui a été chargé avant le fork ne bouge plus : on le sort du GC pour
+    # que les pages mémoire restent partagées entre les workers (copy-on-write).
+    gc.collect()
+    gc.freeze()
+
+    children = set()
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            _serve_worker(server)
+        children.add(pid)
+
+    for _ in range(workers):
+        spawn()
+    print(f"Serveur prêt sur http://{host}:{port} ({workers} processus, {threads} threads chacun)")
+
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        while not stopping:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid and pid in children:
+                # Un worker est mort : on le remplace
+                children.discard(pid)
+                spawn()
+                continue
+            time.sleep(0.2)
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        server.server_close()
+        sys.stdout.flush()